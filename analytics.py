@@ -0,0 +1,256 @@
+import os
+import time
+import threading
+from collections import deque
+from datetime import datetime
+import pytz
+from master_cache import KST, session_date_of
+
+# ------------------------------------------------------------------
+# 📐 수집 시점 파생 지표
+# ------------------------------------------------------------------
+# 샘플마다 종목별 누적 상태를 O(1)로 갱신해서 행의 analytics(jsonb) 컬럼으로 함께 저장한다.
+# 페이지 / 분석 쪽에서 1440행을 다시 훑지 않고 마지막 행만 읽으면 된다.
+# - 세션(18:00 기준) 시가 / 고가 / 저가, VWAP (누적 거래량 차이 가중)
+# - 분 단위 종가의 단순이동평균 (ANALYTICS_MA 분, 같은 분 샘플은 마지막 값으로 덮어씀)
+# - 주간 종가(t8432 jnilclose, 없으면 recprice) 대비 갭
+# - 코스피200 예상 시가: 주간 지수 종가 × (야간 가격 / 주간 선물 종가)
+# 재시작 시에는 최근 행 몇 개(마지막 analytics + 이동평균 구간)만 읽어 상태를 복원한다.
+# 복원 조회는 백그라운드 스레드에서 하고, 그동안 들어온 샘플은 모아 두었다가 복원된 상태에 이어 붙인다
+# (틱 루프는 DB 조회를 기다리지 않음, 복원 중인 샘플의 analytics는 null).
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "0") == "1"   # analytics 컬럼 마이그레이션 후 켬
+MA_PERIODS = sorted({int(v) for v in os.getenv("ANALYTICS_MA", "5,20,60").split(",") if v.strip()})  # 분
+FULL_REPLAY_LIMIT = 1440   # analytics가 없는 행만 있을 때 세션 전체를 다시 계산하는 상한
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+def _round(value, digits=2):
+    return None if value is None else round(value, digits)
+
+
+class MovingAverages:
+    """분 단위 종가 이동평균 (기간별 누적 합을 유지해서 O(기간 수))"""
+
+    def __init__(self, periods=MA_PERIODS):
+        self.periods = periods
+        self._closes = deque(maxlen=max(periods) + 1 if periods else 1)   # (분, 종가)
+        self._sums = {n: 0.0 for n in periods}
+
+    def add(self, minute, price):
+        closes = self._closes
+        if closes and closes[-1][0] == minute:
+            # 같은 분: 마지막 종가만 교체 (모든 구간에 포함된 값)
+            old = closes[-1][1]
+            closes[-1] = (minute, price)
+            for n in self.periods:
+                self._sums[n] += price - old
+            return
+        closes.append((minute, price))
+        size = len(closes)
+        for n in self.periods:
+            self._sums[n] += price
+            if size > n:
+                self._sums[n] -= closes[-n - 1][1]
+
+    def values(self):
+        size = len(self._closes)
+        return {str(n): (_round(self._sums[n] / n) if size >= n else None) for n in self.periods}
+
+
+class SessionState:
+    """종목 1개의 세션 누적 상태"""
+
+    def __init__(self, session, periods=MA_PERIODS):
+        self.session = session
+        self.open = self.high = self.low = None
+        self.pv = 0.0            # Σ 가격 × 구간 거래량
+        self.vwap_volume = 0     # Σ 구간 거래량
+        self.prev_volume = None
+        self.ma = MovingAverages(periods)
+
+    def add(self, minute, price, volume):
+        if self.open is None:
+            self.open = self.high = self.low = price
+        else:
+            self.high = max(self.high, price)
+            self.low = min(self.low, price)
+        if self.prev_volume is not None:
+            # 누적 거래량이 줄었다면 세션이 바뀐 것이므로 현재 누적값 전체를 반영
+            delta = volume - self.prev_volume if volume >= self.prev_volume else volume
+            self.pv += price * delta
+            self.vwap_volume += delta
+        self.prev_volume = volume
+        self.ma.add(minute, price)
+
+    def vwap(self):
+        return self.pv / self.vwap_volume if self.vwap_volume else None
+
+    def load(self, saved, volume):
+        """저장된 analytics에서 시가 / 고가 / 저가 / VWAP 누적값 복원"""
+        self.open, self.high, self.low = saved.get("open"), saved.get("high"), saved.get("low")
+        self.vwap_volume = int(saved.get("vwap_volume") or 0)
+        self.pv = float(saved.get("vwap") or 0) * self.vwap_volume
+        self.prev_volume = volume
+
+
+class AnalyticsEngine:
+    """
+    engine.update(row) -> analytics dict (row에 그대로 붙여서 저장).
+    - reference(symbol): {"close": 주간 선물 종가, "spot_close": 코스피200 주간 종가(없으면 None)}
+    - seeder(symbol, limit): 종목의 최근 행(최신순, analytics 포함) 조회 - 프로세스 시작 후 종목별 1회,
+      백그라운드 스레드에서 호출
+    """
+
+    def __init__(self, reference=None, seeder=None, periods=MA_PERIODS):
+        self._reference = reference
+        self._seeder = seeder
+        self.periods = periods
+        self._lock = threading.Lock()
+        self._states = {}
+        self._seeded = set()
+        self._pending = {}    # 복원 중인 종목: 그동안 들어온 샘플 [(시각, 분, 가격, 거래량, 세션)]
+        self._seeding = {}    # 종목 -> 복원 스레드
+
+    def wait_restored(self, timeout=None):
+        """진행 중인 복원이 끝날 때까지 대기 (오프라인 검증 / 테스트용)"""
+        for thread in list(self._seeding.values()):
+            thread.join(timeout)
+
+    def _seed(self, symbol, session):
+        state, restored_at = self._restore(symbol, session)
+        with self._lock:
+            for ts, minute, price, volume, sample_session in self._pending.pop(symbol, []):
+                if sample_session != state.session:
+                    state, restored_at = SessionState(sample_session, self.periods), None
+                # 복원 조회에 이미 포함된 샘플(세션 저장소 / 스풀 전송 완료분)은 건너뜀
+                if restored_at is None or ts > restored_at:
+                    state.add(minute, price, volume)
+            self._states[symbol] = state
+            self._seeding.pop(symbol, None)
+
+    def _restore(self, symbol, session):
+        """저장된 최근 행으로 상태 복원 -> (상태, 마지막 복원 행 시각). 실패하면 새 상태로 시작"""
+        state = SessionState(session, self.periods)
+        started = time.perf_counter()
+        try:
+            # 마지막 analytics 1행 + 이동평균 구간이면 충분 (analytics가 없으면 세션 전체 재계산)
+            limit = (max(self.periods) if self.periods else 0) + 5
+            rows = self._session_rows(symbol, session, limit)
+            if rows and not any(r.get("analytics") for r in rows) and len(rows) == limit:
+                rows = self._session_rows(symbol, session, FULL_REPLAY_LIMIT)
+            if not rows:
+                return state, None
+            rows.reverse()   # 오래된 순
+            saved_at = max((i for i, r in enumerate(rows) if r.get("analytics")), default=None)
+            for i, row in enumerate(rows):
+                minute = self._minute(row)
+                if saved_at is not None and i <= saved_at:
+                    # 저장된 누적값 이전 행은 이동평균 구간만 채움
+                    state.ma.add(minute, float(row["price"]))
+                    if i == saved_at:
+                        state.load(row["analytics"], int(row.get("volume") or 0))
+                    continue
+                state.add(minute, float(row["price"]), int(row.get("volume") or 0))
+            print(f"📐 {symbol} 파생 지표 상태 복원: {len(rows)}행 "
+                  f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+            return state, _parse_ts(rows[-1]["recorded_at"])
+        except Exception as e:
+            print(f"⚠️ {symbol} 파생 지표 상태 복원 실패 (새 샘플부터 계산): {e}")
+            return SessionState(session, self.periods), None
+
+    def _session_rows(self, symbol, session, limit):
+        rows = self._seeder(symbol, limit) or []
+        return [r for r in rows if session_date_of(_parse_ts(r["recorded_at"]).astimezone(KST)) == session]
+
+    @staticmethod
+    def _minute(row):
+        ts = int(_parse_ts(row["recorded_at"]).timestamp())
+        return ts - ts % 60
+
+    def update(self, row):
+        """샘플 1개 반영 -> analytics dict (복원 중인 종목이면 None)"""
+        symbol = row["symbol"]
+        price = float(row["price"])
+        volume = int(row.get("volume") or 0)
+        ts = _parse_ts(row["recorded_at"])
+        session = session_date_of(ts.astimezone(KST))
+        sample = (ts, self._minute(row), price, volume, session)
+        with self._lock:
+            pending = self._pending.get(symbol)
+            if pending is not None:
+                pending.append(sample)
+                return None
+            state = self._states.get(symbol)
+            if state is None or state.session != session:
+                if self._seeder and symbol not in self._seeded:
+                    # 프로세스 시작 후 첫 샘플: 저장된 행으로 복원 (DB 조회는 틱 밖에서)
+                    self._seeded.add(symbol)
+                    self._pending[symbol] = [sample]
+                    thread = self._seeding[symbol] = threading.Thread(
+                        target=self._seed, args=(symbol, session), name="analytics-seed", daemon=True)
+                    thread.start()
+                    return None
+                state = self._states[symbol] = SessionState(session, self.periods)
+            state.add(sample[1], price, volume)
+            result = {
+                "session": session.isoformat(),
+                "open": state.open, "high": state.high, "low": state.low,
+                "vwap": _round(state.vwap(), 4), "vwap_volume": state.vwap_volume,
+                "sma": state.ma.values(),
+            }
+
+        ref = self._reference(symbol) if self._reference else None
+        close = (ref or {}).get("close")
+        spot = (ref or {}).get("spot_close")
+        result.update({
+            "base": close,
+            "gap": _round(price - close) if close else None,
+            "gap_pct": _round((price / close - 1) * 100) if close else None,
+            "implied_kospi200": _round(spot * price / close) if close and spot else None,
+        })
+        return result
+
+
+class SpotCloseCache:
+    """
+    세션별 코스피200 주간 종가 캐시. 수집 경로를 막지 않도록 get()은 캐시만 읽고,
+    비어 있으면 백그라운드에서 fetcher()를 호출한다 (실패 시 retry초 후 재시도).
+    """
+
+    def __init__(self, fetcher, retry=300):
+        self._fetcher = fetcher
+        self.retry = retry
+        self._lock = threading.Lock()
+        self._values = {}
+        self._attempted = {}
+
+    def refresh(self, session):
+        value = self._fetcher()
+        if value:
+            with self._lock:
+                self._values = {session: value}
+        return value
+
+    def get(self, session):
+        with self._lock:
+            if session in self._values:
+                return self._values[session]
+            last = self._attempted.get(session)
+            if last is not None and time.monotonic() - last < self.retry:
+                return None
+            self._attempted = {session: time.monotonic()}
+        threading.Thread(target=self._refresh_quietly, args=(session,), name="spot-close", daemon=True).start()
+        return None
+
+    def _refresh_quietly(self, session):
+        try:
+            self.refresh(session)
+        except Exception as e:
+            print(f"⚠️ 코스피200 주간 종가 조회 실패: {e}")
@@ -1,13 +1,35 @@
 import os
+import math
 import time
-import requests
+import http_client
 import json
+import threading
 from datetime import datetime, timedelta
 import pytz
-from supabase import create_client, Client
 from dotenv import load_dotenv
 import sys
-from revalidate import revalidate_path
+from concurrent.futures import ThreadPoolExecutor, wait
+from revalidate import RevalidateDispatcher, REVALIDATE_SECRET, BASE_URL as FRONTEND_URL
+from master_cache import MasterCache, KST, session_date_of
+from pipeline import Pipeline, Stage, DROP_OLDEST
+from spool import Spool, SpoolFlusher, SPOOL_UPSERT
+from bars import BarAggregator, BARS_TABLE, BARS_ENABLED, PERSIST_PARTIAL
+from snapshot import SnapshotPublisher, SNAPSHOT_TABLE, SNAPSHOT_ENABLED
+from token_manager import TokenManager
+from retention import RetentionManager
+from rate_limiter import get_scheduler, PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+from session_calendar import get_calendar
+from ls_stream import RealtimeFeed
+from hedge import Hedger
+import lease
+from backfill import GapDetector, Backfiller, BACKFILL_ENABLED, BACKFILL_PATH, BACKFILL_SLICE
+from analytics import AnalyticsEngine, SpotCloseCache, ANALYTICS_ENABLED
+from read_api import ReadApi
+from session_store import open_store
+import deadline as tick_deadline
+from deadline import DeadlineExceeded
+import metrics
+from metrics import span, log_event, TICKS, RETRIES, DROPPED, CLEANUP_ROWS, DEADLINE_MISSES
 
 # 1. 환경변수 및 기본 설정
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
@@ -18,10 +40,38 @@ LS_APP_KEY = os.getenv("LS_APP_KEY")
 LS_APP_SECRET = os.getenv("LS_APP_SECRET")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-BASE_URL = "https://openapi.ls-sec.co.kr:8080"
+BASE_URL = os.getenv("LS_BASE_URL", "https://openapi.ls-sec.co.kr:8080").rstrip("/")
+# 수집 주기(초). 60 미만이면 분 내 고가/저가를 바(OHLCV)로 집계 (예: 5)
+# 매분 :01초 수집을 유지하도록 60의 약수만 허용 (1, 2, 3, 4, 5, 6, 10, 12, 15, 20, 30, 60)
+POLL_INTERVAL = int(os.getenv("POLL_INTERVAL", "60"))
+if POLL_INTERVAL <= 0 or 60 % POLL_INTERVAL:
+    raise ValueError(f"POLL_INTERVAL은 60의 약수(초)여야 합니다: {POLL_INTERVAL}")
+# 1이면 근월물뿐 아니라 마스터의 코스피200 선물 전 종목을 동시에 수집 (기간구조 / 캘린더 스프레드)
+COLLECT_ALL_CONTRACTS = os.getenv("COLLECT_ALL_CONTRACTS", "0") == "1"
+MULTI_SYMBOL_WORKERS = int(os.getenv("MULTI_SYMBOL_WORKERS", "4"))
+MULTI_SYMBOL_DEADLINE = float(os.getenv("MULTI_SYMBOL_DEADLINE", "45"))  # 초, 1분 틱 안에 끝나야 함
+# 틱 1회(토큰 / 마스터 / 시세 조회 전체)에 허용하는 시간(초). 넘기면 남은 요청은 버리고 다음 틱으로
+TICK_DEADLINE = float(os.getenv("TICK_DEADLINE", "15"))
+# 1이면 LS 실시간 체결(WebSocket)을 구독하고, 피드가 조용할 때만 REST(t8456)로 조회
+STREAM_MODE = os.getenv("STREAM_MODE", "0") == "1"
 
-# Supabase 연결
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# 개장 몇 초 전에 토큰 / 마스터 / 커넥션 / DB 클라이언트를 미리 준비할지
+WARMUP_LEAD = int(os.getenv("WARMUP_LEAD", "60"))
+# 개장 전에 미리 열어 둘 LS 커넥션 수 (전 종목 수집 시 워커 수만큼)
+WARMUP_CONNECTIONS = MULTI_SYMBOL_WORKERS if COLLECT_ALL_CONTRACTS else 1
+
+# Supabase 연결 (첫 사용 시 생성 - import / pm2 재시작 시간 단축)
+_supabase = None
+_supabase_lock = threading.Lock()
+
+def get_supabase():
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                from supabase import create_client
+                _supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase
 
 # 환경변수 확인
 if not all([LS_APP_KEY, LS_APP_SECRET, SUPABASE_URL, SUPABASE_KEY]):
@@ -29,142 +79,157 @@ if not all([LS_APP_KEY, LS_APP_SECRET, SUPABASE_URL, SUPABASE_KEY]):
 else:
     print("✅ 환경변수 로드 완료")
 
-# 전역 변수 (토큰 재사용)
-CURRENT_TOKEN = None
-
 # ------------------------------------------------------------------
-# 🔑 1. 토큰 관리
+# 🔑 1. 토큰 관리 (디스크 공유 + 만료 전 선제 갱신)
 # ------------------------------------------------------------------
-def get_access_token():
-    url = f"{BASE_URL}/oauth2/token"
-    headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "grant_type": "client_credentials",
-        "appkey": LS_APP_KEY,
-        "appsecretkey": LS_APP_SECRET,
-        "scope": "oob"
-    }
-    res = requests.post(url, headers=headers, data=data, timeout=10)
-    if res.status_code == 200:
-        return res.json()["access_token"]
-    raise Exception(f"Token fetch failed: {res.text}")
+TOKEN_MANAGER = TokenManager(BASE_URL, LS_APP_KEY, LS_APP_SECRET)
 
 # ------------------------------------------------------------------
 # ⏰ 2. 시간 및 청소 로직 (수정됨)
 # ------------------------------------------------------------------
-def is_market_open():
-    """지금이 야간선물 장 운영 시간(18:00 ~ 06:00)인지 체크 및 주말/휴일 제외"""
-    kst = pytz.timezone('Asia/Seoul')
-    now = datetime.now(kst)
-    wd = now.weekday()  # 월:0, 화:1, ..., 금:4, 토:5, 일:6
-    hr = now.hour
-    mn = now.minute
-
-    # 1. 주말 차단 (토요일 06:01 ~ 월요일 17:59)
-    # 토요일 아침 6시 이후
-    if wd == 5 and (hr > 6 or (hr == 6 and mn > 0)):
-        return False
-    # 일요일 전체
-    if wd == 6:
-        return False
-    # 월요일 오후 6시 이전
-    if wd == 0 and hr < 18:
-        return False
+# 휴장일 / 특수 일정을 반영해 미리 계산한 세션 구간 (krx_calendar.json)
+CALENDAR = get_calendar()
+
+def is_market_open(now=None):
+    """지금이 야간선물 장 운영 시간(18:00 ~ 06:00, 휴장일 제외)인지 체크"""
+    return CALENDAR.is_open(now)
 
-    # 2. 운영 시간 체크 (18:00 ~ 06:00)
-    # [수정됨] 새벽 06:00:59까지 허용하여 6시 정각 데이터를 수집하도록 함
-    if hr >= 18 or hr < 6 or (hr == 6 and mn == 0):
-        return True
-        
-    return False
+# 장외 대기 중 한 번에 자는 최대 시간 (시계 보정 / 캘린더 파일 수정 반영용)
+IDLE_SLEEP_CAP = 3600
+
+# 최신 1440개를 넘는 행은 세션별 압축 파일(archive/)에 보관한 뒤 작은 배치로 삭제
+# (minute_bucket 마이그레이션 전에는 recorded_at 기준으로 정렬 / 삭제)
+RETENTION = RetentionManager(get_supabase, "market_night_futures", keep=1440,
+                             key="minute_bucket" if SPOOL_UPSERT else "recorded_at")
 
 def manage_data_limit(limit=1440):
     """
-    [수정됨] 날짜 기준이 아니라 '개수' 기준으로 삭제
-    - 최신 데이터 limit(1440)개만 남기고 나머지는 삭제
+    [수정됨] 날짜 기준이 아니라 '개수' 기준으로 정리
+    - 종목별 최신 데이터 limit(1440)개만 DB에 남김 (전 종목 수집 시에도 종목마다 1440분)
+    - 넘치는 과거 데이터는 삭제 전에 로컬 아카이브로 내보냄 (retention.query_archive로 조회)
     - 주말/휴일에도 데이터가 사라지지 않도록 보호
     """
     try:
-        # 1. limit번째(1441번째) 레코드의 시간 찾기 (내림차순 정렬)
-        # range(start, end)는 0부터 시작하므로 range(1440, 1440)은 1441번째 데이터를 의미함
-        res = supabase.table("market_night_futures") \
-            .select("recorded_at") \
-            .order("recorded_at", desc=True) \
-            .range(limit, limit) \
-            .execute()
-        
-        # 1441번째 데이터가 존재한다면 (즉, 데이터가 1440개를 초과했다면)
-        if res.data and len(res.data) > 0:
-            cutoff_time = res.data[0]['recorded_at']
-            print(f"🧹 데이터 정리 시작 (최신 {limit}개 유지, 기준: {cutoff_time} 및 이전 삭제)...")
-            
-            # 2. 해당 시간보다 작거나 같은(lte) 데이터 삭제 (= 오래된 데이터 삭제)
-            supabase.table("market_night_futures") \
-                .delete() \
-                .lte("recorded_at", cutoff_time) \
-                .execute()
-                
-            print("✅ 데이터 정리 완료")
-        else:
-            # 데이터가 아직 1440개 안됨
-            pass
-            
+        RETENTION.keep = limit
+        with span("cleanup"):
+            CLEANUP_ROWS.inc(RETENTION.run())
     except Exception as e:
         print(f"⚠️ 데이터 정리 실패: {e}")
 
 # ------------------------------------------------------------------
 # 📡 3. 핵심 데이터 수집 (Safe Mode)
 # ------------------------------------------------------------------
-def get_night_futures_price_safe(max_retries=3):
-    global CURRENT_TOKEN
-    
-    if not CURRENT_TOKEN:
-        CURRENT_TOKEN = get_access_token()
+def _ls_headers(tr_cd, tr_cont="N", tr_cont_key=""):
+    return {
+        "content-type": "application/json; charset=UTF-8",
+        "authorization": f"Bearer {TOKEN_MANAGER.get_token()}",
+        "tr_cd": tr_cd,
+        "tr_cont": tr_cont,
+        "tr_cont_key": tr_cont_key,
+        "mac_address": "000000000000"
+    }
+
+def _is_token_expired(res):
+    return res.status_code == 401 or "유효하지 않은 토큰" in res.text
+
+# TR별 초당 요청 제한을 지키는 공용 스케줄러 (LS_RATE_LIMITS)
+SCHEDULER = get_scheduler()
+
+def _ls_post(tr_cd, body, priority=PRIORITY_NORMAL, path="/futureoption/market-data",
+             tr_cont="N", tr_cont_key=""):
+    """
+    TR 호출 (기본: market-data). 스케줄러 차례가 왔을 때 헤더(토큰)를 만들어 전송하며,
+    토큰 만료 응답이면 요청에 실제로 쓴 토큰을 기준으로 1회 재발급 후 재시도.
+    연속 조회는 응답 헤더의 tr_cont / tr_cont_key를 그대로 넘김.
+    """
+    send = lambda: http_client.post(f"{BASE_URL}{path}", 
+                                    headers=_ls_headers(tr_cd, tr_cont, tr_cont_key), 
+                                    json=body)
+    with span(tr_cd):
+        res = SCHEDULER.call(tr_cd, send, priority)
+        if _is_token_expired(res):
+            # 동시에 여러 워커가 만료를 감지해도 같은 토큰에 대해서는 1회만 재발급
+            RETRIES.inc(tr_cd=tr_cd, reason="token_expired")
+            used = res.request.headers.get("authorization", "")[len("Bearer "):]
+            TOKEN_MANAGER.invalidate(bad_token=used)
+            res = SCHEDULER.call(tr_cd, send, priority)
+    return res
+
+def fetch_master_list():
+    """[Step 1] t8432 마스터 조회 - 캐시 미스(세션 변경/롤오버/강제 갱신) 때만 호출"""
+    res = _ls_post("t8432", {"t8432InBlock": {"gubun": "0"}})
+
+    master_list = res.json().get("t8432OutBlock", [])
+    if not master_list:
+        # 토큰은 401 응답일 때만 재발급하므로 여기서는 초기화하지 않음 (다음 틱에 마스터 재조회)
+        print("⚠️ API 't8432OutBlock' 응답이 비어있습니다.")
+    else:
+        save_store_state(master=master_list, master_at=datetime.now(KST).isoformat())
+    return master_list
+
+# 세션당 1회만 t8432를 조회하고 근월물을 재사용
+MASTER_CACHE = MasterCache(fetch_master_list)
+
+# ------------------------------------------------------------------
+# 🗄️ 1.5 세션 저장소 (재시작 시 마스터 / 최근 시계열을 로컬 파일에서 복원)
+# ------------------------------------------------------------------
+STORE = open_store()
+STORE_MAX_AGE = 600   # 저장소의 마지막 샘플이 이보다 오래됐으면 (긴 중단) DB에서 시드
+
+def save_store_state(**updates):
+    if STORE is None:
+        return
+    try:
+        STORE.save_state(**updates)
+    except Exception as e:
+        print(f"⚠️ 세션 저장소 상태 기록 실패: {e}")
+
+def restore_from_store(now=None):
+    """같은 세션에 저장된 마스터가 있으면 t8432 없이 캐시를 채움"""
+    if STORE is None:
+        return False
+    started = time.perf_counter()
+    now = now or datetime.now(KST)
+    master, saved_at = STORE.state.get("master"), STORE.state.get("master_at")
+    if not master or not saved_at or \
+            session_date_of(datetime.fromisoformat(saved_at).astimezone(KST)) != session_date_of(now):
+        return False
+    front = MASTER_CACHE.load(master, now=now)
+    print(f"🗄️ 세션 저장소에서 복원: 근월물 {front['hname'] if front else '-'}, 마스터 {len(master)}종목, "
+          f"샘플 {len(STORE)}건 ({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return True
+
+def recent_rows(symbol, limit, columns):
+    """
+    종목의 최근 행 (최신순). 세션 저장소가 최근까지 채워져 있으면 로컬 파일에서,
+    비어 있거나 오래됐으면 (첫 실행, 긴 중단) Supabase에서 조회.
+    """
+    if STORE is not None and symbol:
+        rows = STORE.rows(symbol, limit)
+        if rows and (datetime.now(pytz.utc) - datetime.fromisoformat(rows[0]["recorded_at"])).total_seconds() \
+                < STORE_MAX_AGE:
+            return rows
+    query = get_supabase().table("market_night_futures").select(columns)
+    if symbol:
+        query = query.eq("symbol", symbol)
+    return query.order("recorded_at", desc=True).limit(limit).execute().data
+
+# 근월물 t8456이 최근 p90 지연을 넘기면 복제 요청을 보내고 먼저 온 응답 사용
+HEDGER = Hedger("t8456")
+
+def fetch_price_hedged(focode):
+    return HEDGER.call(lambda: _ls_post("t8456", {"t8456InBlock": {"focode": focode}}, priority=PRIORITY_HIGH))
 
+def get_night_futures_price_safe(max_retries=3):
+    force_refresh = False
     for attempt in range(max_retries):
         try:
-            headers = {
-                "content-type": "application/json; charset=UTF-8",
-                "authorization": f"Bearer {CURRENT_TOKEN}",
-                "tr_cd": "t8432",
-                "tr_cont": "N",
-                "tr_cont_key": "",
-                "mac_address": "000000000000"
-            }
-            
-            # [Step 1] 마스터 조회
-            res = requests.post(f"{BASE_URL}/futureoption/market-data", 
-                                headers=headers, 
-                                json={"t8432InBlock": {"gubun": "0"}},
-                                timeout=10)
-            
-            if res.status_code == 401 or "유효하지 않은 토큰" in res.text:
-                print("🔄 토큰 만료! 재발급 시도...")
-                CURRENT_TOKEN = get_access_token()
-                continue
-                
-            master_list = res.json().get("t8432OutBlock", [])
-            if not master_list:
-                print("⚠️ API 't8432OutBlock' 응답이 비어있습니다. (토큰 세션 의심, 초기화 시도)")
-                # 데이터가 비어있다면 토큰 세션 문제일 확률이 높으므로 초기화
-                CURRENT_TOKEN = None 
-                return None
-            
-            target = next((item for item in master_list 
-                           if item["hname"].startswith("F ") and (item["shcode"].startswith("A01") or item["shcode"].startswith("101"))), None)
-            
+            target = MASTER_CACHE.get_front_month(force=force_refresh)
             if not target: 
-                # print(f"DEBUG: Found {len(master_list)} items, but none matching 'F ' and 'A01/101'")
                 return None
 
             # [Step 2] 시세 조회
-            focode = target["shcode"]
-            headers["tr_cd"] = "t8456"
-            
-            res_price = requests.post(f"{BASE_URL}/futureoption/market-data", 
-                                      headers=headers, 
-                                      json={"t8456InBlock": {"focode": focode}},
-                                      timeout=10)
+            res_price = fetch_price_hedged(target["shcode"])
             
             data = res_price.json().get("t8456OutBlock")
             if data:
@@ -175,132 +240,536 @@ def get_night_futures_price_safe(max_retries=3):
                     "diff": float(data["diff"]),
                     "volume": int(data["volume"])
                 }
+
+            # 종목코드가 거부된 경우 (롤오버 등) 마스터를 강제 갱신 후 1회 재시도
+            if not force_refresh:
+                print(f"⚠️ {target['hname']} 시세 데이터(t8456OutBlock)를 받지 못했습니다. 마스터 강제 갱신 후 재시도...")
+                RETRIES.inc(tr_cd="t8456", reason="empty")
+                force_refresh = True
+                continue
             
             print(f"⚠️ {target['hname']} 시세 데이터(t8456OutBlock)를 받지 못했습니다.")
             return None
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"⚠️ API 호출 실패 ({attempt+1}/{max_retries}): {e}")
-            time.sleep(2)
+            RETRIES.inc(tr_cd="t8456", reason="error")
             if attempt == max_retries - 1:
-                CURRENT_TOKEN = None
                 return None
+            # 재시도 대기도 틱 마감 안에서
+            tick_deadline.sleep(2, where="retry")
+
+# ------------------------------------------------------------------
+# 📡 3-2. 전 종목 동시 수집 (COLLECT_ALL_CONTRACTS=1)
+# ------------------------------------------------------------------
+PRICE_EXECUTOR = ThreadPoolExecutor(max_workers=MULTI_SYMBOL_WORKERS, thread_name_prefix="t8456")
+
+def fetch_contract_price(target):
+    """종목 1개 t8456 시세 조회 (워커 스레드에서 실행)"""
+    # 근월물은 실시간 우선순위, 나머지 종목은 일반 우선순위로 스케줄링
+    # 근월물만 헤지 요청 대상 (원월물까지 복제하면 t8456 요청 제한을 빨리 소진)
+    front = MASTER_CACHE.front
+    if front and target["shcode"] == front["shcode"]:
+        res_price = fetch_price_hedged(target["shcode"])
+    else:
+        res_price = _ls_post("t8456", {"t8456InBlock": {"focode": target["shcode"]}}, priority=PRIORITY_NORMAL)
+
+    data = res_price.json().get("t8456OutBlock")
+    if not data:
+        return None
+    return {
+        "symbol": target["hname"],
+        "price": float(data["price"]),
+        "change": float(data["change"]),
+        "diff": float(data["diff"]),
+        "volume": int(data["volume"])
+    }
+
+def get_all_night_futures_prices(deadline=MULTI_SYMBOL_DEADLINE):
+    """
+    마스터의 코스피200 선물 전 종목 시세를 워커 풀로 동시에 조회.
+    deadline(또는 더 이른 틱 마감) 안에 끝나지 않은 종목은 이번 틱에서 제외 (만기 순 정렬, 첫 번째가 근월물)
+    """
+    try:
+        contracts = MASTER_CACHE.get_futures()
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"⚠️ 마스터 조회 실패: {e}")
+        return []
+    if not contracts:
+        return []
+
+    # 워커도 같은 틱 마감을 이어받아 요청 timeout / 대기열 대기를 제한
+    futures = {PRICE_EXECUTOR.submit(tick_deadline.wrap(fetch_contract_price), c): c for c in contracts}
+    done, not_done = wait(futures, timeout=tick_deadline.cap(deadline))
+    for f in not_done:
+        f.cancel()
+    if not_done:
+        DROPPED.inc(len(not_done), where="deadline")
+        if tick_deadline.remaining(default=1) <= 0:
+            DEADLINE_MISSES.inc(where="multi")
+        print(f"⚠️ {len(not_done)}개 종목이 마감 안에 응답하지 않아 이번 틱에서 제외합니다.")
+
+    rows = []
+    for f in done:
+        try:
+            row = f.result()
+        except DeadlineExceeded:
+            DROPPED.inc(where="deadline")
+            continue
+        except Exception as e:
+            print(f"⚠️ {futures[f]['hname']} 시세 조회 실패: {e}")
+            continue
+        if row:
+            rows.append(row)
+
+    order = {c["hname"]: i for i, c in enumerate(contracts)}
+    return sorted(rows, key=lambda row: order[row["symbol"]])
+
+def compute_calendar_spreads(rows):
+    """만기 순으로 인접한 두 종목 간 스프레드 (원월물 - 근월물)"""
+    spreads = []
+    for near, far in zip(rows, rows[1:]):
+        spreads.append({
+            "near": near["symbol"],
+            "far": far["symbol"],
+            "near_price": near["price"],
+            "far_price": far["price"],
+            "spread": round(far["price"] - near["price"], 2),
+            "recorded_at": near["recorded_at"],
+            "minute_bucket": near["minute_bucket"],
+        })
+    return spreads
+
+# ------------------------------------------------------------------
+# 📶 3-3. 실시간 체결 피드 (STREAM_MODE=1)
+# ------------------------------------------------------------------
+def stream_contracts():
+    """구독 대상: 전 종목 수집이면 만기 전 전 종목, 아니면 근월물"""
+    if COLLECT_ALL_CONTRACTS:
+        return MASTER_CACHE.get_futures()
+    front = MASTER_CACHE.get_front_month()
+    return [front] if front else []
+
+FEED = RealtimeFeed(stream_contracts, TOKEN_MANAGER) if STREAM_MODE else None
+
+# 리더 리스 (LEASE_BACKEND=none이면 None: 수집기 1대 운영)
+LEASE = lease.from_env(get_supabase)
+
+
+def is_leader():
+    """이 수집기가 시세를 조회 / 기록할 차례인지 (리스를 쓰지 않으면 항상 True)"""
+    return LEASE is None or LEASE.is_leader()
+
+def get_stream_prices():
+    """
+    피드의 최신 체결로 이번 틱 행을 구성 (REST 호출 없음).
+    피드가 조용하거나 근월물 체결이 없으면 None → REST 폴링으로 대체
+    """
+    if FEED is None or not FEED.is_live():
+        return None
+    front = MASTER_CACHE.front
+    latest = FEED.snapshot()
+    if not front or front["hname"] not in latest:
+        return None
+    if not COLLECT_ALL_CONTRACTS:
+        return latest[front["hname"]], [latest[front["hname"]]]
+    rows = [latest[c["hname"]] for c in MASTER_CACHE.get_futures() if c["hname"] in latest]
+    return latest[front["hname"]], rows
+
+# ------------------------------------------------------------------
+# 💾 3.5 저장 / 갱신 단계 (수집 루프와 분리된 워커 스레드)
+# ------------------------------------------------------------------
+# On-Demand Revalidation: REVALIDATE_PATHS / REVALIDATE_TAGS 대상을 병합하여 백그라운드 전송
+REVALIDATOR = RevalidateDispatcher()
+
+# 샘플은 먼저 로컬 스풀에 기록 → 플러셔가 모아서 Supabase에 upsert (장애 시 자동 재전송)
+# DB에 반영된 뒤에 페이지를 갱신해야 하므로 갱신 요청은 플러시 완료 시점에 보냄
+SPOOL = Spool()
+SPOOL_FLUSHER = SpoolFlusher(SPOOL, get_supabase, on_flushed=lambda n: REVALIDATOR.notify())
+
+# 분 내 샘플을 1m/5m/15m OHLCV 바로 집계 → 완성된 바만 스풀에 기록
+BARS = BarAggregator()
+
+def persist_bars(bars):
+    if BARS_ENABLED:
+        for bar in bars:
+            SPOOL.append(bar, table=BARS_TABLE)
+    READ_API.publish_bars(bars)
+
+def aggregate_sample(market_data):
+    persist_bars(BARS.add(market_data))
+    if PERSIST_PARTIAL and BARS_ENABLED:
+        # 진행 중인 바도 같은 키로 덮어쓰며 저장 (완성 시 최종값으로 교체됨)
+        persist_bars(BARS.current())
+
+def seed_snapshot():
+    """스냅샷 윈도우 초기값: 근월물 최근 행 (프로세스 시작 후 첫 샘플 때 1회만 조회)"""
+    front = MASTER_CACHE.front
+    return recent_rows(front["hname"] if front else None, SNAPSHOT.snapshot.window // 60,
+                       "symbol,price,change,diff,volume,recorded_at")
+
+# 근월물 롤링 윈도우 → 압축 차트 스냅샷 1행 (페이지는 1440행 대신 이 행만 조회)
+SNAPSHOT = SnapshotPublisher(
+    sink=lambda row: SPOOL.append(row, table=SNAPSHOT_TABLE),
+    symbol_getter=lambda: MASTER_CACHE.front["hname"] if MASTER_CACHE.front else None,
+    seeder=seed_snapshot)
+
+def seed_read_api(symbol, limit):
+    """읽기 API 윈도우 초기값: 종목별 최근 행 (프로세스 시작 후 종목별 첫 행 때 1회만 조회)"""
+    return recent_rows(symbol, limit, "*")
+
+# 메모리 윈도우를 서빙하는 로컬 읽기 API + SSE (READ_API_PORT, 기본 127.0.0.1:9110)
+READ_API = ReadApi(
+    symbol_getter=lambda: MASTER_CACHE.front["hname"] if MASTER_CACHE.front else None,
+    seeder=seed_read_api)
+
+# 추가 sink(바 집계, 스냅샷 등)를 등록하는 워커 파이프라인
+PIPELINE = Pipeline([
+    Stage.from_env("bars", aggregate_sample, default_size=1000, default_policy=DROP_OLDEST),
+    # 최신 값만 의미 있으므로 밀리면 오래된 샘플부터 버림 (스냅샷 테이블이 있을 때만)
+    *([Stage.from_env("snapshot", SNAPSHOT, default_size=100, default_policy=DROP_OLDEST)]
+      if SNAPSHOT_ENABLED else []),
+    # 읽기 API 윈도우 / SSE 구독자 전달 (구독자가 많아도 틱 루프는 큐에 넣기만 함)
+    Stage.from_env("read_api", READ_API.publish_row, default_size=100, default_policy=DROP_OLDEST),
+])
+
+# ------------------------------------------------------------------
+# 📐 3.7 수집 시점 파생 지표 (VWAP / 이동평균 / 주간 종가 대비 갭 / 코스피200 예상 시가)
+# ------------------------------------------------------------------
+def fetch_kospi200_close():
+    """t1511 업종현재가(코스피200)의 주간 종가 - 야간 세션 중에는 당일 정규장 종가"""
+    res = _ls_post("t1511", {"t1511InBlock": {"upcode": "101"}}, path="/indtp/market-data")
+    data = res.json().get("t1511OutBlock") or {}
+    return float(data["pricejisu"]) if data.get("pricejisu") else None
+
+SPOT_CLOSE = SpotCloseCache(fetch_kospi200_close)
+
+def analytics_reference(symbol):
+    item = MASTER_CACHE.get(symbol) or {}
+    close = float(item.get("jnilclose") or item.get("recprice") or 0) or None
+    session = MASTER_CACHE.session_date
+    return {"close": close, "spot_close": SPOT_CLOSE.get(session) if session else None}
+
+def analytics_seed(symbol, limit):
+    """재시작 후 종목별 1회 (백그라운드 스레드): 최근 행(최신순)으로 누적 상태 복원"""
+    # 세션 저장소 행에는 analytics가 없으므로 세션 전체를 로컬에서 다시 계산 (DB 조회 없음)
+    return recent_rows(symbol, limit, "symbol,price,volume,recorded_at,analytics")
+
+ANALYTICS = AnalyticsEngine(reference=analytics_reference, seeder=analytics_seed)
+
+def add_analytics(rows):
+    """행마다 analytics 컬럼 추가 (복원 중이거나 계산 실패 시 null로 저장하고 수집은 계속)"""
+    if not ANALYTICS_ENABLED:
+        return rows
+    for row in rows:
+        try:
+            row["analytics"] = ANALYTICS.update(row)
+        except Exception as e:
+            print(f"⚠️ {row.get('symbol')} 파생 지표 계산 실패: {e}")
+            row["analytics"] = None
+    return rows
+
+def with_analytics_column(rows):
+    """일괄 upsert는 행마다 컬럼이 같아야 하므로 analytics가 없는 행(백필)은 null로 채움"""
+    if ANALYTICS_ENABLED:
+        for row in rows:
+            row.setdefault("analytics", None)
+    return rows
+
+# ------------------------------------------------------------------
+# 🩹 3.8 누락 구간 백필 (리더만, 틱 사이 남는 시간에 백필 스레드에서 실행)
+# ------------------------------------------------------------------
+def backfill_reference(gap):
+    """누락 구간 직전 / 직후의 같은 세션 저장 행 (누적 거래량 / 전일대비 기준)"""
+    def query():
+        return get_supabase().table("market_night_futures") \
+            .select("price,change,volume,minute_bucket").eq("symbol", gap["symbol"])
+    before = query().gte("minute_bucket", gap["session"].isoformat()) \
+        .lt("minute_bucket", gap["start"].isoformat()) \
+        .order("minute_bucket", desc=True).limit(1).execute().data
+    after = query().gt("minute_bucket", gap["end"].isoformat()) \
+        .lt("minute_bucket", gap["session_close"].isoformat()) \
+        .order("minute_bucket").limit(1).execute().data
+    return (before[0] if before else None), (after[0] if after else None)
+
+def _shcode_of(symbol):
+    item = MASTER_CACHE.get(symbol)
+    return item["shcode"] if item else None
+
+BACKFILL = Backfiller(
+    GapDetector(get_supabase, CALENDAR,
+                master_items=lambda: MASTER_CACHE.get_futures() if MASTER_CACHE.front else []),
+    post=lambda tr_cd, body, tr_cont, tr_cont_key: _ls_post(
+        tr_cd, body, priority=PRIORITY_LOW, path=BACKFILL_PATH, tr_cont=tr_cont, tr_cont_key=tr_cont_key),
+    shcode_of=_shcode_of,
+    reference=backfill_reference,
+    # 파이프라인(바 / 스냅샷)은 실시간 순서를 가정하므로 스풀에만 기록
+    sink=lambda rows: SPOOL.append_many(with_analytics_column(rows)))
+
+def run_backfill(budget):
+    """백필 스레드에 budget초를 넘기고 바로 반환 (DB 조회 / 분봉 조회가 틱 루프를 막지 않음)"""
+    if not BACKFILL_ENABLED or not is_leader():
+        return
+    BACKFILL.kick(min(budget, BACKFILL_SLICE))
+
+# 스크레이프 시점의 큐 깊이 / 스풀 적체 / TR별 현재 속도
+SPOOL_DEPTH = metrics.REGISTRY.gauge("spool_depth", "Supabase 전송 대기 중인 스풀 행 수")
+QUEUE_DEPTH = metrics.REGISTRY.gauge("pipeline_queue_depth", "파이프라인 단계별 큐 깊이")
+LS_RATE = metrics.REGISTRY.gauge("ls_scheduler_rate", "TR별 현재 허용 속도(초당)")
+LS_QUEUE = metrics.REGISTRY.gauge("ls_scheduler_queue_depth", "TR별 호출 대기 수")
+
+def collect_gauges():
+    SPOOL_DEPTH.set(SPOOL.depth())
+    for name, stats in PIPELINE.stats().items():
+        QUEUE_DEPTH.set(stats["depth"], stage=name)
+    for tr_cd, stats in SCHEDULER.stats().items():
+        LS_RATE.set(stats["rate"], tr_cd=tr_cd)
+        LS_QUEUE.set(stats["depth"], tr_cd=tr_cd)
+
+metrics.REGISTRY.register_collector(collect_gauges)
+
+def seconds_until_next_poll(now, interval=POLL_INTERVAL):
+    """
+    다음 수집 시각까지 남은 초 (분 경계 기준 interval 주기 + 1초, Drift 방지).
+    interval은 60의 약수라서 매분 :01초가 항상 수집 시각에 포함된다.
+    """
+    base = now.replace(second=0, microsecond=0)
+    elapsed = (now - base).total_seconds()
+    target_next_run = base + timedelta(seconds=(math.floor(elapsed - 1) // interval + 1) * interval + 1)
+    return max((target_next_run - now).total_seconds(), 0)
+
+# ------------------------------------------------------------------
+# 🧩 3.6 틱 단위 수집 / 기록 (메인 루프와 리플레이 하네스에서 공용)
+# ------------------------------------------------------------------
+def fetch_tick(budget=None):
+    """
+    이번 틱 시세 수집. (근월물 행, 전체 종목 행 목록) 반환.
+    토큰 발급 / 마스터 조회 / 시세 조회 전체가 budget(기본 TICK_DEADLINE)초 안에 끝나야 하며,
+    넘기면 남은 요청을 버리고 (None, [])를 반환한다.
+    """
+    streamed = get_stream_prices()
+    if streamed:
+        return streamed
+    try:
+        with tick_deadline.bound(budget or TICK_DEADLINE):
+            return _fetch_tick_rest()
+    except DeadlineExceeded as e:
+        DEADLINE_MISSES.inc(where=e.where)
+        print(f"⏳ 틱 마감({budget or TICK_DEADLINE:.0f}초) 초과 - {e.where} 단계에서 중단, 이번 틱은 건너뜁니다.")
+        log_event("deadline_miss", where=e.where)
+        return None, []
+
+def _fetch_tick_rest():
+    if COLLECT_ALL_CONTRACTS:
+        contract_rows = get_all_night_futures_prices()
+        front = MASTER_CACHE.front
+        # 거래량 확인 / 로그는 근월물 기준
+        market_data = next((row for row in contract_rows
+                            if front and row["symbol"] == front["hname"]), None)
+    else:
+        market_data = get_night_futures_price_safe()
+        contract_rows = [market_data] if market_data else []
+    return market_data, contract_rows
+
+def record_tick(contract_rows):
+    """수집 시각을 찍고 스풀에 기록한 뒤 파이프라인으로 전달"""
+    # 수집 시각을 기록해 두어야 저장이 지연되어도 시계열이 밀리지 않음
+    recorded_at = datetime.now(pytz.utc).isoformat()
+    for row in contract_rows:
+        row["recorded_at"] = recorded_at
+    add_analytics(contract_rows)
+    if STORE is not None:
+        try:
+            STORE.append(contract_rows)
+        except Exception as e:
+            print(f"⚠️ 세션 저장소 기록 실패: {e}")
+    
+    # 로컬 스풀에 먼저 기록 (종목별 1행을 한 트랜잭션으로, DB 전송 / 갱신은 백그라운드)
+    with span("spool", rows=len(contract_rows)):
+        contract_rows = SPOOL.append_many(contract_rows)
+        if len(contract_rows) > 1:
+            SPOOL.append_many(compute_calendar_spreads(contract_rows), table="market_night_futures_spreads")
+    for row in contract_rows:
+        PIPELINE.publish(row)
+    return contract_rows
+
+def warm_up(session_open):
+    """
+    개장 전 준비: 토큰 발급 → 근월물 확정 → LS / 갱신 커넥션 풀 → DB 클라이언트.
+    실패한 단계는 건너뛰며, 개장 후 첫 틱에서 평소처럼 다시 시도된다.
+    """
+    steps = [
+        ("token", TOKEN_MANAGER.get_token),
+        ("master", lambda: MASTER_CACHE.get_futures(now=session_open) if COLLECT_ALL_CONTRACTS
+                           else MASTER_CACHE.get_front_month(now=session_open)),
+        ("ls_pool", lambda: http_client.warm_up(BASE_URL, WARMUP_CONNECTIONS)),
+        ("db", lambda: get_supabase().table("market_night_futures").select("recorded_at").limit(1).execute()),
+    ]
+    if REVALIDATE_SECRET:
+        steps.append(("revalidate_pool", lambda: http_client.warm_up(FRONTEND_URL)))
+    if ANALYTICS_ENABLED:
+        steps.append(("spot_close", lambda: SPOT_CLOSE.refresh(session_date_of(session_open))))
+    if FEED:
+        steps.append(("stream", FEED.start))
+
+    with span("warmup"):
+        for name, step in steps:
+            try:
+                step()
+            except Exception as e:
+                print(f"⚠️ 워밍업 실패 ({name}): {e}")
 
 # ------------------------------------------------------------------
 # 🚀 4. 메인 실행 루프 (정각 보정 적용)
 # ------------------------------------------------------------------
 def run_monitor_forever():
     print("🚀 야간선물 트래커 가동 (18:00 ~ 06:00) - 정각 보정 & 개수 유지 모드")
+    # 세션 중 재시작이면 로컬 세션 저장소에서 마스터 복원 (t8432 생략)
+    restore_from_store()
     
-    # 시작 시 데이터 개수 정리 1회 수행
-    manage_data_limit(limit=1440)
+    # 메트릭 엔드포인트 (METRICS_PORT, 기본 127.0.0.1:9108)
+    metrics.start_server()
+    # 로컬 읽기 API (READ_API_PORT=0이면 비활성)
+    READ_API.start()
+    # 토큰 만료 전 선제 갱신 스레드 시작
+    TOKEN_MANAGER.start_background_refresh()
+    # 저장 / 갱신 워커 시작
+    PIPELINE.start()
+    REVALIDATOR.start()
+    SPOOL_FLUSHER.start()
+    if BACKFILL_ENABLED:
+        BACKFILL.start()
+    if LEASE:
+        LEASE.start()
+        # 첫 획득 시도 결과를 기다린 뒤 역할 결정 (리더가 이미 있으면 대기 모드로 시작)
+        if not LEASE.wait_for_leadership(lease.LEASE_RETRY * 2):
+            print("🪑 다른 수집기가 리스를 보유 중입니다. 대기 모드로 시작합니다.")
+
+    # 시작 시 데이터 개수 정리 1회 수행 (리더만)
+    if is_leader():
+        manage_data_limit(limit=1440)
     last_cleanup_time = time.time()
-    
-    # 휴장 세션 여부 (거래량 0일 때 해당 세션 종료 시까지 True 유지)
-    is_holiday_session = False
+    last_logged_minute = None
+    # 워밍업을 마친 세션의 개장 시각
+    warmed_for = None
     
     while True:
         try:
-            # 1️⃣ 장 시간 체크 (주말 포함)
+            # 1️⃣ 장 시간 체크 (주말 / 휴장일은 캘린더 기준)
             if not is_market_open():
-                # 장이 닫히면 휴장 플래그 초기화 (다음 세션을 위해)
-                if is_holiday_session:
-                    print("🌙 세션 종료. 휴장 플래그를 초기화합니다.")
-                    is_holiday_session = False
-                
-                kst = pytz.timezone('Asia/Seoul')
-                now = datetime.now(kst)
-                
-                # [개장 임박] 17:50분부터는 18:00:30까지 정확히 대기
-                if now.hour == 17 and now.minute >= 50:
-                    target_time = now.replace(hour=18, minute=0, second=30, microsecond=0)
-                    sleep_seconds = (target_time - now).total_seconds()
-                    
-                    if sleep_seconds > 0:
-                        print(f"⏱️ 개장 임박! {sleep_seconds:.1f}초 대기 후 시작합니다... (세션 초기화)")
-                        # [핵심] 새 세션을 위해 토큰과 휴장 플래그 초기화
-                        global CURRENT_TOKEN
-                        CURRENT_TOKEN = None
-                        is_holiday_session = False
-                        time.sleep(sleep_seconds)
-                        continue 
-
-                # [평소 대기] 30분마다 로그 출력
-                if now.minute % 30 == 0 and now.second < 2:
-                    print(f"😴 야간장이 아닙니다. (현재: {now.strftime('%H:%M')}) 대기 중...")
-                
-                # 다음 분 00초까지 대기
-                sleep_to_next_minute = 60 - now.second
-                time.sleep(sleep_to_next_minute)
+                # 세션 마지막 바는 다음 샘플이 없으므로 시간 기준으로 닫아서 저장
+                persist_bars(BARS.close_due())
+                # 장외에는 실시간 구독 해제 (다음 개장 워밍업 때 다시 연결)
+                if FEED and FEED.running:
+                    FEED.stop()
+
+                # 다음 개장 WARMUP_LEAD초 전까지 분 단위 폴링 없이 대기 (최대 IDLE_SLEEP_CAP씩 나눠 재계산)
+                now = datetime.now(KST)
+                next_open = CALENDAR.next_open(now)
+                if next_open is None:
+                    print("⚠️ 캘린더에 예정된 세션이 없습니다. 1시간 후 다시 확인합니다.")
+                    time.sleep(IDLE_SLEEP_CAP)
+                    continue
+                until_open = (next_open - now).total_seconds()
+                # 장 마감 후 직전 세션의 누락 구간 정리 (워밍업 시각 전까지)
+                run_backfill(until_open - WARMUP_LEAD)
+                until_open = (next_open - datetime.now(KST)).total_seconds()
+                if until_open > WARMUP_LEAD:
+                    if until_open - WARMUP_LEAD > IDLE_SLEEP_CAP:
+                        print(f"😴 야간장이 아닙니다. (현재: {now.strftime('%m-%d %H:%M')}) "
+                              f"다음 개장 {next_open.strftime('%m-%d(%a) %H:%M')}까지 대기 중...")
+                    time.sleep(min(until_open - WARMUP_LEAD, IDLE_SLEEP_CAP))
+                    continue
+
+                # 개장 직전: 토큰 / 근월물 / 커넥션 / DB 클라이언트를 미리 준비 (세션당 1회)
+                if warmed_for != next_open:
+                    print(f"🔥 개장 {until_open:.0f}초 전 워밍업 (토큰 / 마스터 / 커넥션 / DB)...")
+                    warm_up(next_open)
+                    warmed_for = next_open
+                    continue
+
+                # 개장 시각 + 1초에 첫 틱 (Drift 방지 기준과 동일)
+                sleep_seconds = (next_open - datetime.now(KST)).total_seconds() + 1
+                print(f"⏱️ 개장 임박! {sleep_seconds:.1f}초 대기 후 시작합니다...")
+                time.sleep(max(sleep_seconds, 0))
                 continue
 
-            # 2️⃣ 정기 데이터 정리 (1시간마다 수행)
-            if time.time() - last_cleanup_time > 3600:
-                manage_data_limit(limit=1440)
-                last_cleanup_time = time.time()
+            # 장 중에 재시작된 경우 워밍업 없이 바로 실시간 구독 시작
+            if FEED and not FEED.running:
+                FEED.start()
 
-            # 2.5️⃣ 휴장 상태 체크
-            if is_holiday_session:
-                # 이미 거래량 0으로 확인된 세션이면 수집 없이 대기
-                now = datetime.now()
-                sleep_to_next_minute = 60 - now.second
-                # print(f"😴 휴장 세션입니다. 다음 세션을 위해 대기 중... (현재: {now.strftime('%H:%M')})")
-                time.sleep(max(0, sleep_to_next_minute))
+            # 2️⃣ 대기 모드: 리더가 기록하는 동안 조회하지 않고, 리스를 얻는 즉시 깨어나 바로 틱 수행
+            # (SPOOL_UPSERT=1이면 인수인계 중 같은 분이 두 번 기록돼도 (symbol, minute_bucket) upsert라 중복 없음)
+            if not is_leader():
+                TICKS.inc(result="standby")
+                LEASE.wait_for_leadership(seconds_until_next_poll(datetime.now()))
                 continue
 
             # 3️⃣ 데이터 수집 및 저장
-            market_data = get_night_futures_price_safe()
+            tick_started = time.perf_counter()
+            with span("fetch"):
+                market_data, contract_rows = fetch_tick()
             
             if market_data:
-                # [핵심] 휴장 감지: 거래량이 0이면 수집 중단
+                # 개장 직후 체결 전이면 거래량이 0 - 기록하지 않고 다음 주기에 다시 조회
+                # (휴장 여부는 캘린더로 판단하므로 거래량으로 추정하지 않음)
                 if market_data['volume'] == 0:
-                    now_kst_dt = datetime.now(pytz.timezone('Asia/Seoul'))
-                    # 장 초반(18:15까지)은 거래량이 0이어도 일시적 현상일 수 있으므로 중단하지 않음
-                    if now_kst_dt.hour == 18 and now_kst_dt.minute < 15:
-                        print(f"[{now_kst_dt.strftime('%H:%M:%S')}] ⚠️ 거래량이 아직 0입니다. (데이터 수집 대기 중...)")
-                        time.sleep(30)
-                        continue
-                        
-                    print(f"[{now_kst_dt.strftime('%H:%M:%S')}] ⚠️ 거래량이 0입니다. 오늘 야간선물 휴장으로 판단하고 이번 세션 수집을 중단합니다.")
-                    is_holiday_session = True
+                    now_kst_dt = datetime.now(KST)
+                    print(f"[{now_kst_dt.strftime('%H:%M:%S')}] ⚠️ 거래량이 아직 0입니다. (데이터 수집 대기 중...)")
+                    TICKS.inc(result="no_volume")
+                    time.sleep(seconds_until_next_poll(datetime.now()))
                     continue
 
-                try:
-                    supabase.table("market_night_futures").insert(market_data).execute()
-                    
-                    # On-Demand Revalidation
-                    # await_terminal/run_in_terminal 혹은 비동기 호출이 아니므로 순차 진행
-                    revalidate_path("/kospi-night-futures")
-                    
-                    # 로그 출력 (한국 시간)
-                    now_kst = datetime.now(pytz.timezone('Asia/Seoul')).strftime('%H:%M:%S')
-                    print(f"[{now_kst}] {market_data['symbol']}: {market_data['price']} (Vol: {market_data['volume']})", flush=True)
-                    
-                except Exception as db_err:
-                    print(f"🔥 DB 저장 실패: {db_err}")
+                record_tick(contract_rows)
+                TICKS.inc(result="ok")
+                log_event("tick", result="ok", symbol=market_data["symbol"], price=market_data["price"],
+                          rows=len(contract_rows), ms=round((time.perf_counter() - tick_started) * 1000, 2))
+                
+                # 로그 출력 (한국 시간, 분당 1회 - POLL_INTERVAL < 60이면 그 분의 첫 틱만)
+                now_kst_dt = datetime.now(KST)
+                log_minute = now_kst_dt.replace(second=0, microsecond=0)
+                if log_minute != last_logged_minute:
+                    last_logged_minute = log_minute
+                    print(f"[{now_kst_dt.strftime('%H:%M:%S')}] {market_data['symbol']}: {market_data['price']} (Vol: {market_data['volume']})", flush=True)
             else:
                 # 데이터를 가져오지 못했을 때 (None인 경우)
-                now_kst = datetime.now(pytz.timezone('Asia/Seoul')).strftime('%H:%M:%S')
-                # print(f"[{now_kst}] ⚠️ 데이터를 가져오지 못했습니다. (None 반환)")
-                pass
-            
-            # 4️⃣ [핵심] 다음 실행 시간 보정 (Drift 방지)
-            now = datetime.now()
-            target_next_run = (now + timedelta(minutes=1)).replace(second=1, microsecond=0)
-            
-            sleep_seconds = (target_next_run - now).total_seconds()
-            
-            if sleep_seconds < 0:
-                sleep_seconds = 0
+                TICKS.inc(result="empty")
+                log_event("tick", result="empty", ms=round((time.perf_counter() - tick_started) * 1000, 2))
             
-            time.sleep(sleep_seconds)
+            # 4️⃣ 정기 데이터 정리 (1시간마다, 틱 이후에 수행하여 개장 첫 틱을 늦추지 않음)
+            if time.time() - last_cleanup_time > 3600 and is_leader():
+                manage_data_limit(limit=1440)
+                last_cleanup_time = time.time()
+
+            # 5️⃣ 누락 구간 백필: 다음 틱까지 5초 이상 남겨 두고 남는 시간만 사용
+            run_backfill(seconds_until_next_poll(datetime.now()) - 5)
+
+            # 6️⃣ [핵심] 다음 실행 시간 보정 (Drift 방지)
+            time.sleep(seconds_until_next_poll(datetime.now()))
             
         except KeyboardInterrupt:
             print("\n🛑 사용자 중단")
+            # 큐에 남은 샘플은 저장 후 종료
+            PIPELINE.stop()
+            PRICE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+            HEDGER.shutdown()
+            if FEED:
+                FEED.stop()
+            BACKFILL.stop()
+            SPOOL_FLUSHER.stop()
+            REVALIDATOR.stop()
+            if LEASE:
+                LEASE.stop()
             break
         except Exception as e:
             now_kst = datetime.now(pytz.timezone('Asia/Seoul')).strftime('%H:%M:%S')
             print(f"[{now_kst}] 💀 알 수 없는 에러 발생: {e}")
+            TICKS.inc(result="error")
+            log_event("tick", result="error", error=str(e))
             time.sleep(60) # 에러 시 1분 대기 후 재시도
 
 if __name__ == "__main__":
@@ -0,0 +1,338 @@
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime, timedelta
+import pytz
+import deadline
+from deadline import DeadlineExceeded
+from master_cache import KST, contract_expiry, session_date_of
+from metrics import span, BACKFILL_ROWS, BACKFILL_PENDING
+
+# ------------------------------------------------------------------
+# 🩹 누락 구간 탐지 / 백필
+# ------------------------------------------------------------------
+# 재시작 / 재시도 포기 / 틱 마감 초과로 빠진 분은 그대로 남으므로,
+# 캘린더가 말하는 세션 분과 DB에 저장된 minute_bucket을 비교해 빈 구간을 찾고
+# LS 분봉 차트 TR(t8415)로 구간을 연속 조회(tr_cont)해서 스풀에 일괄 upsert 한다.
+# - 라이브 수집과 겹치지 않도록 메인 루프가 틱 사이 남는 시간(마감)만 넘기고,
+#   탐지(DB 조회) / 분봉 조회는 별도 스레드에서 실행 (느린 PostgREST 응답이 다음 틱을 늦추지 않음)
+# - 스케줄러에서는 PRIORITY_LOW + TR별 제한(t8415)으로 실시간 TR과 분리
+# - 분봉 time은 봉 마감 시각 기준(HH:MM 봉 = HH:MM-1 ~ HH:MM)으로 보고,
+#   라이브 행(HH:MM:01 수집)과 같은 minute_bucket HH:MM에 종가를 기록
+# - 분봉이 없는 분(체결 없음 / 개장 직후)은 채울 수 없으므로 다시 조회하지 않음
+# - 대상은 근월물뿐 (COLLECT_ALL_CONTRACTS로 수집한 원월물 / 스프레드 누락은 채우지 않음)
+
+# minute_bucket 마이그레이션(SPOOL_UPSERT=1) 후 켬. 꺼져 있으면 탐지 조회도 t8415 호출도 하지 않음
+BACKFILL_ENABLED = os.getenv("BACKFILL_ENABLED", "0") == "1"
+BACKFILL_TR = os.getenv("BACKFILL_TR", "t8415")
+BACKFILL_PATH = os.getenv("BACKFILL_PATH", "/futureoption/chart")
+BACKFILL_LOOKBACK_HOURS = float(os.getenv("BACKFILL_LOOKBACK_HOURS", "24"))
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "500"))     # 분봉 조회 1회당 건수 (qrycnt)
+BACKFILL_MAX_PAGES = int(os.getenv("BACKFILL_MAX_PAGES", "20"))      # 구간 1개당 연속 조회 상한
+BACKFILL_SLICE = float(os.getenv("BACKFILL_SLICE", "20"))            # 초, 틱 사이 1회 실행 상한
+BACKFILL_INTERVAL = float(os.getenv("BACKFILL_INTERVAL", "300"))     # 초, 누락 구간 재탐지 간격
+# 라이브 행이 스풀에서 DB로 넘어가기 전이므로 최근 몇 분은 누락으로 보지 않음
+SETTLE_MINUTES = 3
+SELECT_PAGE = 1000   # PostgREST 기본 최대 행 수
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(pytz.utc)
+
+
+def _minute(dt):
+    return dt.astimezone(pytz.utc).replace(second=0, microsecond=0)
+
+
+def expected_minutes(opens, closes, start, end):
+    """세션 (opens, closes) 중 [start, end) 안의 분 목록 (UTC)"""
+    first = _minute(max(opens, start))
+    if first < max(opens, start):
+        first += timedelta(minutes=1)
+    last = min(closes, end)
+    minutes = []
+    while first < last:
+        minutes.append(first)
+        first += timedelta(minutes=1)
+    return minutes
+
+
+def missing_ranges(minutes):
+    """정렬된 누락 분 목록 -> 연속 구간 [(시작, 끝)] (끝 포함)"""
+    ranges = []
+    for minute in minutes:
+        if ranges and minute - ranges[-1][1] == timedelta(minutes=1):
+            ranges[-1][1] = minute
+        else:
+            ranges.append([minute, minute])
+    return [tuple(r) for r in ranges]
+
+
+def session_symbol(stored_symbols, master_items, session_date):
+    """세션의 근월물 종목명: 저장된 종목 + 현재 마스터 중 세션 날짜에 만기 전인 가장 가까운 만기"""
+    names = set(stored_symbols) | {item["hname"] for item in master_items}
+    alive = [(contract_expiry(name), name) for name in names
+             if contract_expiry(name) and contract_expiry(name) > session_date]
+    return min(alive)[1] if alive else None
+
+
+class GapDetector:
+    """캘린더 세션 분과 DB의 minute_bucket을 비교해 근월물 누락 구간 탐지"""
+
+    def __init__(self, supabase_getter, calendar, master_items=lambda: [],
+                 table="market_night_futures", lookback_hours=BACKFILL_LOOKBACK_HOURS):
+        self._get_supabase = supabase_getter
+        self.calendar = calendar
+        self._master_items = master_items
+        self.table = table
+        self.lookback = timedelta(hours=lookback_hours)
+
+    def _stored(self, start, end):
+        """[start, end) 구간의 (symbol, minute_bucket) 목록 (페이지 단위 조회)"""
+        rows, offset = [], 0
+        while True:
+            page = self._get_supabase().table(self.table).select("symbol,minute_bucket") \
+                .gte("minute_bucket", start.isoformat()).lt("minute_bucket", end.isoformat()) \
+                .order("minute_bucket").limit(SELECT_PAGE).offset(offset).execute().data
+            rows.extend(page)
+            if len(page) < SELECT_PAGE:
+                return rows
+            offset += SELECT_PAGE
+
+    def find(self, now=None, skip=()):
+        """
+        누락 구간 목록 [{symbol, session, session_close, start, end, minutes}] (오래된 순).
+        skip: 이미 채웠거나 채울 수 없다고 확인한 (symbol, 분) 집합
+        """
+        now = (now or datetime.now(pytz.utc)).astimezone(pytz.utc)
+        horizon = now - timedelta(minutes=SETTLE_MINUTES)
+        gaps = []
+        for opens, closes in self.calendar.sessions(now - self.lookback - timedelta(days=1), now):
+            if closes <= now - self.lookback or opens >= horizon:
+                continue
+            expected = expected_minutes(opens, closes, now - self.lookback, horizon)
+            if not expected:
+                continue
+            stored = self._stored(expected[0], expected[-1] + timedelta(minutes=1))
+            session_date = session_date_of(opens)
+            symbol = session_symbol({r["symbol"] for r in stored}, self._master_items(), session_date)
+            if not symbol:
+                continue
+            present = {_parse_ts(r["minute_bucket"]) for r in stored if r["symbol"] == symbol}
+            missing = [m for m in expected if m not in present and (symbol, m) not in skip]
+            for first, last in missing_ranges(missing):
+                gaps.append({"symbol": symbol, "session": opens, "session_close": closes,
+                             "start": first, "end": last,
+                             "minutes": [m for m in missing if first <= m <= last]})
+        return gaps
+
+
+class Backfiller:
+    """
+    누락 구간을 분봉 TR로 채워 sink(스풀)에 기록.
+    - post(tr_cd, body, tr_cont, tr_cont_key): LS 차트 TR 호출 (낮은 우선순위)
+    - shcode_of(symbol): 종목명 -> 종목코드 (마스터에 없으면 None: 백필 불가)
+    - reference(gap): 구간 직전 / 직후의 같은 세션 저장 행 (누적 거래량 / 전일대비 계산용)
+    """
+
+    def __init__(self, detector, post, shcode_of, reference, sink, tr_cd=BACKFILL_TR,
+                 page_size=BACKFILL_PAGE_SIZE, max_pages=BACKFILL_MAX_PAGES, interval=BACKFILL_INTERVAL):
+        self.detector = detector
+        self._post = post
+        self._shcode_of = shcode_of
+        self._reference = reference
+        self._sink = sink
+        self.tr_cd = tr_cd
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.interval = interval
+        self._gaps = []
+        self._detected_at = None
+        self._done = {}   # (symbol, 분) -> "filled" | "unfillable"
+        self.stats = {"detected": 0, "filled": 0, "unfillable": 0, "pages": 0}
+        self._budget = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._busy = threading.Event()
+        self._thread = None
+
+    def pending_minutes(self):
+        return sum(len(gap["minutes"]) for gap in self._gaps)
+
+    def detect(self, now=None):
+        now = (now or datetime.now(pytz.utc)).astimezone(pytz.utc)
+        # 조회 범위를 벗어난 기록은 정리
+        cutoff = now - self.detector.lookback - timedelta(hours=1)
+        self._done = {key: v for key, v in self._done.items() if key[1] >= cutoff}
+        self._gaps = self.detector.find(now, skip=self._done)
+        self._detected_at = time.monotonic()
+        self.stats["detected"] += self.pending_minutes()
+        BACKFILL_PENDING.set(self.pending_minutes())
+        if self._gaps:
+            print(f"🩹 누락 구간 {len(self._gaps)}개 ({self.pending_minutes()}분) 발견 - 틱 사이에 백필합니다.")
+        return self._gaps
+
+    def _fetch_bars(self, shcode, start, end):
+        """start ~ end(포함) 분봉 목록 (연속 조회). 마감이 지나면 DeadlineExceeded"""
+        start_kst, end_kst = start.astimezone(KST), end.astimezone(KST)
+        block = {
+            "shcode": shcode, "ncnt": 1, "qrycnt": self.page_size, "nday": "0",
+            "sdate": start_kst.strftime("%Y%m%d"), "stime": start_kst.strftime("%H%M%S"),
+            "edate": end_kst.strftime("%Y%m%d"), "etime": end_kst.strftime("%H%M%S"),
+            "cts_date": "", "cts_time": "", "comp_yn": "N",
+        }
+        bars, tr_cont, tr_cont_key = [], "N", ""
+        for _ in range(self.max_pages):
+            deadline.check("backfill")
+            res = self._post(self.tr_cd, {f"{self.tr_cd}InBlock": block}, tr_cont, tr_cont_key)
+            payload = res.json()
+            self.stats["pages"] += 1
+            bars.extend(payload.get(f"{self.tr_cd}OutBlock1") or [])
+            head = payload.get(f"{self.tr_cd}OutBlock") or {}
+            if res.headers.get("tr_cont") != "Y" or not head.get("cts_date"):
+                break
+            tr_cont, tr_cont_key = "Y", res.headers.get("tr_cont_key", "")
+            block = dict(block, cts_date=head["cts_date"], cts_time=head.get("cts_time", ""))
+        return bars
+
+    def _rows(self, gap, bars):
+        """분봉 -> market_night_futures 행 (누락된 분만)"""
+        wanted = set(gap["minutes"])
+        by_minute = {}
+        for bar in bars:
+            label = KST.localize(datetime.strptime(f"{bar['date']}{bar['time'][:4]}", "%Y%m%d%H%M"))
+            minute = _minute(label)
+            by_minute[minute] = bar
+
+        before, after = self._reference(gap)
+        volume = int(before["volume"]) if before else 0
+        # 전일 종가 = 가격 - 전일대비 (같은 세션 행이 없으면 대비 값은 비워 둠)
+        ref = before or after
+        base = float(ref["price"]) - float(ref["change"]) if ref and ref.get("change") is not None else None
+
+        rows = []
+        # 누적 거래량은 구간 시작 이전 행 기준으로 분봉 거래량을 더해서 계산
+        for minute in sorted(m for m in by_minute if gap["start"] <= m <= gap["end"]):
+            bar = by_minute[minute]
+            volume += int(bar.get("jdiffvol") or 0)
+            if minute not in wanted:
+                continue
+            price = float(bar["close"])
+            rows.append({
+                "symbol": gap["symbol"],
+                "price": price,
+                "change": round(price - base, 2) if base is not None else None,
+                "diff": round((price - base) / base * 100, 2) if base else None,
+                "volume": volume,
+                "recorded_at": minute.isoformat(),
+                "minute_bucket": minute.isoformat(),
+            })
+        return rows
+
+    def fill(self, gap):
+        """구간 1개 백필. 기록한 행 수 반환"""
+        shcode = self._shcode_of(gap["symbol"])
+        if not shcode:
+            print(f"⚠️ {gap['symbol']} 종목코드를 마스터에서 찾지 못해 백필할 수 없습니다.")
+            for minute in gap["minutes"]:
+                self._done[(gap["symbol"], minute)] = "unfillable"
+            return 0
+        bars = self._fetch_bars(shcode, gap["start"], gap["end"])
+        rows = self._rows(gap, bars)
+        if rows:
+            self._sink(rows)
+        filled = {_parse_ts(row["minute_bucket"]) for row in rows}
+        for minute in gap["minutes"]:
+            self._done[(gap["symbol"], minute)] = "filled" if minute in filled else "unfillable"
+        unfillable = len(gap["minutes"]) - len(filled)
+        self.stats["filled"] += len(filled)
+        self.stats["unfillable"] += unfillable
+        BACKFILL_ROWS.inc(len(filled), result="filled")
+        if unfillable:
+            BACKFILL_ROWS.inc(unfillable, result="unfillable")
+        return len(rows)
+
+    def run(self, budget=BACKFILL_SLICE, now=None):
+        """
+        budget초 안에서 누락 구간을 채움 (메인 루프가 틱 사이에 호출).
+        INTERVAL마다 다시 탐지하고, 마감에 걸린 구간은 다음 호출에서 이어서 처리.
+        """
+        if budget <= 0:
+            return 0
+        written = 0
+        try:
+            with deadline.bound(budget):
+                if self._detected_at is None or time.monotonic() - self._detected_at > self.interval:
+                    self.detect(now)
+                while self._gaps:
+                    written += self.fill(self._gaps[0])
+                    self._gaps.pop(0)
+                    BACKFILL_PENDING.set(self.pending_minutes())
+        except DeadlineExceeded:
+            pass
+        if written:
+            print(f"🩹 백필 {written}행 기록 (남은 누락 {self.pending_minutes()}분)")
+        return written
+
+    # -- 백그라운드 실행 ------------------------------------------------
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="backfill", daemon=True)
+        self._thread.start()
+
+    def kick(self, budget):
+        """메인 루프: 틱 사이 남는 budget초를 넘기고 바로 반환 (이전 실행이 아직 진행 중이면 무시)"""
+        if budget <= 0 or self._busy.is_set():
+            return False
+        self._budget = budget
+        self._wake.set()
+        return True
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._busy.set()
+            try:
+                with span("backfill"):
+                    self.run(budget=self._budget)
+            except Exception as e:
+                print(f"⚠️ 백필 실패: {e}")
+            finally:
+                self._busy.clear()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    # 수동 실행: 최근 구간 누락 확인 / 백필 (수집기와 같은 .env 사용)
+    parser = argparse.ArgumentParser(description="누락 구간 탐지 / 백필")
+    parser.add_argument("--hours", type=float, default=BACKFILL_LOOKBACK_HOURS, help="탐지 범위 (시간)")
+    parser.add_argument("--dry-run", action="store_true", help="누락 구간만 출력")
+    parser.add_argument("--budget", type=float, default=600, help="백필 최대 실행 시간 (초)")
+    args = parser.parse_args()
+
+    import app
+    app.BACKFILL.detector.lookback = timedelta(hours=args.hours)
+    gaps = app.BACKFILL.detect()
+    for gap in gaps:
+        print(f"  {gap['symbol']} {gap['start'].astimezone(KST):%m-%d %H:%M} ~ "
+              f"{gap['end'].astimezone(KST):%m-%d %H:%M} ({len(gap['minutes'])}분)")
+    if args.dry_run or not gaps:
+        sys.exit(0)
+    app.SPOOL_FLUSHER.start()
+    app.BACKFILL.run(budget=args.budget)
+    app.SPOOL_FLUSHER.stop()
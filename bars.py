@@ -0,0 +1,108 @@
+import os
+import threading
+from datetime import datetime
+import pytz
+
+# ------------------------------------------------------------------
+# 🕯️ OHLCV 바 집계기
+# ------------------------------------------------------------------
+# 분 단위 미만으로 수집한 샘플을 메모리에서 1m/5m/15m 봉으로 묶는다.
+# - 거래량은 누적값(volume)의 차이로 계산
+# - 완성된 봉만 저장하고, 옵션으로 진행 중인 봉도 함께 저장
+
+BARS_TABLE = "market_night_futures_bars"
+BAR_INTERVALS = [int(v) for v in os.getenv("BAR_INTERVALS", "1,5,15").split(",") if v.strip()]  # 분
+# 봉 테이블 저장은 마이그레이션(market_night_futures_bars) 후 켬. 꺼도 메모리 집계(읽기 API /api/bars)는 유지
+BARS_ENABLED = os.getenv("BARS_ENABLED", "0") == "1"
+PERSIST_PARTIAL = os.getenv("BARS_PERSIST_PARTIAL", "0") == "1"
+
+
+def _parse_ts(recorded_at):
+    dt = datetime.fromisoformat(recorded_at)
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(pytz.utc)
+
+
+def bucket_start(ts, minutes):
+    """UTC 기준 minutes 단위로 내림한 봉 시작 시각"""
+    epoch = int(ts.timestamp())
+    size = minutes * 60
+    return datetime.fromtimestamp(epoch - epoch % size, pytz.utc)
+
+
+class BarAggregator:
+    def __init__(self, intervals=None):
+        self.intervals = intervals or BAR_INTERVALS
+        self._lock = threading.Lock()
+        # (symbol, minutes) -> 진행 중인 봉
+        self._bars = {}
+        # symbol -> 직전 누적 거래량
+        self._last_volume = {}
+
+    def _volume_delta(self, symbol, volume):
+        prev = self._last_volume.get(symbol)
+        self._last_volume[symbol] = volume
+        if prev is None:
+            return 0
+        # 누적 거래량이 줄었다면 세션이 바뀐 것이므로 현재 누적값 전체를 반영
+        return volume - prev if volume >= prev else volume
+
+    def add(self, sample):
+        """샘플 1건 반영, 이번 샘플로 완성된 봉 목록을 반환"""
+        symbol = sample["symbol"]
+        ts = _parse_ts(sample["recorded_at"])
+        price = sample["price"]
+        completed = []
+        with self._lock:
+            delta = self._volume_delta(symbol, sample["volume"])
+            for minutes in self.intervals:
+                key = (symbol, minutes)
+                start = bucket_start(ts, minutes)
+                bar = self._bars.get(key)
+                if bar and bar["_start"] < start:
+                    completed.append(self._finalize(bar))
+                    bar = None
+                if bar is None:
+                    bar = self._bars[key] = {
+                        "_start": start,
+                        "symbol": symbol,
+                        "interval": f"{minutes}m",
+                        "bucket_start": start.isoformat(),
+                        "open": price, "high": price, "low": price, "close": price,
+                        "volume": 0,
+                        "cum_volume": sample["volume"],
+                        "ticks": 0,
+                    }
+                bar["high"] = max(bar["high"], price)
+                bar["low"] = min(bar["low"], price)
+                bar["close"] = price
+                bar["volume"] += delta
+                bar["cum_volume"] = sample["volume"]
+                bar["ticks"] += 1
+        return completed
+
+    def _finalize(self, bar):
+        return {k: v for k, v in bar.items() if not k.startswith("_")}
+
+    def current(self):
+        """진행 중인 봉 목록 (스냅샷)"""
+        with self._lock:
+            return [self._finalize(bar) for bar in self._bars.values()]
+
+    def close_due(self, now=None):
+        """봉 종료 시각이 지난 진행 중 봉을 닫아서 반환 (세션 종료 / 수집 중단 대비)"""
+        now = now or datetime.now(pytz.utc)
+        completed = []
+        with self._lock:
+            for key, bar in list(self._bars.items()):
+                _, minutes = key
+                if bucket_start(now, minutes) > bar["_start"]:
+                    completed.append(self._finalize(bar))
+                    del self._bars[key]
+        return completed
+
+    def reset(self):
+        with self._lock:
+            self._bars.clear()
+            self._last_volume.clear()
@@ -0,0 +1,269 @@
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tracemalloc
+from datetime import datetime
+
+# ------------------------------------------------------------------
+# ⏱️ 수집기 벤치마크 (리플레이 하네스 기반, 네트워크 불필요)
+# ------------------------------------------------------------------
+# - 단계별 지연 백분위수: token / t8432 / t8456 / 스풀 기록 / DB 플러시 / revalidate
+# - 샘플 시각 지터: seconds_until_next_poll 목표 시각 대비 실제 실행 시각 차이
+# - 최대 폴링 속도(틱/초, TR 요청 제한 없이 잰 수집기 자체 처리량), 1분 예산 안에 수집 가능한 최대 종목 수
+# - 1시간 운영 기준 CPU 시간 / 메모리 증가량 추정
+# 결과는 기준선(bench_baseline.json)과 비교하여 허용치 이상 나빠지면 종료 코드 1
+#
+#   python bench.py                      # 실행 + 기준선 비교
+#   python bench.py --save-baseline      # 현재 결과를 기준선으로 저장 (배포 VM에서 실행 권장)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+BASELINE_PATH = os.path.join(BASE_DIR, "bench_baseline.json")
+
+# 지표별 방향: 값이 클수록 좋은 지표
+HIGHER_IS_BETTER = {"max_poll_rate_per_s", "max_symbols_in_budget"}
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    pick = lambda q: values[min(int(q * len(values)), len(values) - 1)]
+    return {"count": len(values), "p50": round(pick(0.5), 2), "p90": round(pick(0.9), 2),
+            "p99": round(pick(0.99), 2), "max": round(values[-1], 2)}
+
+
+def _timed(samples, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def _extra_contracts(master, count):
+    """종목 수 확장 시험용 가상 원월물 (F 3xxx, A01Xnnnn)"""
+    extra = []
+    for i in range(count):
+        year, month = 30 + i // 4, (i % 4) * 3 + 3
+        extra.append(dict(master[0], hname=f"F {year}{month:02d}", shcode=f"A01X{i:04d}"))
+    return master + extra
+
+
+def bench_stages(app, ticks):
+    """단계별 지연 (ms)"""
+    import http_client
+    import revalidate
+    samples = {"record_tick": [], "flush": [], "revalidate": [], "tick_total": []}
+    for _ in range(ticks):
+        start = time.perf_counter()
+        market_data, rows = app.fetch_tick()
+        if rows:
+            _timed(samples["record_tick"], app.record_tick, rows)
+        _timed(samples["flush"], app.SPOOL_FLUSHER.flush_once)
+        samples["tick_total"].append((time.perf_counter() - start) * 1000)
+        _timed(samples["revalidate"], revalidate.revalidate_path, "/kospi-night-futures")
+
+    for t in list(http_client.TIMINGS):
+        if t["path"].endswith("/oauth2/token"):
+            samples.setdefault("token", []).append(t["total_ms"])
+        elif t["tr_cd"]:
+            samples.setdefault(t["tr_cd"], []).append(t["total_ms"])
+    return {name: percentiles(values) for name, values in samples.items()}
+
+
+def bench_jitter(app, ticks, interval):
+    """목표 수집 시각 대비 실제 시각 차이 (ms)"""
+    offsets = []
+    for _ in range(ticks):
+        now = datetime.now()
+        wait = app.seconds_until_next_poll(now, interval)
+        target = time.time() + wait
+        time.sleep(wait)
+        offsets.append((time.time() - target) * 1000)
+        market_data, rows = app.fetch_tick()
+        if rows:
+            app.record_tick(rows)
+    return percentiles([abs(o) for o in offsets])
+
+
+def bench_max_rate(app, seconds):
+    """
+    쉬지 않고 틱을 돌렸을 때 초당 처리 틱 수 (수집기 자체 처리량).
+    TR별 요청 제한(t8456 2건/초 등)을 그대로 두면 스케줄러 설정값만 재게 되므로,
+    측정하는 동안만 제한 없는 스케줄러로 바꿔 끼운다 (예산 내 종목 수 측정은 실제 제한 사용).
+    """
+    from rate_limiter import TRScheduler
+    scheduler = app.SCHEDULER
+    app.SCHEDULER = TRScheduler(limits={}, default_rate=1e6)
+    try:
+        count = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            market_data, rows = app.fetch_tick()
+            if rows:
+                app.record_tick(rows)
+            count += 1
+    finally:
+        app.SCHEDULER = scheduler
+    return round(count / seconds, 2)
+
+
+def bench_symbols(app, harness, sweep, budget):
+    """종목 수별 전 종목 수집 소요 시간과 예산 내 최대 종목 수"""
+    base_master = list(harness.ls.master)
+    results = {}
+    best = 0
+    app.COLLECT_ALL_CONTRACTS = True
+    try:
+        app.MASTER_CACHE.get_front_month(force=True)
+        alive = len(app.MASTER_CACHE.get_futures())
+        for n in sweep:
+            master = _extra_contracts(base_master, max(n - alive, 0))
+            harness.ls.master = master
+            harness.ls.by_shcode = {item["shcode"]: item for item in master}
+            app.MASTER_CACHE.get_front_month(force=True)
+            start = time.perf_counter()
+            rows = app.get_all_night_futures_prices(deadline=budget)
+            elapsed = time.perf_counter() - start
+            results[n] = {"seconds": round(elapsed, 2), "collected": len(rows)}
+            if len(rows) >= n and elapsed <= budget:
+                best = n
+            else:
+                break
+    finally:
+        app.COLLECT_ALL_CONTRACTS = False
+        harness.ls.master = base_master
+        harness.ls.by_shcode = {item["shcode"]: item for item in base_master}
+        app.MASTER_CACHE.get_front_month(force=True)
+    return best, results
+
+
+def bench_resources(app, ticks, poll_interval):
+    """틱당 CPU / 메모리 → 1시간 운영 기준으로 환산"""
+    tracemalloc.start()
+    usage0 = resource.getrusage(resource.RUSAGE_SELF)
+    rss0 = usage0.ru_maxrss
+    snap0 = tracemalloc.take_snapshot()
+    for _ in range(ticks):
+        market_data, rows = app.fetch_tick()
+        if rows:
+            app.record_tick(rows)
+        app.SPOOL_FLUSHER.flush_once()
+    usage1 = resource.getrusage(resource.RUSAGE_SELF)
+    snap1 = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    cpu = (usage1.ru_utime + usage1.ru_stime) - (usage0.ru_utime + usage0.ru_stime)
+    growth = sum(stat.size_diff for stat in snap1.compare_to(snap0, "filename"))
+    ticks_per_hour = 3600 / poll_interval
+    return {
+        "cpu_s_per_hour": round(cpu / ticks * ticks_per_hour, 3),
+        "heap_growth_kb_per_hour": round(growth / ticks * ticks_per_hour / 1024, 1),
+        "max_rss_mb": round(max(rss0, usage1.ru_maxrss) / 1024, 1),
+    }
+
+
+def flatten(results):
+    """기준선 비교용 평탄화: {"stages.t8456.p90": 12.3, ...}"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            for sub, v in flatten(value).items():
+                flat[f"{key}.{sub}"] = v
+        elif isinstance(value, (int, float)) and not key.endswith("count"):
+            flat[key] = value
+    return flat
+
+
+def compare(results, baseline, tolerance, min_delta=1.0):
+    """허용치(tolerance, 비율)보다 나빠진 지표 목록 (min_delta 미만의 절대 차이는 측정 잡음으로 무시)"""
+    regressions = []
+    current = flatten(results)
+    for key, base in flatten(baseline).items():
+        if key not in current or not base:
+            continue
+        value = current[key]
+        if abs(value - base) < min_delta:
+            continue
+        higher_better = key.split(".")[-1] in HIGHER_IS_BETTER or key in HIGHER_IS_BETTER
+        worse = value < base * (1 - tolerance) if higher_better else value > base * (1 + tolerance)
+        if worse:
+            regressions.append((key, base, value))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="야간선물 수집기 벤치마크 (로컬 대체 서버 사용)")
+    parser.add_argument("--ticks", type=int, default=50, help="단계별 지연 측정 틱 수")
+    parser.add_argument("--jitter-ticks", type=int, default=10)
+    parser.add_argument("--jitter-interval", type=int, default=1, help="지터 측정 시 수집 주기(초)")
+    parser.add_argument("--rate-seconds", type=float, default=5)
+    parser.add_argument("--symbols", default="4,8,16,32", help="종목 수 스윕")
+    parser.add_argument("--budget", type=float, default=45, help="전 종목 수집 예산(초)")
+    parser.add_argument("--latency", type=float, default=30, help="가상 LS 지연(ms)")
+    parser.add_argument("--jitter", type=float, default=10, help="가상 LS 지연 흔들림(ms)")
+    parser.add_argument("--db-latency", type=float, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="기준선 대비 허용 악화 비율")
+    parser.add_argument("--min-delta", type=float, default=1.0, help="무시할 절대 차이 (ms 등 지표 단위)")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args(argv)
+
+    # 실제 운영 파일(토큰 / 스풀 / 세션 저장소 / 리스 / 아카이브)을 건드리지 않도록
+    # 로컬 상태 경로(replay_harness.LOCAL_STATE_ENV)를 모두 하네스 임시 디렉터리로 돌림 (종료 시 삭제)
+    from replay_harness import ReplayHarness
+    harness = ReplayHarness(speed=60, latency_ms=args.latency, jitter_ms=args.jitter,
+                            db_latency_ms=args.db_latency).start()
+    os.environ.update(harness.env())
+    sys.path.insert(0, BASE_DIR)
+
+    import builtins
+    real_print = builtins.print
+    builtins.print = lambda *a, **k: None   # 수집기 로그는 벤치 결과에서 제외
+    try:
+        import app
+        poll_interval = app.POLL_INTERVAL
+        results = {"stages_ms": bench_stages(app, args.ticks)}
+        results["jitter_ms"] = bench_jitter(app, args.jitter_ticks, args.jitter_interval)
+        results["max_poll_rate_per_s"] = bench_max_rate(app, args.rate_seconds)
+        best, sweep = bench_symbols(app, harness, [int(n) for n in args.symbols.split(",")], args.budget)
+        results["max_symbols_in_budget"] = best
+        results["symbol_sweep"] = sweep
+        results["resources"] = bench_resources(app, args.ticks, poll_interval)
+    finally:
+        builtins.print = real_print
+        harness.stop()
+
+    results["meta"] = {"at": datetime.now().isoformat(timespec="seconds"), "poll_interval": poll_interval,
+                       "ls_latency_ms": args.latency, "db_latency_ms": args.db_latency}
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({k: v for k, v in results.items() if k not in ("meta", "symbol_sweep")},
+                      f, ensure_ascii=False, indent=2)
+        print(f"💾 기준선 저장: {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("ℹ️ 기준선이 없습니다. --save-baseline으로 먼저 저장하세요.")
+        return 0
+    with open(BASELINE_PATH, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print(f"❌ 기준선 대비 {int(args.tolerance * 100)}% 이상 악화된 지표:")
+        for key, base, value in regressions:
+            print(f"   {key}: {base} → {value}")
+        return 1
+    print("✅ 기준선 대비 회귀 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# ------------------------------------------------------------------
+# ⏳ 틱 단위 마감 시간 (deadline)
+# ------------------------------------------------------------------
+# with deadline.bound(15): ... 안에서 실행되는 토큰 발급 / 마스터 조회 / 시세 조회가
+# 하나의 마감 시간을 공유한다. 마감은 스레드 로컬로 전달되며,
+# - rate_limiter: 차례를 기다리다 마감이 지나면 대기열에서 빠지고 DeadlineExceeded
+# - http_client: 요청 timeout을 남은 시간으로 줄이고, 전송 계층 재시도를 끔
+# - 워커 스레드로 넘길 때는 wrap(fn)으로 같은 마감을 이어받는다
+
+
+class DeadlineExceeded(Exception):
+    """마감 시간 초과. where: 초과를 감지한 단계 (TR 코드 / http / sleep 등)"""
+
+    def __init__(self, where):
+        super().__init__(f"마감 시간 초과 ({where})")
+        self.where = where
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, where):
+        if self.expired():
+            raise DeadlineExceeded(where)
+
+
+_local = threading.local()
+
+
+def current():
+    """현재 스레드의 마감 (없으면 None)"""
+    return getattr(_local, "deadline", None)
+
+
+@contextmanager
+def bound(deadline):
+    """현재 스레드에 마감 설정 (seconds 또는 Deadline). 이미 더 이른 마감이 있으면 그것을 유지"""
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline(deadline)
+    previous = current()
+    if previous is not None and previous.expires_at <= deadline.expires_at:
+        deadline = previous
+    _local.deadline = deadline
+    try:
+        yield deadline
+    finally:
+        _local.deadline = previous
+
+
+def remaining(default=None):
+    d = current()
+    return d.remaining() if d else default
+
+
+def check(where):
+    d = current()
+    if d:
+        d.check(where)
+
+
+def cap(seconds):
+    """seconds를 남은 시간으로 제한 (마감이 없으면 그대로)"""
+    d = current()
+    return seconds if d is None else min(seconds, d.remaining())
+
+
+def sleep(seconds, where="sleep"):
+    """마감을 넘기지 않는 sleep. 남은 시간이 seconds보다 짧으면 자고 나서 DeadlineExceeded"""
+    d = current()
+    if d is None:
+        time.sleep(seconds)
+        return
+    time.sleep(min(seconds, d.remaining()))
+    d.check(where)
+
+
+def wrap(fn):
+    """현재 마감을 이어받아 실행하는 함수 (executor.submit 용)"""
+    d = current()
+    if d is None:
+        return fn
+
+    def run(*args, **kwargs):
+        with bound(d):
+            return fn(*args, **kwargs)
+    return run
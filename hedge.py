@@ -0,0 +1,122 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import deadline
+from deadline import DeadlineExceeded
+from metrics import HEDGES
+
+# ------------------------------------------------------------------
+# 🪞 헤지 요청 (hedged request)
+# ------------------------------------------------------------------
+# 요청이 최근 지연 분포의 p90(HEDGE_PERCENTILE)을 넘기면 같은 요청을 한 번 더 보내고
+# 먼저 도착한 응답을 쓴다. 꼬리 지연(느린 커넥션 / 서버 일시 지연) 때문에
+# 틱 전체가 늦어지는 것을 막는다. 마감(deadline)이 지나면 남은 요청은 버린다.
+
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.2"))   # 초, 헤지 대기 하한
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "3"))     # 초, 표본이 부족할 때도 이 값 사용
+HEDGE_MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """최근 성공 요청 지연(초)의 이동 분위수"""
+
+    def __init__(self, maxlen=200):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(int(p * len(samples)), len(samples) - 1)]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class Hedger:
+    """
+    hedger.call(fn): fn을 실행하고, 분위수 지연을 넘기면 복제 요청 1건을 추가로 보냄.
+    fn은 부작용이 없는 조회 요청이어야 한다 (같은 요청이 두 번 나가도 안전).
+    """
+
+    def __init__(self, name, percentile=HEDGE_PERCENTILE, min_delay=HEDGE_MIN_DELAY,
+                 max_delay=HEDGE_MAX_DELAY, workers=4):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"hedge-{name}")
+        # call()은 여러 스레드(다종목 수집 워커)에서 동시에 불릴 수 있음
+        self._stats_lock = threading.Lock()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "deadline": 0}
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def hedge_delay(self):
+        if len(self.latency) < HEDGE_MIN_SAMPLES:
+            return self.max_delay
+        return min(max(self.latency.percentile(self.percentile), self.min_delay), self.max_delay)
+
+    def _timed(self, fn):
+        start = time.monotonic()
+        result = fn()
+        return result, time.monotonic() - start
+
+    def call(self, fn):
+        self._count("calls")
+        run = deadline.wrap(lambda: self._timed(fn))
+        primary = self._executor.submit(run)
+        pending = {primary}
+        hedge = None
+
+        done, _ = wait(pending, timeout=deadline.cap(self.hedge_delay()))
+        if not done and not self._expired():
+            hedge = self._executor.submit(run)
+            pending.add(hedge)
+            self._count("hedged")
+            HEDGES.inc(name=self.name, result="sent")
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self.latency.add(elapsed)
+                if future is hedge:
+                    self._count("hedge_won")
+                    HEDGES.inc(name=self.name, result="won")
+                # 남은 요청은 시작 전이면 취소, 진행 중이면 결과를 버림 (timeout이 마감으로 제한됨)
+                for other in pending:
+                    other.cancel()
+                return result
+        for other in pending:
+            other.cancel()
+        if error is not None and not isinstance(error, DeadlineExceeded):
+            raise error
+        self._count("deadline")
+        raise DeadlineExceeded(self.name)
+
+    def _expired(self):
+        d = deadline.current()
+        return d is not None and d.expired()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,216 @@
+import os
+import time
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import deadline
+from deadline import DeadlineExceeded
+
+# ------------------------------------------------------------------
+# 🌐 공용 HTTP 클라이언트 (Keep-Alive 커넥션 풀)
+# ------------------------------------------------------------------
+# LS API / 토큰 / Vercel 갱신 요청이 모두 하나의 Session을 공유하여
+# 매 틱마다 TCP+TLS 핸드셰이크를 반복하지 않도록 한다.
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+# 마감까지 남은 시간이 이보다 짧으면 요청을 보내지 않고 바로 마감 초과 처리 (urllib3는 timeout 0 이하를 거부)
+MIN_TIMEOUT = 0.05   # 초
+
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))  # 호스트 수
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "8"))          # 호스트당 커넥션 수
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.3"))
+TIMING_LOG = os.getenv("HTTP_TIMING_LOG", "0") == "1"
+
+# 최근 요청 타이밍 기록 (핸드셰이크 vs 서버 응답 시간 비교용)
+TIMINGS = deque(maxlen=500)
+
+_local = threading.local()
+_session = None
+_session_lock = threading.Lock()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _local.connect_ms = (time.perf_counter() - start) * 1000
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # TCP + TLS 핸드셰이크 시간
+        start = time.perf_counter()
+        super().connect()
+        _local.connect_ms = (time.perf_counter() - start) * 1000
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    """
+    새 커넥션을 열 때만 connect 시간을 기록하는 어댑터.
+    마감(deadline) 안에서 보내는 요청은 전송 계층 재시도를 하지 않는다 (재시도는 호출부가 남은 시간 안에서 결정)
+    """
+
+    @property
+    def max_retries(self):
+        if deadline.current() is not None:
+            return _NO_RETRY
+        return self._max_retries
+
+    @max_retries.setter
+    def max_retries(self, value):
+        self._max_retries = value
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+_NO_RETRY = Retry(total=0, raise_on_status=False)
+
+
+def _build_session():
+    retry = Retry(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        # 429(요청 제한)는 재시도하지 않음: TRScheduler가 제한 응답을 보고 속도를 낮춘 뒤 재시도한다
+        status_forcelist=(500, 502, 503, 504),
+        # LS TR(POST)은 응답 상태 / 읽기 오류로 재시도하지 않음 (스케줄러 모르게 요청 수가 늘지 않도록),
+        # 연결 실패 재시도(connect)는 요청이 전송되기 전이므로 모든 메서드에 적용됨
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = _TimedAdapter(pool_connections=POOL_CONNECTIONS,
+                            pool_maxsize=POOL_MAXSIZE,
+                            max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def request(method, url, **kwargs):
+    """
+    공용 세션으로 요청을 보내고 타이밍을 기록한다.
+    - connect_ms: 새 커넥션 핸드셰이크 시간 (재사용 시 0)
+    - server_ms: 요청 전송 ~ 응답 헤더 수신 시간 (핸드셰이크 제외)
+    - total_ms: 본문 수신까지 전체 시간
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    d = deadline.current()
+    if d is not None:
+        # 남은 시간 안에서만 연결 / 응답 대기
+        remaining = d.remaining()
+        if remaining < MIN_TIMEOUT:
+            raise DeadlineExceeded("http")
+        connect, read = kwargs["timeout"] if isinstance(kwargs["timeout"], tuple) else (kwargs["timeout"],) * 2
+        kwargs["timeout"] = (min(connect, remaining), min(read, remaining))
+    _local.connect_ms = 0.0
+    start = time.perf_counter()
+    res = get_session().request(method, url, **kwargs)
+    total_ms = (time.perf_counter() - start) * 1000
+
+    connect_ms = _local.connect_ms
+    timing = {
+        "method": method,
+        "host": urlsplit(url).netloc,
+        "path": urlsplit(url).path,
+        "status": res.status_code,
+        "tr_cd": (kwargs.get("headers") or {}).get("tr_cd"),
+        "connect_ms": round(connect_ms, 1),
+        "server_ms": round(max(res.elapsed.total_seconds() * 1000 - connect_ms, 0.0), 1),
+        "total_ms": round(total_ms, 1),
+        "reused": connect_ms == 0.0,
+    }
+    res.timing = timing
+    TIMINGS.append(timing)
+    if TIMING_LOG:
+        print(f"⏱️ {method} {timing['host']}{timing['path']} "
+              f"[{timing['tr_cd'] or '-'}] {res.status_code} "
+              f"connect={timing['connect_ms']}ms server={timing['server_ms']}ms total={timing['total_ms']}ms")
+    return res
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def warm_up(url, connections=1):
+    """
+    요청 없이 url 호스트로 커넥션(TCP+TLS)을 미리 열어 풀에 넣어 둔다.
+    개장 직전에 호출하면 첫 틱부터 재사용 커넥션으로 요청할 수 있다.
+    """
+    session = get_session()
+    adapter = session.get_adapter(url)
+    # 실제 요청과 같은 풀 키(TLS 설정 포함)로 풀을 찾아야 재사용된다
+    if hasattr(adapter, "get_connection_with_tls_context"):
+        settings = session.merge_environment_settings(url, {}, None, None, None)
+        prepared = requests.Request("GET", url).prepare()
+        pool = adapter.get_connection_with_tls_context(
+            prepared, settings["verify"], proxies=settings["proxies"], cert=settings["cert"])
+    else:
+        pool = adapter.get_connection(url)
+    opened = []
+    try:
+        for _ in range(max(1, min(connections, POOL_MAXSIZE))):
+            conn = pool._get_conn()
+            if conn.sock is None:
+                conn.connect()
+            opened.append(conn)
+    finally:
+        for conn in opened:
+            pool._put_conn(conn)
+    return len(opened)
+
+
+def timing_summary():
+    """호스트별 평균 핸드셰이크/서버 시간과 커넥션 재사용률"""
+    summary = {}
+    for t in list(TIMINGS):
+        s = summary.setdefault(t["host"], {"count": 0, "reused": 0, "connect_ms": 0.0, "server_ms": 0.0, "total_ms": 0.0})
+        s["count"] += 1
+        s["reused"] += int(t["reused"])
+        s["connect_ms"] += t["connect_ms"]
+        s["server_ms"] += t["server_ms"]
+        s["total_ms"] += t["total_ms"]
+    for s in summary.values():
+        n = s["count"]
+        s["reuse_ratio"] = round(s.pop("reused") / n, 3)
+        for key in ("connect_ms", "server_ms", "total_ms"):
+            s[key] = round(s[key] / n, 1)
+    return summary
@@ -0,0 +1,170 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from metrics import IS_LEADER, LEASE_CHANGES
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 fcntl이 없는 환경에서는 파일 리스 사용 불가 (db 리스 사용)
+    fcntl = None
+
+# ------------------------------------------------------------------
+# 👑 수집기 리더 리스
+# ------------------------------------------------------------------
+# 수집기를 여러 대 띄우면 리스를 가진 1대만 시세를 조회 / 기록하고,
+# 나머지는 토큰 / 마스터 / 커넥션을 유지한 채 대기하다가 리스가 풀리면 즉시 이어받는다.
+# 기록은 (symbol, minute_bucket) 키 upsert라서(SPOOL_UPSERT=1) 인수인계 중 같은 분을 두 번 써도 중복이 생기지 않는다.
+# - file: 같은 VM의 프로세스끼리 flock (보유 프로세스가 죽으면 커널이 바로 해제)
+# - db:   Supabase의 acquire_collector_lease / release_collector_lease 함수 (VM 여러 대)
+#         LEASE_TTL 안에 갱신하지 못하면 다른 수집기가 가져감
+
+LEASE_BACKEND = os.getenv("LEASE_BACKEND", "none")   # none | file | db
+LEASE_NAME = os.getenv("LEASE_NAME", "market_night_futures")
+LEASE_PATH = os.getenv("LEASE_PATH", os.path.join(os.path.abspath(os.path.dirname(__file__)), ".collector.lease"))
+LEASE_TTL = float(os.getenv("LEASE_TTL", "15"))       # 초
+LEASE_RETRY = float(os.getenv("LEASE_RETRY", "1"))    # 초, 리스가 없을 때 재시도 간격
+
+
+def default_holder_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class FileLease:
+    """flock 기반 리스 (만료 없음: 보유 프로세스가 살아 있는 동안 유지)"""
+
+    ttl = None
+
+    def __init__(self, path=LEASE_PATH):
+        if fcntl is None:
+            raise RuntimeError("이 환경에는 fcntl이 없어 파일 리스를 사용할 수 없습니다. (LEASE_BACKEND=db)")
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        if self._fd is not None:
+            return True
+        fd = open(self.path, "a")
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fd.close()
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            self._fd.close()
+            self._fd = None
+
+
+class DbLease:
+    """Supabase RPC 기반 리스 (만료 시각은 DB 시계 기준)"""
+
+    def __init__(self, supabase_getter, name=LEASE_NAME, holder=None, ttl=LEASE_TTL):
+        self._get_supabase = supabase_getter
+        self.name = name
+        self.holder = holder or default_holder_id()
+        self.ttl = ttl
+
+    def acquire(self):
+        """새로 얻거나 내 리스를 연장하면 True"""
+        res = self._get_supabase().rpc("acquire_collector_lease", {
+            "p_name": self.name, "p_holder": self.holder, "p_ttl_seconds": int(self.ttl)}).execute()
+        return bool(res.data)
+
+    def release(self):
+        self._get_supabase().rpc("release_collector_lease",
+                                 {"p_name": self.name, "p_holder": self.holder}).execute()
+
+
+class LeaseKeeper:
+    """
+    백그라운드에서 리스를 얻고 / 연장하는 스레드.
+    - is_leader(): 마지막 연장 성공 후 TTL의 2/3가 지나지 않았을 때만 True
+      (DB에 닿지 않으면 만료 전에 스스로 물러나서 두 대가 동시에 쓰는 구간을 줄임)
+    - wait_for_leadership(timeout): 대기 중인 수집기가 리스를 얻는 즉시 깨어나기 위한 대기
+    """
+
+    def __init__(self, lease, retry=LEASE_RETRY):
+        self.lease = lease
+        self.retry = retry
+        ttl = getattr(lease, "ttl", None)
+        self.valid_for = ttl * 2 / 3 if ttl else None
+        self.renew_every = ttl / 3 if ttl else retry
+        self._renewed_at = None
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        IS_LEADER.set(0)
+
+    def is_leader(self):
+        if not self._leader.is_set():
+            return False
+        if self.valid_for is not None and time.monotonic() - self._renewed_at > self.valid_for:
+            self._set_leader(False, "갱신 지연")
+            return False
+        return True
+
+    def wait_for_leadership(self, timeout):
+        return self._leader.wait(max(timeout, 0))
+
+    def _set_leader(self, leader, reason=""):
+        if leader == self._leader.is_set():
+            return
+        if leader:
+            self._leader.set()
+            print("👑 리더 리스 획득 - 이 수집기가 시세를 기록합니다.")
+        else:
+            self._leader.clear()
+            print(f"🪑 리더 리스 상실 ({reason}) - 대기 모드로 전환합니다.")
+        IS_LEADER.set(1 if leader else 0)
+        LEASE_CHANGES.inc(result="acquired" if leader else "lost")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                ok = self.lease.acquire()
+            except Exception as e:
+                print(f"⚠️ 리스 갱신 실패: {e}")
+                ok = None
+            if ok:
+                self._renewed_at = time.monotonic()
+                self._set_leader(True)
+            elif ok is False and self._leader.is_set():
+                # 내 리스가 만료되어 다른 수집기에게 넘어감
+                self._set_leader(False, "다른 수집기가 보유")
+            else:
+                # 갱신 실패(DB 장애)는 유효 시간이 남아 있는 동안만 버팀
+                self.is_leader()
+            self._stop.wait(self.renew_every if self._leader.is_set() else self.retry)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """종료 시 리스를 바로 반납해서 대기 중인 수집기가 TTL을 기다리지 않게 함"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(5)
+        try:
+            self.lease.release()
+        except Exception as e:
+            print(f"⚠️ 리스 반납 실패 (TTL 후 만료): {e}")
+        self._set_leader(False, "종료")
+
+
+def from_env(supabase_getter):
+    """LEASE_BACKEND 설정으로 LeaseKeeper 생성 (none이면 None: 단일 수집기)"""
+    if LEASE_BACKEND == "file":
+        return LeaseKeeper(FileLease())
+    if LEASE_BACKEND == "db":
+        return LeaseKeeper(DbLease(supabase_getter))
+    return None
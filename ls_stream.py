@@ -0,0 +1,202 @@
+import os
+import json
+import time
+import threading
+from metrics import STREAM_MESSAGES, STREAM_RECONNECTS
+
+try:
+    import websocket   # pip install websocket-client
+except ImportError:  # 실시간 모드는 선택 사항 (없으면 REST 폴링만 사용)
+    websocket = None
+
+# ------------------------------------------------------------------
+# 📶 LS 실시간 체결 WebSocket 피드
+# ------------------------------------------------------------------
+# 야간선물 체결(NC0)을 구독해 종목별 최신 체결을 메모리에 들고 있다가,
+# 수집 루프가 fetch_tick()에서 REST 호출 없이 그대로 가져가게 한다.
+# - 끊기면 지수 백오프로 재연결하고 현재 종목 목록으로 다시 구독
+# - 근월물 롤오버 등으로 종목 목록이 바뀌면 구독을 맞춰서 갱신
+# - 마지막 체결 후 STREAM_SILENCE_TIMEOUT초가 지나면 is_live()가 False → REST 폴링으로 대체
+#   구독: {"header": {"token": ..., "tr_type": "3"}, "body": {"tr_cd": "NC0", "tr_key": <shcode>}}
+#   체결: {"header": {"tr_cd": "NC0", "tr_key": ...}, "body": {"price", "change", "drate", "volume", ...}}
+
+WS_URL = os.getenv("LS_WS_URL", "wss://openapi.ls-sec.co.kr:9443/websocket")
+WS_TR_CD = os.getenv("LS_WS_TR_CD", "NC0")
+SILENCE_TIMEOUT = float(os.getenv("STREAM_SILENCE_TIMEOUT", "30"))  # 초
+MAX_BACKOFF = float(os.getenv("STREAM_MAX_BACKOFF", "30"))          # 초
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+
+TR_SUBSCRIBE = "3"
+TR_UNSUBSCRIBE = "4"
+
+
+def parse_trade(body, item):
+    """실시간 체결 body -> 수집 행 (t8456 응답과 같은 형식)"""
+    return {
+        "symbol": item["hname"],
+        "price": float(body["price"]),
+        "change": float(body["change"]),
+        "diff": float(body.get("drate", body.get("diff", 0))),
+        "volume": int(body["volume"]),
+    }
+
+
+class RealtimeFeed:
+    """
+    종목별 최신 체결을 유지하는 백그라운드 WebSocket 구독자.
+    - symbols_getter: 구독할 마스터 항목 목록(list[dict])을 반환하는 함수 (MasterCache 기반)
+    - token_manager: 구독 헤더에 넣을 토큰 / 토큰 거부 시 재발급
+    """
+
+    def __init__(self, symbols_getter, token_manager, url=WS_URL, tr_cd=WS_TR_CD,
+                 silence_timeout=SILENCE_TIMEOUT, max_backoff=MAX_BACKOFF):
+        self._get_symbols = symbols_getter
+        self._tokens = token_manager
+        self.url = url
+        self.tr_cd = tr_cd
+        self.silence_timeout = silence_timeout
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._latest = {}          # hname -> (monotonic, row)
+        self._subscribed = {}      # shcode -> 마스터 항목
+        self._last_message = 0.0
+        self._received = False
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"connects": 0, "messages": 0, "reconnects": 0}
+        self.enabled = websocket is not None
+        if not self.enabled:
+            print("⚠️ websocket-client 패키지가 없어 실시간 모드 없이 REST 폴링만 사용합니다. (pip install websocket-client)")
+
+    # -- 조회 (수집 루프) --------------------------------------------------
+    def is_live(self, now=None):
+        """마지막 체결 후 silence_timeout 이내인지"""
+        now = now or time.monotonic()
+        return self._last_message > 0 and now - self._last_message < self.silence_timeout
+
+    def snapshot(self, max_age=None):
+        """종목별 최신 체결 행 (max_age초보다 오래된 종목은 제외)"""
+        max_age = self.silence_timeout if max_age is None else max_age
+        now = time.monotonic()
+        with self._lock:
+            return {hname: dict(row) for hname, (at, row) in self._latest.items() if now - at < max_age}
+
+    # -- 구독 ------------------------------------------------------------
+    def _send(self, ws, tr_type, shcode):
+        ws.send(json.dumps({"header": {"token": self._tokens.get_token(), "tr_type": tr_type},
+                            "body": {"tr_cd": self.tr_cd, "tr_key": shcode}}))
+
+    def _sync_subscriptions(self, ws):
+        """현재 종목 목록과 구독 상태를 맞춤 (롤오버 / 재연결 후)"""
+        wanted = {item["shcode"]: item for item in self._get_symbols() if item}
+        for shcode in list(self._subscribed):
+            if shcode not in wanted:
+                self._send(ws, TR_UNSUBSCRIBE, shcode)
+                del self._subscribed[shcode]
+        for shcode, item in wanted.items():
+            if shcode not in self._subscribed:
+                self._send(ws, TR_SUBSCRIBE, shcode)
+                self._subscribed[shcode] = item
+
+    def _handle(self, raw):
+        msg = json.loads(raw)
+        header, body = msg.get("header") or {}, msg.get("body")
+        if not body:
+            # 구독 응답: 토큰 거부면 재발급 후 재연결
+            rsp_cd, rsp_msg = header.get("rsp_cd", "00000"), header.get("rsp_msg", "")
+            if rsp_cd != "00000":
+                if "토큰" in rsp_msg or rsp_cd == "IGW00121":
+                    self._tokens.invalidate()
+                raise ConnectionError(f"구독 실패 ({rsp_cd}): {rsp_msg}")
+            return
+        item = self._subscribed.get(header.get("tr_key"))
+        if header.get("tr_cd") != self.tr_cd or item is None:
+            return
+        row = parse_trade(body, item)
+        now = time.monotonic()
+        with self._lock:
+            self._latest[row["symbol"]] = (now, row)
+            self._last_message = now
+        self.stats["messages"] += 1
+        STREAM_MESSAGES.inc(tr_cd=self.tr_cd)
+
+    # -- 연결 루프 --------------------------------------------------------
+    def _session(self):
+        """연결 1회: 구독 후 수신. 끊기거나 장시간 무응답이면 예외/반환으로 재연결 (self._received: 체결 수신 여부)"""
+        ws = websocket.create_connection(self.url, timeout=CONNECT_TIMEOUT)
+        self.stats["connects"] += 1
+        self._subscribed = {}
+        self._received = False
+        try:
+            ws.settimeout(1.0)
+            self._sync_subscriptions(ws)
+            last_seen = last_sync = time.monotonic()
+            while not self._stop.is_set():
+                try:
+                    raw = ws.recv()
+                except websocket.WebSocketTimeoutException:
+                    raw = None
+                now = time.monotonic()
+                if raw:
+                    self._handle(raw)
+                    self._received, last_seen = True, now
+                elif raw == "":
+                    raise ConnectionError("서버가 연결을 닫았습니다.")
+                # 반쯤 끊긴 연결은 수신이 멈추므로 무응답이 길어지면 다시 연결
+                if now - last_seen > self.silence_timeout * 2:
+                    STREAM_RECONNECTS.inc(reason="silent")
+                    return
+                if now - last_sync > 30:
+                    self._sync_subscriptions(ws)
+                    last_sync = now
+        finally:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            self._received = False
+            try:
+                self._session()
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                # 체결을 받던 연결이 끊긴 경우는 백오프를 처음부터 다시 시작
+                if self._received:
+                    backoff = 1.0
+                print(f"⚠️ 실시간 피드 연결 끊김: {e} ({backoff:.0f}초 후 재연결)")
+                STREAM_RECONNECTS.inc(reason="error")
+            else:
+                if self._received:
+                    backoff = 1.0
+            self.stats["reconnects"] += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def start(self):
+        if not self.enabled:
+            return False
+        if self._thread and self._thread.is_alive():
+            return True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ls-stream", daemon=True)
+        self._thread.start()
+        print(f"📶 실시간 피드 시작: {self.url} ({self.tr_cd})")
+        return True
+
+    def stop(self, timeout=5):
+        """세션 종료 시 구독 해제 (다음 세션 워밍업 때 다시 start)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._latest.clear()
+            self._last_message = 0.0
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
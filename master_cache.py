@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+from datetime import datetime, date, timedelta
+import pytz
+
+# ------------------------------------------------------------------
+# 📚 t8432 선물 마스터 캐시
+# ------------------------------------------------------------------
+# t8432 마스터는 만기(롤오버) 때만 바뀌므로 세션당 1회만 조회하고,
+# 매 틱에서는 캐시된 근월물(front month) 종목을 그대로 사용한다.
+
+KST = pytz.timezone('Asia/Seoul')
+# 야간장은 18:00 ~ 익일 06:00 이므로 07시 이전은 전날 세션으로 본다
+SESSION_ROLL_HOUR = 7
+
+
+def is_kospi200_future(item):
+    """코스피200 선물(스프레드 제외) 여부 - 기존 필터링 로직과 동일"""
+    return item["hname"].startswith("F ") and (
+        item["shcode"].startswith("A01") or item["shcode"].startswith("101"))
+
+
+def session_date_of(now):
+    """야간 세션 기준 날짜 (새벽 시간대는 전날 세션으로 취급)"""
+    if now.hour < SESSION_ROLL_HOUR:
+        return (now - timedelta(days=1)).date()
+    return now.date()
+
+
+def contract_expiry(hname):
+    """
+    'F 2603' -> 2026-03 두 번째 목요일 (코스피200 선물 최종거래일)
+    파싱할 수 없으면 None
+    """
+    try:
+        ym = hname.split()[-1]
+        year, month = 2000 + int(ym[:2]), int(ym[2:4])
+        first = date(year, month, 1)
+        first_thursday = first + timedelta(days=(3 - first.weekday()) % 7)
+        return first_thursday + timedelta(days=7)
+    except (ValueError, IndexError):
+        return None
+
+
+class MasterCache:
+    """
+    t8432 마스터 리스트를 세션 단위로 캐싱하고 shcode/hname 인덱스를 제공한다.
+    - fetcher: 마스터 리스트(list[dict])를 반환하는 함수 (API 호출 담당)
+    - 세션이 바뀌거나, 캐시된 근월물이 만기일에 도달하면 자동 갱신
+    - t8456이 종목코드를 거부하면 get_front_month(force=True)로 강제 갱신
+    """
+
+    def __init__(self, fetcher=None):
+        self._fetcher = fetcher
+        self._lock = threading.Lock()
+        self.items = []
+        self.by_shcode = {}
+        self.by_hname = {}
+        self.front = None
+        self.session_date = None
+        self.loaded_at = None
+
+    @classmethod
+    def from_file(cls, path, now=None):
+        """저장된 t8432 응답(JSON)으로 캐시 생성 - 오프라인 검증용"""
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if isinstance(payload, dict):
+            payload = payload.get("t8432OutBlock", [])
+        cache = cls(fetcher=lambda: payload)
+        cache.load(payload, now=now)
+        return cache
+
+    def load(self, master_list, now=None):
+        """마스터 리스트로 인덱스를 재구성하고 근월물을 결정"""
+        now = now or datetime.now(KST)
+        session_date = session_date_of(now)
+
+        self.items = list(master_list or [])
+        self.by_shcode = {item["shcode"]: item for item in self.items}
+        self.by_hname = {item["hname"]: item for item in self.items}
+        self.session_date = session_date
+        self.loaded_at = now
+
+        futures = [item for item in self.items if is_kospi200_future(item)]
+        # 만기일 당일 야간 세션부터는 만기 종목을 건너뛰고 차월물로 롤오버
+        alive = [item for item in futures
+                 if (contract_expiry(item["hname"]) or date.max) > session_date]
+        candidates = alive or futures
+        self.front = min(candidates,
+                         key=lambda item: contract_expiry(item["hname"]) or date.max,
+                         default=None)
+        return self.front
+
+    def needs_refresh(self, now=None):
+        if self.front is None:
+            return True
+        now = now or datetime.now(KST)
+        session_date = session_date_of(now)
+        if session_date != self.session_date:
+            return True
+        expiry = contract_expiry(self.front["hname"])
+        return expiry is not None and expiry <= session_date
+
+    def refresh(self, now=None):
+        """
+        fetcher로 마스터를 다시 받아 캐시 갱신.
+        빈 응답이면 기존 캐시를 유지하되, 캐시된 근월물이 만기에 도달했으면 None (만기 종목을 계속 조회하지 않음)
+        """
+        if self._fetcher is None:
+            return self.front
+        master_list = self._fetcher()
+        if not master_list:
+            expiry = contract_expiry(self.front["hname"]) if self.front else None
+            if expiry is not None and expiry <= session_date_of(now or datetime.now(KST)):
+                print(f"⚠️ 마스터 응답이 비어 있고 캐시된 근월물 {self.front['hname']}은(는) 만기 - 다음 틱에 재조회")
+                return None
+            return self.front
+        front = self.load(master_list, now=now)
+        if front:
+            print(f"📚 마스터 캐시 갱신: 근월물 {front['hname']} ({front['shcode']}), 총 {len(self.items)}종목")
+        return front
+
+    def get_front_month(self, force=False, now=None):
+        """세션 내에서는 캐시를 그대로 반환, 필요할 때만 t8432 재조회"""
+        with self._lock:
+            if force or self.needs_refresh(now):
+                return self.refresh(now=now)
+            return self.front
+
+    def get_futures(self, force=False, now=None):
+        """
+        만기 전인 코스피200 선물 전 종목 (만기 순 정렬, 첫 번째가 근월물).
+        근월물 결정과 같은 갱신 규칙을 따른다.
+        """
+        front = self.get_front_month(force=force, now=now)
+        if not front:
+            return []
+        front_expiry = contract_expiry(front["hname"]) or date.min
+        futures = [item for item in self.items if is_kospi200_future(item)
+                   and (contract_expiry(item["hname"]) or date.max) >= front_expiry]
+        return sorted(futures, key=lambda item: contract_expiry(item["hname"]) or date.max)
+
+    def invalidate(self):
+        with self._lock:
+            self.front = None
+
+    def get(self, code):
+        """shcode 또는 hname으로 종목 조회"""
+        return self.by_shcode.get(code) or self.by_hname.get(code)
+
+
+if __name__ == "__main__":
+    # 저장된 t8432 응답으로 캐시 동작 확인 (API 호출 없음)
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "t8432_full_result.json")
+    cache = MasterCache.from_file(path)
+    print(f"총 {len(cache.items)}종목, 세션 {cache.session_date}")
+    for item in cache.items:
+        mark = "👉" if item is cache.front else "  "
+        print(f"{mark} {item['hname']:<14} {item['shcode']}  만기 {contract_expiry(item['hname'])}")
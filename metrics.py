@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ------------------------------------------------------------------
+# 📊 단계별 계측 + 메트릭 엔드포인트 + JSON 로그
+# ------------------------------------------------------------------
+# with span("t8456"): ...  형태로 단계를 감싸면 소요 시간이 히스토그램에 쌓이고,
+# 카운터(성공 / 재시도 / 토큰 재발급 / 버린 틱 / 거래량 0 스킵 등)와 함께
+# 로컬 HTTP 엔드포인트(Prometheus 텍스트 형식)로 노출된다.
+#   curl http://127.0.0.1:9108/metrics        # Prometheus 형식
+#   curl http://127.0.0.1:9108/metrics.json   # JSON 스냅샷
+# LOG_JSON=1이면 단계/틱마다 JSON 한 줄 로그를 남긴다 (기본: stdout → pm2 로그).
+# 수집 루프 부담: 단계당 perf_counter 2회 + 잠금 1회 수준
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))   # 0이면 엔드포인트 비활성
+LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+LOG_JSON_PATH = os.getenv("LOG_JSON_PATH", "")           # 비어 있으면 stdout
+# 히스토그램 구간 (초) - 로컬 처리(ms 단위)부터 LS 지연/재시도(수 초)까지
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in key) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return {_format_labels(key) or "_": value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    out.append((f"{self.name}_bucket", key + (("le", repr(float(bound))),), cumulative))
+                out.append((f"{self.name}_bucket", key + (("le", "+Inf"),), series[-1]))
+                out.append((f"{self.name}_sum", key, round(series[-2], 6)))
+                out.append((f"{self.name}_count", key, series[-1]))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            return {_format_labels(key) or "_": {"count": series[-1], "sum": round(series[-2], 6)}
+                    for key, series in self._series.items()}
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, fn):
+        """스크레이프 시점에 호출되어 게이지를 갱신하는 함수 (스풀 깊이, 큐 깊이 등)"""
+        self._collectors.append(fn)
+
+    def _collect(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"⚠️ 메트릭 수집 함수 오류: {e}")
+
+    def render(self):
+        """Prometheus 텍스트 노출 형식"""
+        self._collect()
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        self._collect()
+        return {metric.name: metric.snapshot() for metric in list(self._metrics.values())}
+
+
+REGISTRY = Registry()
+
+# 공용 메트릭 (각 모듈에서 import 하여 사용)
+STAGE_SECONDS = REGISTRY.histogram("collector_stage_seconds", "단계별 소요 시간(초)")
+STAGE_ERRORS = REGISTRY.counter("collector_stage_errors_total", "예외로 끝난 단계 수")
+TICKS = REGISTRY.counter("collector_ticks_total", "틱 결과별 횟수 (ok / empty / no_volume / standby / error)")
+RETRIES = REGISTRY.counter("ls_retries_total", "LS 요청 재시도 횟수 (throttled / token_expired / empty / error)")
+TOKEN_REFRESHES = REGISTRY.counter("ls_token_refresh_total", "토큰 발급 횟수 (scheduled / invalid)")
+DROPPED = REGISTRY.counter("collector_dropped_total", "버려진 샘플 수 (파이프라인 큐 포화 / 수집 마감 초과)")
+DB_ROWS = REGISTRY.counter("db_flushed_rows_total", "Supabase에 반영된 행 수")
+REVALIDATIONS = REGISTRY.counter("revalidate_total", "Vercel 갱신 요청 결과 (ok / failed / gave_up)")
+CLEANUP_ROWS = REGISTRY.counter("cleanup_archived_rows_total", "정리 작업에서 아카이브 후 삭제한 행 수")
+DEADLINE_MISSES = REGISTRY.counter("collector_deadline_misses_total", "틱 마감 시간 초과 횟수 (초과를 감지한 단계별)")
+HEDGES = REGISTRY.counter("ls_hedged_requests_total", "헤지 요청 (sent: 복제 전송 / won: 복제가 먼저 도착)")
+STREAM_MESSAGES = REGISTRY.counter("ls_stream_messages_total", "실시간 체결 수신 건수 (tr_cd별)")
+STREAM_RECONNECTS = REGISTRY.counter("ls_stream_reconnects_total", "실시간 WebSocket 재연결 횟수 (reason별)")
+IS_LEADER = REGISTRY.gauge("collector_is_leader", "리더 리스 보유 여부 (1: 기록 중 / 0: 대기)")
+LEASE_CHANGES = REGISTRY.counter("collector_lease_changes_total", "리더 리스 획득 / 상실 횟수")
+BACKFILL_ROWS = REGISTRY.counter("backfill_minutes_total", "백필한 누락 분 수 (filled / unfillable: 분봉 없음)")
+BACKFILL_PENDING = REGISTRY.gauge("backfill_pending_minutes", "백필 대기 중인 누락 분 수")
+READ_REQUESTS = REGISTRY.counter("read_api_requests_total", "읽기 API 요청 수 (endpoint / status별, 304 포함)")
+STREAM_CLIENTS = REGISTRY.gauge("read_api_stream_clients", "읽기 API SSE 구독자 수")
+
+
+# ------------------------------------------------------------------
+# 📝 JSON 로그
+# ------------------------------------------------------------------
+_log_lock = threading.Lock()
+_log_file = None
+
+
+def log_event(event, **fields):
+    """LOG_JSON=1일 때 JSON 한 줄 기록 (기존 이모지 로그는 그대로 유지)"""
+    global _log_file
+    if not LOG_JSON:
+        return
+    line = json.dumps({"ts": datetime.now().astimezone().isoformat(timespec="milliseconds"),
+                       "event": event, **fields}, ensure_ascii=False, default=str)
+    with _log_lock:
+        if LOG_JSON_PATH:
+            if _log_file is None:
+                _log_file = open(LOG_JSON_PATH, "a", encoding="utf-8", buffering=1)
+            _log_file.write(line + "\n")
+        else:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+
+
+@contextmanager
+def span(stage, **fields):
+    """단계 소요 시간 측정: 히스토그램 + (실패 시) 오류 카운터 + JSON 로그"""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if LOG_JSON:
+            log_event("span", stage=stage, ms=round(elapsed * 1000, 2), ok=ok, **fields)
+
+
+# ------------------------------------------------------------------
+# 🌐 로컬 메트릭 엔드포인트
+# ------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = self.registry.render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif path == "/metrics.json":
+            body = json.dumps(self.registry.snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=METRICS_PORT, host=METRICS_HOST, registry=REGISTRY):
+    """백그라운드 스레드로 메트릭 엔드포인트 시작 (port=0이면 시작하지 않음)"""
+    if not port:
+        return None
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    try:
+        server = ThreadingHTTPServer((host, port), handler)
+    except OSError as e:
+        print(f"⚠️ 메트릭 엔드포인트 시작 실패 ({host}:{port}): {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📊 메트릭 엔드포인트: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,148 @@
+import os
+import time
+import queue
+import threading
+from metrics import DROPPED
+
+# ------------------------------------------------------------------
+# 🧵 수집 → 저장 → 갱신 파이프라인
+# ------------------------------------------------------------------
+# 수집 루프는 샘플을 publish()만 하고 바로 다음 틱을 준비한다.
+# DB 저장 / Vercel 갱신은 각자의 워커 스레드와 bounded queue에서 처리되므로
+# 느린 sink가 시세 수집을 지연시키지 않는다.
+
+DROP_OLDEST = "drop_oldest"   # 큐가 가득 차면 가장 오래된 항목을 버리고 새 항목 추가
+DROP_NEWEST = "drop_newest"   # 큐가 가득 차면 새 항목을 버림
+BLOCK = "block"               # put_timeout 동안 대기 후에도 가득 차 있으면 새 항목을 버림
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class Stage:
+    """단일 sink 단계: bounded queue + 전용 워커 스레드"""
+
+    def __init__(self, name, handler, maxsize=100, policy=DROP_OLDEST, put_timeout=0.5):
+        if policy not in POLICIES:
+            raise ValueError(f"알 수 없는 드롭 정책: {policy} (가능: {', '.join(POLICIES)})")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.queue = queue.Queue(maxsize=maxsize)
+        # submit()은 수집 스레드, 나머지는 워커 스레드에서 갱신하므로 잠금 아래에서만 변경
+        self._stats_lock = threading.Lock()
+        self.stats = {"submitted": 0, "processed": 0, "dropped": 0, "failed": 0, "max_lag_s": 0.0}
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls, name, handler, default_size, default_policy):
+        """<NAME>_QUEUE_SIZE / <NAME>_DROP_POLICY 환경변수로 설정"""
+        prefix = name.upper()
+        return cls(name, handler,
+                   maxsize=int(os.getenv(f"{prefix}_QUEUE_SIZE", str(default_size))),
+                   policy=os.getenv(f"{prefix}_DROP_POLICY", default_policy))
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _drop(self):
+        self._count("dropped")
+        DROPPED.inc(where=self.name)
+
+    def snapshot(self):
+        """통계 사본 + 현재 큐 깊이"""
+        with self._stats_lock:
+            return dict(self.stats, depth=self.depth())
+
+    def submit(self, item):
+        """수집 루프에서 호출 - 정책에 따라 절대 오래 막히지 않는다"""
+        self._count("submitted")
+        entry = (time.monotonic(), item)
+        try:
+            if self.policy == BLOCK:
+                self.queue.put(entry, timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                self._drop()
+                return False
+            self._drop()
+            print(f"⚠️ [{self.name}] 큐 포화 - 가장 오래된 항목을 버렸습니다.")
+            return True
+
+        self._drop()
+        print(f"⚠️ [{self.name}] 큐 포화 - 새 항목을 버렸습니다.")
+        return False
+
+    def _run(self):
+        while not self._stop.is_set() or not self.queue.empty():
+            try:
+                enqueued_at, item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            lag = time.monotonic() - enqueued_at
+            with self._stats_lock:
+                self.stats["max_lag_s"] = max(self.stats["max_lag_s"], round(lag, 3))
+            try:
+                self.handler(item)
+                self._count("processed")
+            except Exception as e:
+                self._count("failed")
+                print(f"🔥 [{self.name}] 처리 실패: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """남은 항목을 최대 timeout초 동안 처리한 뒤 종료"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def depth(self):
+        return self.queue.qsize()
+
+
+class Pipeline:
+    """수집된 샘플을 등록된 모든 Stage로 분배"""
+
+    def __init__(self, stages=()):
+        self.stages = list(stages)
+
+    def add(self, stage):
+        self.stages.append(stage)
+        return stage
+
+    def publish(self, item):
+        for stage in self.stages:
+            stage.submit(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=10):
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    def stats(self):
+        return {stage.name: stage.snapshot() for stage in self.stages}
@@ -0,0 +1,192 @@
+import os
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+import deadline
+from deadline import DeadlineExceeded
+from metrics import RETRIES
+
+# ------------------------------------------------------------------
+# 🚦 LS OpenAPI TR별 요청 스케줄러 (토큰 버킷)
+# ------------------------------------------------------------------
+# LS OpenAPI는 TR 코드별 초당 요청 수 제한이 있으므로,
+# TR마다 토큰 버킷을 두고 우선순위 순으로 호출을 내보낸다.
+# 제한 초과 응답을 받으면 해당 TR의 속도를 절반으로 낮추고 잠시 쉬었다가,
+# 정상 응답이 이어지면 설정값까지 천천히 복구한다.
+
+PRIORITY_HIGH = 0     # 실시간 수집 (근월물 시세, 토큰)
+PRIORITY_NORMAL = 5   # 마스터 조회, 다종목 수집
+PRIORITY_LOW = 9      # 백필 등 배치 작업
+
+# "t8432=1,t8456=2,token=1" 형식, 단위: 초당 요청 수 (t8415: 백필용 분봉 차트, t1511: 코스피200 지수)
+DEFAULT_LIMITS = "t8432=1,t8456=2,t8415=1,t1511=1,token=1"
+THROTTLE_RETRIES = int(os.getenv("LS_THROTTLE_RETRIES", "3"))
+THROTTLE_COOLDOWN = float(os.getenv("LS_THROTTLE_COOLDOWN", "1.0"))  # 초
+THROTTLE_MARKERS = ("IGW00201", "초당", "전송 건수", "Too Many Requests")
+
+
+def parse_limits(spec):
+    limits = {}
+    for part in spec.split(","):
+        if "=" in part:
+            tr_cd, rate = part.split("=", 1)
+            limits[tr_cd.strip()] = float(rate)
+    return limits
+
+
+def is_throttled(res):
+    """LS 제한 초과 응답 판별 (429 또는 초당 건수 초과 메시지)"""
+    if res is None:
+        return False
+    if res.status_code == 429:
+        return True
+    if res.status_code >= 400:
+        return any(marker in res.text[:500] for marker in THROTTLE_MARKERS)
+    return False
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.target_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """토큰 1개를 쓰려면 몇 초 기다려야 하는지"""
+        self._refill(now)
+        wait = max(self.blocked_until - now, 0.0)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self):
+        self.tokens -= 1
+
+    def penalize(self, now, cooldown):
+        """제한 초과: 속도를 절반으로 낮추고 cooldown 동안 호출 중지"""
+        self.rate = max(self.target_rate * 0.1, self.rate * 0.5)
+        self.tokens = 0
+        self.blocked_until = now + cooldown
+
+    def reward(self):
+        """정상 응답: 목표 속도까지 조금씩 복구"""
+        if self.rate < self.target_rate:
+            self.rate = min(self.target_rate, self.rate + self.target_rate * 0.1)
+
+
+class _TRQueue:
+    def __init__(self, rate):
+        self.bucket = TokenBucket(rate)
+        self.waiters = []   # (priority, seq)
+        self.waits = deque(maxlen=1000)
+        self.stats = {"calls": 0, "throttled": 0, "max_depth": 0}
+
+
+class TRScheduler:
+    """
+    scheduler.call(tr_cd, fn, priority) 형태로 사용.
+    fn은 requests.Response를 반환하는 함수이며, 제한 초과 응답이면 쿨다운 후 재시도한다.
+    """
+
+    def __init__(self, limits=None, default_rate=1.0):
+        self.limits = limits if limits is not None else parse_limits(os.getenv("LS_RATE_LIMITS", DEFAULT_LIMITS))
+        self.default_rate = default_rate
+        self._queues = {}
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+
+    def _queue(self, tr_cd):
+        q = self._queues.get(tr_cd)
+        if q is None:
+            q = self._queues[tr_cd] = _TRQueue(self.limits.get(tr_cd, self.default_rate))
+        return q
+
+    def _acquire(self, tr_cd, priority):
+        """차례가 올 때까지 대기. 현재 스레드의 마감이 먼저 지나면 대기열에서 빠지고 DeadlineExceeded"""
+        start = time.monotonic()
+        d = deadline.current()
+        with self._cond:
+            q = self._queue(tr_cd)
+            entry = (priority, next(self._seq))
+            heapq.heappush(q.waiters, entry)
+            q.stats["max_depth"] = max(q.stats["max_depth"], len(q.waiters))
+            while True:
+                now = time.monotonic()
+                if q.waiters[0] == entry:
+                    wait = q.bucket.wait_time(now)
+                    if wait <= 0:
+                        heapq.heappop(q.waiters)
+                        q.bucket.consume()
+                        self._cond.notify_all()
+                        break
+                else:
+                    wait = 1.0
+                if d is not None:
+                    if d.expired():
+                        q.waiters.remove(entry)
+                        heapq.heapify(q.waiters)
+                        self._cond.notify_all()
+                        raise DeadlineExceeded(tr_cd)
+                    wait = min(wait, d.remaining())
+                self._cond.wait(timeout=wait)
+            waited = time.monotonic() - start
+            q.waits.append(waited)
+            q.stats["calls"] += 1
+        return waited
+
+    def call(self, tr_cd, fn, priority=PRIORITY_NORMAL):
+        res = None
+        for attempt in range(THROTTLE_RETRIES + 1):
+            self._acquire(tr_cd, priority)
+            res = fn()
+            with self._cond:
+                q = self._queue(tr_cd)
+                if is_throttled(res):
+                    q.stats["throttled"] += 1
+                    RETRIES.inc(tr_cd=tr_cd, reason="throttled")
+                    cooldown = THROTTLE_COOLDOWN * (2 ** attempt)
+                    q.bucket.penalize(time.monotonic(), cooldown)
+                    print(f"🚦 [{tr_cd}] 요청 제한 초과 - {cooldown:.1f}초 대기, 속도 {q.bucket.rate:.2f}/s로 하향 ({attempt+1}/{THROTTLE_RETRIES + 1})")
+                    continue
+                q.bucket.reward()
+            return res
+        return res
+
+    def stats(self):
+        """TR별 대기열 깊이 / 대기 시간 / 현재 속도"""
+        out = {}
+        with self._cond:
+            for tr_cd, q in self._queues.items():
+                waits = sorted(q.waits)
+                pick = lambda p: round(waits[min(int(p * len(waits)), len(waits) - 1)], 3) if waits else 0.0
+                out[tr_cd] = dict(q.stats,
+                                  depth=len(q.waiters),
+                                  rate=round(q.bucket.rate, 3),
+                                  target_rate=q.bucket.target_rate,
+                                  wait_p50=pick(0.5),
+                                  wait_p95=pick(0.95),
+                                  wait_max=round(waits[-1], 3) if waits else 0.0)
+        return out
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """프로세스 공용 스케줄러 (app.py / token_manager.py 공유)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TRScheduler()
+    return _scheduler
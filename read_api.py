@@ -0,0 +1,450 @@
+import os
+import json
+import gzip
+import zlib
+import queue
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytz
+from metrics import READ_REQUESTS, STREAM_CLIENTS
+
+# ------------------------------------------------------------------
+# 🛰️ 로컬 읽기 API (최근 N개 / 기간 / 봉 + SSE 실시간 틱)
+# ------------------------------------------------------------------
+# 수집기 메모리의 윈도우를 그대로 서빙해서 읽는 쪽이 Supabase를 거치지 않게 한다.
+#   GET /api/latest?symbol=F 2612&n=100
+#   GET /api/range?symbol=...&from=2026-10-16T09:00:00Z&to=...
+#   GET /api/bars?symbol=...&interval=5m&n=50   (from / to도 가능)
+#   GET /api/symbols
+#   GET /api/stream?symbol=...                  (text/event-stream, event: tick / bar)
+# - 응답은 종목(또는 봉) 버전별로 캐시하고 ETag로 내보내므로, If-None-Match가 같으면 304 (직렬화 없음)
+# - 윈도우 갱신은 파이프라인 stage 워커에서 일어나며 틱 루프는 큐에 넣기만 한다
+# - SSE 구독자마다 제한된 큐를 두고, 느린 구독자는 오래된 이벤트부터 버림 (Last-Event-ID로 재개)
+# symbol을 생략하면 근월물
+
+READ_API_HOST = os.getenv("READ_API_HOST", "127.0.0.1")
+READ_API_PORT = int(os.getenv("READ_API_PORT", "9110"))   # 0이면 비활성
+READ_API_WINDOW = int(os.getenv("READ_API_WINDOW", "1440"))   # 종목별 보관 분 수 (봉은 구간별 같은 개수)
+READ_API_CORS = os.getenv("READ_API_CORS", "*")             # 비우면 CORS 헤더 생략
+READ_API_MAX_STREAMS = int(os.getenv("READ_API_MAX_STREAMS", "100"))
+SSE_QUEUE_SIZE = 256
+SSE_HEARTBEAT = 15       # 초
+SSE_REPLAY = 1000        # Last-Event-ID 재개용으로 보관하는 최근 이벤트 수
+CACHE_ENTRIES = 256
+GZIP_MIN_BYTES = 1024
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+def _epoch_minute(value):
+    ts = int(_parse_ts(value).timestamp())
+    return ts - ts % 60
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class SeriesWindow:
+    """종목별 분 단위 최신 행 / 구간별 봉 윈도우. 종목(봉) 단위 버전으로 변경 여부 판단"""
+
+    def __init__(self, size=READ_API_WINDOW):
+        self.size = size
+        self._lock = threading.Lock()
+        self._rows = {}       # symbol -> OrderedDict(epoch 분 -> row)
+        self._bars = {}       # (symbol, interval) -> OrderedDict(epoch 봉 시작 -> bar)
+        self._versions = {}   # symbol 또는 (symbol, interval) -> 마지막 이벤트 id
+        self.version = 0
+
+    def _put(self, series, key, value):
+        series[key] = value
+        series.move_to_end(key)
+        while len(series) > self.size:
+            series.popitem(last=False)
+
+    def add_row(self, row):
+        """행 반영 (같은 분이면 덮어씀). 이벤트 id 반환, 늦게 도착한 과거 행이면 None"""
+        minute = _epoch_minute(row["recorded_at"])
+        with self._lock:
+            series = self._rows.setdefault(row["symbol"], OrderedDict())
+            if series and minute < next(reversed(series)):
+                return None
+            self.version += 1
+            self._put(series, minute, row)
+            self._versions[row["symbol"]] = self.version
+            return self.version
+
+    def add_bar(self, bar):
+        start = _epoch_minute(bar["bucket_start"])
+        with self._lock:
+            key = (bar["symbol"], bar["interval"])
+            series = self._bars.setdefault(key, OrderedDict())
+            if series and start < next(reversed(series)):
+                return None
+            self.version += 1
+            self._put(series, start, bar)
+            self._versions[key] = self.version
+            return self.version
+
+    def has(self, symbol):
+        with self._lock:
+            return symbol in self._rows
+
+    def version_of(self, key):
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def rows(self, symbol, n=None, start=None, end=None):
+        with self._lock:
+            series = self._rows.get(symbol)
+            items = list(series.items()) if series else []
+        return self._select(items, n, start, end)
+
+    def bars(self, symbol, interval, n=None, start=None, end=None):
+        with self._lock:
+            series = self._bars.get((symbol, interval))
+            items = list(series.items()) if series else []
+        return self._select(items, n, start, end)
+
+    @staticmethod
+    def _select(items, n, start, end):
+        if start is not None or end is not None:
+            items = [(k, v) for k, v in items
+                     if (start is None or k >= start) and (end is None or k < end)]
+        if n is not None:
+            items = items[-n:] if n > 0 else []
+        return [v for _, v in items]
+
+    def symbols(self):
+        with self._lock:
+            return {symbol: {"version": self._versions.get(symbol, 0), "rows": len(series),
+                             "latest": next(reversed(series.values())) if series else None}
+                    for symbol, series in self._rows.items()}
+
+
+class Broadcaster:
+    """SSE 구독자 관리. publish()는 직렬화된 이벤트를 구독자 큐에 넣기만 함"""
+
+    def __init__(self, queue_size=SSE_QUEUE_SIZE, replay=SSE_REPLAY):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._recent = deque(maxlen=replay)   # (id, symbol, payload)
+        self.stats = {"published": 0, "dropped": 0}
+
+    def subscribe(self, symbol):
+        sub = (symbol, queue.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers.add(sub)
+            STREAM_CLIENTS.set(len(self._subscribers))
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+            STREAM_CLIENTS.set(len(self._subscribers))
+
+    def count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def since(self, event_id, symbol):
+        """Last-Event-ID 이후 이벤트 (보관 범위를 벗어나면 남은 것만)"""
+        with self._lock:
+            return [(eid, payload) for eid, sym, payload in self._recent
+                    if eid > event_id and (symbol is None or sym == symbol)]
+
+    def publish(self, event_id, symbol, event, data):
+        payload = b"id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event.encode(), _dumps(data))
+        with self._lock:
+            self._recent.append((event_id, symbol, payload))
+            subscribers = list(self._subscribers)
+        self.stats["published"] += 1
+        for sub_symbol, q in subscribers:
+            if sub_symbol is not None and sub_symbol != symbol:
+                continue
+            while True:
+                try:
+                    q.put_nowait((event_id, payload))
+                    break
+                except queue.Full:
+                    # 느린 구독자: 가장 오래된 이벤트를 버리고 최신 이벤트 유지
+                    try:
+                        q.get_nowait()
+                        self.stats["dropped"] += 1
+                    except queue.Empty:
+                        pass
+
+
+class ResponseCache:
+    """(경로, 쿼리) -> (버전, ETag, 본문, gzip 본문) 캐시. 버전이 같으면 재직렬화하지 않음"""
+
+    def __init__(self, size=CACHE_ENTRIES):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def etag(key, version):
+        return f'"{version:x}-{zlib.crc32(key.encode("utf-8")):08x}"'
+
+    def get(self, key, version, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry
+        body = _dumps(build())
+        packed = gzip.compress(body, compresslevel=5, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+        entry = (version, self.etag(key, version), body, packed)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return entry
+
+
+class ReadApi:
+    """
+    윈도우 + SSE 브로드캐스터 + HTTP 서버.
+    - publish_row(row): 파이프라인 stage 핸들러 (수집 행)
+    - publish_bars(bars): 완성된 봉 반영
+    - symbol_getter: symbol 생략 시 사용할 종목(근월물)
+    - seeder(symbol, limit): 종목의 첫 행 때 1회 호출해 최근 행(최신순)으로 윈도우 채움
+    """
+
+    def __init__(self, symbol_getter=None, seeder=None, window=None):
+        self.window = window or SeriesWindow()
+        self.broadcaster = Broadcaster()
+        self.cache = ResponseCache()
+        self._symbol = symbol_getter
+        self._seeder = seeder
+        self._seeded = set()
+        self._server = None
+
+    def default_symbol(self):
+        return self._symbol() if self._symbol else None
+
+    # -- 입력 (파이프라인 워커 스레드) -----------------------------------
+    def _seed(self, symbol):
+        self._seeded.add(symbol)
+        try:
+            rows = sorted(self._seeder(symbol, self.window.size) or [], key=lambda r: _parse_ts(r["recorded_at"]))
+            for row in rows:
+                self.window.add_row(row)
+            print(f"🛰️ 읽기 API 윈도우 초기화: {symbol} {len(rows)}행")
+        except Exception as e:
+            print(f"⚠️ 읽기 API 윈도우 초기화 실패 (새 샘플부터 채움): {e}")
+
+    def publish_row(self, row):
+        symbol = row["symbol"]
+        if self._seeder and symbol not in self._seeded:
+            self._seed(symbol)
+        event_id = self.window.add_row(row)
+        if event_id is not None:
+            self.broadcaster.publish(event_id, symbol, "tick", row)
+
+    def publish_bars(self, bars):
+        for bar in bars:
+            event_id = self.window.add_bar(bar)
+            if event_id is not None:
+                self.broadcaster.publish(event_id, bar["symbol"], "bar", bar)
+
+    # -- 서버 ----------------------------------------------------------
+    def start(self, port=READ_API_PORT, host=READ_API_HOST):
+        """백그라운드 스레드로 읽기 API 시작 (port=0이면 시작하지 않음)"""
+        if not port or self._server:
+            return self._server
+        handler = type("ReadApiHandler", (_ReadApiHandler,), {"api": self})
+        try:
+            server = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            print(f"⚠️ 읽기 API 시작 실패 ({host}:{port}): {e}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="read-api", daemon=True).start()
+        self._server = server
+        print(f"🛰️ 읽기 API: http://{host}:{server.server_address[1]}/api/latest")
+        return server
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class _ReadApiHandler(BaseHTTPRequestHandler):
+    api = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- 공용 ----------------------------------------------------------
+    def _cors(self):
+        if READ_API_CORS:
+            self.send_header("Access-Control-Allow-Origin", READ_API_CORS)
+
+    def _send_json(self, status, payload):
+        body = _dumps(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self._cors()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _params(self):
+        parts = urlsplit(self.path)
+        return parts.path.rstrip("/"), {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+    def _int(self, params, name, default=None):
+        if name not in params:
+            return default
+        try:
+            return max(int(params[name]), 0)
+        except ValueError:
+            raise _BadRequest(f"{name}는 정수여야 합니다.")
+
+    def _time(self, params, name):
+        if name not in params:
+            return None
+        try:
+            return int(_parse_ts(params[name]).timestamp())
+        except ValueError:
+            raise _BadRequest(f"{name}는 ISO 8601 시각이어야 합니다.")
+
+    def _symbol(self, params):
+        return params.get("symbol") or self.api.default_symbol()
+
+    def _send_cached(self, path, params, version_key, build):
+        key = path + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        version = self.api.window.version_of(version_key)
+        etag = ResponseCache.etag(key, version)
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self._cors()
+            self.end_headers()
+            return 304
+        _, etag, body, packed = self.api.cache.get(key, version, build)
+        use_gzip = packed is not None and "gzip" in self.headers.get("Accept-Encoding", "")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(len(packed if use_gzip else body)))
+        self._cors()
+        self.end_headers()
+        self.wfile.write(packed if use_gzip else body)
+        return 200
+
+    # -- 라우팅 --------------------------------------------------------
+    def do_GET(self):
+        path, params = self._params()
+        endpoint = path.rsplit("/", 1)[-1]
+        try:
+            if path == "/api/stream":
+                status = self._stream(params)
+            elif path in ("/api/latest", "/api/range", "/api/bars", "/api/symbols"):
+                status = getattr(self, f"_{endpoint}")(path, params)
+            else:
+                endpoint, status = "unknown", 404
+                self._send_json(404, {"error": "not found"})
+        except _BadRequest as e:
+            status = 400
+            self._send_json(400, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            status = 499
+        READ_REQUESTS.inc(endpoint=endpoint, status=str(status))
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._cors()
+        self.send_header("Access-Control-Allow-Headers", "If-None-Match, Last-Event-ID")
+        self.end_headers()
+
+    def _latest(self, path, params):
+        symbol = self._symbol(params)
+        n = self._int(params, "n", 100)
+        return self._send_cached(path, params, symbol, lambda: {
+            "symbol": symbol, "rows": self.api.window.rows(symbol, n=n)})
+
+    def _range(self, path, params):
+        symbol = self._symbol(params)
+        start, end = self._time(params, "from"), self._time(params, "to")
+        return self._send_cached(path, params, symbol, lambda: {
+            "symbol": symbol, "rows": self.api.window.rows(symbol, start=start, end=end)})
+
+    def _bars(self, path, params):
+        symbol = self._symbol(params)
+        interval = params.get("interval", "1m")
+        if not interval.endswith("m"):
+            interval += "m"
+        n = self._int(params, "n", None if "from" in params or "to" in params else 100)
+        start, end = self._time(params, "from"), self._time(params, "to")
+        return self._send_cached(path, params, (symbol, interval), lambda: {
+            "symbol": symbol, "interval": interval,
+            "bars": self.api.window.bars(symbol, interval, n=n, start=start, end=end)})
+
+    def _symbols(self, path, params):
+        self._send_json(200, {"default": self.api.default_symbol(), "symbols": self.api.window.symbols()})
+        return 200
+
+    def _stream(self, params):
+        broadcaster = self.api.broadcaster
+        if broadcaster.count() >= READ_API_MAX_STREAMS:
+            self._send_json(503, {"error": "too many streams"})
+            return 503
+        symbol = params.get("symbol") or None
+        if symbol == "*":
+            symbol = None
+        elif symbol is None:
+            symbol = self.api.default_symbol()
+        sub = broadcaster.subscribe(symbol)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("X-Accel-Buffering", "no")
+            self._cors()
+            self.end_headers()
+            self.wfile.write(b"retry: 3000\n\n")
+            # 재개: 구독 후에 Last-Event-ID 이후 이벤트를 다시 보냄 (큐와 겹치는 이벤트는 id로 건너뜀)
+            sent = 0
+            last_id = self.headers.get("Last-Event-ID") or params.get("last_event_id")
+            if last_id and last_id.isdigit():
+                for sent, payload in broadcaster.since(int(last_id), symbol):
+                    self.wfile.write(payload)
+            self.wfile.flush()
+            _, q = sub
+            while True:
+                try:
+                    event_id, payload = q.get(timeout=SSE_HEARTBEAT)
+                    if event_id <= sent:
+                        continue
+                except queue.Empty:
+                    payload = b": ping\n\n"
+                self.wfile.write(payload)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            broadcaster.unsubscribe(sub)
+        return 200
@@ -0,0 +1,781 @@
+import os
+import io
+import sys
+import json
+import gzip
+import time
+import random
+import base64
+import struct
+import hashlib
+import shutil
+import argparse
+import tempfile
+import threading
+import socketserver
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import pytz
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ------------------------------------------------------------------
+# 🧪 오프라인 리플레이 하네스
+# ------------------------------------------------------------------
+# LS OpenAPI / Supabase(PostgREST) / Vercel 갱신 엔드포인트를 로컬 HTTP 서버로 대체한다.
+# - Fake LS: 저장된 t8432 응답 + 기록된 세션(아카이브 NDJSON 등)을 t8456으로 재생
+#            지연/오류/토큰 만료/요청 제한을 주입할 수 있음
+# - Fake PostgREST: supabase-py가 보내는 select/insert/upsert/delete를 메모리 테이블로 처리
+# - Revalidate sink: /api/revalidate 호출 기록
+# - Fake LS WebSocket: 실시간 체결(NC0) 구독을 받아 재생 중인 세션 값을 주기적으로 푸시
+#                      연결 강제 종료 / 무응답(silence)을 주입해 재연결·REST 대체를 확인할 수 있음
+# 세션은 ReplayClock으로 배속 재생한다 (예: speed=60 이면 1초에 1분 진행).
+#
+#   python replay_harness.py --session archive/market_night_futures/2026-03-02.ndjson.gz --speed 60
+#   (출력되는 환경변수를 .env 대신 지정하고 app.py 실행)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+MASTER_PATH = os.path.join(BASE_DIR, "t8432_full_result.json")
+FAKE_SUPABASE_KEY = "replay.harness.key"
+FAKE_REVALIDATE_SECRET = "replay-secret"
+
+# upsert 충돌 키 (spool.CONFLICT_KEYS와 동일하게 유지)
+UNIQUE_KEYS = {
+    "market_night_futures": ("symbol", "minute_bucket"),
+    "market_night_futures_bars": ("symbol", "interval", "bucket_start"),
+    "market_night_futures_spreads": ("near", "far", "minute_bucket"),
+    "market_night_futures_snapshot": ("name",),
+}
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+# ------------------------------------------------------------------
+# 📼 세션 로딩 / 배속 시계
+# ------------------------------------------------------------------
+def load_session(path):
+    """
+    기록된 세션 로딩. 아카이브(.ndjson.gz / .ndjson.zst), NDJSON, JSON 배열 모두 지원.
+    각 행: {"symbol", "price", "change", "diff", "volume", "recorded_at"}
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    if path.endswith(".gz"):
+        raw = gzip.decompress(raw)
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstd 세션을 읽으려면 zstandard 패키지가 필요합니다.")
+        raw = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(raw), read_across_frames=True).read()
+    text = raw.decode("utf-8").strip()
+    rows = json.loads(text) if text.startswith("[") else [json.loads(l) for l in text.splitlines() if l.strip()]
+    return sorted(rows, key=lambda r: _parse_ts(r["recorded_at"]))
+
+
+def synthesize_session(master, minutes=660, start=None, seed=42):
+    """기록이 없을 때 마스터 전일 종가 기준 랜덤워크로 세션 생성 (18:00 KST 시작)"""
+    rng = random.Random(seed)
+    kst = pytz.timezone('Asia/Seoul')
+    start = start or kst.localize(datetime.now().replace(hour=18, minute=0, second=0, microsecond=0))
+    rows = []
+    for item in master:
+        if not item["hname"].startswith("F ") or not item["shcode"].startswith("A01"):
+            continue
+        base = float(item.get("jnilclose") or item.get("recprice") or 0) or 100.0
+        price, volume = base, 0
+        for i in range(minutes):
+            price = round(price + rng.gauss(0, base * 0.0005), 2)
+            volume += rng.randint(50, 500)
+            rows.append({
+                "symbol": item["hname"],
+                "price": price,
+                "change": round(price - base, 2),
+                "diff": round((price - base) / base * 100, 2),
+                "volume": volume,
+                "recorded_at": (start + timedelta(minutes=i)).astimezone(pytz.utc).isoformat(),
+            })
+    return sorted(rows, key=lambda r: r["recorded_at"])
+
+
+class ReplayClock:
+    """실제 경과 시간 × speed 만큼 세션 시각을 진행"""
+
+    def __init__(self, session_start, speed=1.0):
+        self.session_start = session_start
+        self.speed = speed
+        self.real_start = time.monotonic()
+
+    def now(self):
+        return self.session_start + timedelta(seconds=(time.monotonic() - self.real_start) * self.speed)
+
+
+# ------------------------------------------------------------------
+# 📡 Fake LS OpenAPI
+# ------------------------------------------------------------------
+class FakeLSState:
+    def __init__(self, master, session_rows, speed=1.0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, token_ttl=86400, throttle_per_sec=0, seed=0):
+        self.master = master
+        self.by_shcode = {item["shcode"]: item for item in master}
+        self.series = {}
+        for row in session_rows:
+            self.series.setdefault(row["symbol"], []).append(row)
+        self.default_series = next(iter(self.series.values()), [])
+        start = _parse_ts(session_rows[0]["recorded_at"]) if session_rows else datetime.now(pytz.utc)
+        self.clock = ReplayClock(start, speed)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.token_ttl = token_ttl
+        self.throttle_per_sec = throttle_per_sec
+        self.rng = random.Random(seed)
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self._window = {}  # tr_cd -> (second, count)
+        self.stats = {"token": 0, "t8432": 0, "t8456": 0, "t8415": 0, "t1511": 0, "errors": 0, "expired": 0, "throttled": 0}
+
+    def issue_token(self):
+        with self.lock:
+            token = f"fake-{len(self.tokens) + 1}-{self.rng.getrandbits(32):08x}"
+            self.tokens[token] = time.monotonic() + self.token_ttl
+            self.stats["token"] += 1
+        return token
+
+    def expire_all_tokens(self):
+        """토큰 만료 상황 강제 주입"""
+        with self.lock:
+            for token in self.tokens:
+                self.tokens[token] = 0
+
+    def token_valid(self, token):
+        return self.tokens.get(token, 0) > time.monotonic()
+
+    def throttled(self, tr_cd):
+        if not self.throttle_per_sec:
+            return False
+        with self.lock:
+            second = int(time.monotonic())
+            window, count = self._window.get(tr_cd, (second, 0))
+            if window != second:
+                window, count = second, 0
+            count += 1
+            self._window[tr_cd] = (window, count)
+            return count > self.throttle_per_sec
+
+    def quote(self, focode):
+        item = self.by_shcode.get(focode)
+        if not item:
+            return None
+        series = self.series.get(item["hname"]) or self.default_series
+        if not series:
+            return None
+        now = self.clock.now()
+        current = series[0]
+        for row in series:
+            if _parse_ts(row["recorded_at"]) > now:
+                break
+            current = row
+        return {
+            "hname": item["hname"],
+            "price": str(current["price"]),
+            "change": str(current.get("change", 0)),
+            "diff": str(current.get("diff", 0)),
+            "volume": str(current.get("volume", 0)),
+        }
+
+    def chart(self, block):
+        """
+        t8415 분봉: 세션 행을 봉 마감 시각(분) 기준 1분봉으로 변환해 sdate/stime ~ edate/etime 반환.
+        qrycnt를 넘으면 마지막 봉의 cts_date / cts_time으로 이어서 조회 (시간 오름차순)
+        """
+        item = self.by_shcode.get(block.get("shcode"))
+        series = (self.series.get(item["hname"]) if item else None) or []
+        kst = pytz.timezone('Asia/Seoul')
+        start = kst.localize(datetime.strptime(block["sdate"] + block["stime"], "%Y%m%d%H%M%S"))
+        end = kst.localize(datetime.strptime(block["edate"] + block["etime"], "%Y%m%d%H%M%S"))
+        cursor = (block.get("cts_date") or "") + (block.get("cts_time") or "")
+        bars, prev = {}, None
+        for row in series:
+            minute = _parse_ts(row["recorded_at"]).astimezone(kst).replace(second=0, microsecond=0)
+            volume = int(row.get("volume") or 0)
+            jdiff = volume - prev if prev is not None and volume >= prev else volume
+            prev = volume
+            key = minute.strftime("%Y%m%d%H%M%S")
+            if start <= minute <= end and key > cursor:
+                bar = bars.get(key)
+                price = str(row["price"])
+                if bar is None:
+                    bars[key] = {"date": key[:8], "time": key[8:], "open": price, "high": price, "low": price,
+                                 "close": price, "jdiffvol": str(jdiff)}
+                else:
+                    bar.update(close=price, high=max(bar["high"], price, key=float),
+                               low=min(bar["low"], price, key=float),
+                               jdiffvol=str(int(bar["jdiffvol"]) + jdiff))
+        ordered = [bars[k] for k in sorted(bars)]
+        size = int(block.get("qrycnt") or 500)
+        page, more = ordered[:size], len(ordered) > size
+        head = {"shcode": block.get("shcode"),
+                "cts_date": page[-1]["date"] if more else "", "cts_time": page[-1]["time"] if more else ""}
+        return head, page, more
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive 재사용 확인용
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload, content_type="application/json; charset=utf-8", headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _LSHandler(_QuietHandler):
+    state = None
+
+    def do_POST(self):
+        s = self.state
+        body = self._body()
+        delay = s.latency_ms + (s.rng.uniform(0, s.jitter_ms) if s.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000)
+
+        path = urlsplit(self.path).path
+        if path == "/oauth2/token":
+            return self._send(200, {"access_token": s.issue_token(), "token_type": "Bearer",
+                                    "scope": "oob", "expires_in": s.token_ttl})
+
+        tr_cd = self.headers.get("tr_cd", "")
+        token = self.headers.get("authorization", "")[len("Bearer "):]
+        if s.error_rate and s.rng.random() < s.error_rate:
+            s.stats["errors"] += 1
+            return self._send(500, {"rsp_cd": "IGW00500", "rsp_msg": "주입된 서버 오류"})
+        if s.throttled(tr_cd):
+            s.stats["throttled"] += 1
+            return self._send(500, {"rsp_cd": "IGW00201", "rsp_msg": "초당 전송 건수를 초과하였습니다."})
+        if not s.token_valid(token):
+            s.stats["expired"] += 1
+            return self._send(401, {"rsp_cd": "IGW00121", "rsp_msg": "유효하지 않은 토큰입니다."})
+
+        req = json.loads(body or b"{}")
+        if tr_cd == "t8432":
+            s.stats["t8432"] += 1
+            return self._send(200, {"rsp_cd": "00000", "t8432OutBlock": s.master})
+        if tr_cd == "t8456":
+            s.stats["t8456"] += 1
+            block = s.quote(req.get("t8456InBlock", {}).get("focode"))
+            return self._send(200, {"rsp_cd": "00000", "t8456OutBlock": block} if block else {"rsp_cd": "00000"})
+        if tr_cd == "t1511":
+            s.stats["t1511"] += 1
+            # 코스피200 주간 종가: 근월물 전일 종가에서 베이시스만큼 뺀 값으로 흉내
+            front = next((item for item in s.master if item["hname"].startswith("F ")), {})
+            close = float(front.get("jnilclose") or 0)
+            return self._send(200, {"rsp_cd": "00000", "t1511OutBlock": {"hname": "코스피200", "pricejisu": f"{close - 1.5:.2f}"}})
+        if tr_cd == "t8415":
+            s.stats["t8415"] += 1
+            head, bars, more = s.chart(req.get("t8415InBlock", {}))
+            return self._send(200, {"rsp_cd": "00000", "t8415OutBlock": head, "t8415OutBlock1": bars},
+                              headers={"tr_cont": "Y" if more else "N", "tr_cont_key": head["cts_date"] + head["cts_time"]})
+        return self._send(404, {"rsp_cd": "IGW00404", "rsp_msg": f"지원하지 않는 TR: {tr_cd}"})
+
+
+# ------------------------------------------------------------------
+# 📶 Fake LS WebSocket (실시간 체결)
+# ------------------------------------------------------------------
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _ws_read_frame(rfile):
+    """클라이언트 프레임 1개 읽기 -> (opcode, payload). 연결이 끊기면 (None, b"")"""
+    head = rfile.read(2)
+    if len(head) < 2:
+        return None, b""
+    opcode, length = head[0] & 0x0F, head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if head[1] & 0x80 else b""
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def _ws_frame(payload, opcode=0x1):
+    """서버 → 클라이언트 프레임 (마스크 없음)"""
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    length = len(payload)
+    if length < 126:
+        head = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return head + payload
+
+
+class FakeLSStreamState:
+    """
+    FakeLSState의 재생 시세를 구독 종목마다 push_interval초 간격으로 푸시.
+    - drop_after: 연결당 이 건수만큼 보낸 뒤 강제로 끊음 (재연결/재구독 확인용, 0이면 끊지 않음)
+    - silent: True인 동안 체결을 보내지 않음 (REST 대체 확인용)
+    """
+
+    def __init__(self, ls_state, tr_cd="NC0", push_interval=0.2, drop_after=0):
+        self.ls = ls_state
+        self.tr_cd = tr_cd
+        self.push_interval = push_interval
+        self.drop_after = drop_after
+        self.silent = False
+        self.stats = {"connections": 0, "subscribe": 0, "unsubscribe": 0, "pushed": 0, "rejected": 0}
+
+
+class _LSStreamHandler(socketserver.StreamRequestHandler):
+    state = None
+
+    def _handshake(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b"\r\n", b"\n"):
+                break
+            lines.append(line.decode("latin-1").strip())
+        headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:])}
+        key = headers.get("sec-websocket-key")
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        self.wfile.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                          f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return True
+
+    def _send(self, payload):
+        with self._send_lock:
+            self.wfile.write(_ws_frame(json.dumps(payload, ensure_ascii=False)))
+
+    def _reader(self, subscribed, closed):
+        s = self.state
+        try:
+            while not closed.is_set():
+                opcode, payload = _ws_read_frame(self.rfile)
+                if opcode is None or opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    with self._send_lock:
+                        self.wfile.write(_ws_frame(payload, 0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                msg = json.loads(payload)
+                header, body = msg.get("header", {}), msg.get("body", {})
+                tr_key = body.get("tr_key")
+                ack = {"tr_cd": body.get("tr_cd"), "tr_key": tr_key, "rsp_cd": "00000", "rsp_msg": "정상처리되었습니다."}
+                if not s.ls.token_valid(header.get("token")):
+                    s.stats["rejected"] += 1
+                    ack.update(rsp_cd="IGW00121", rsp_msg="유효하지 않은 토큰입니다.")
+                elif header.get("tr_type") == "3":
+                    s.stats["subscribe"] += 1
+                    subscribed.add(tr_key)
+                elif header.get("tr_type") == "4":
+                    s.stats["unsubscribe"] += 1
+                    subscribed.discard(tr_key)
+                self._send({"header": ack, "body": None})
+        except (OSError, ValueError):
+            pass
+        finally:
+            closed.set()
+
+    def handle(self):
+        s = self.state
+        if not self._handshake():
+            return
+        s.stats["connections"] += 1
+        self._send_lock = threading.Lock()
+        subscribed, closed = set(), threading.Event()
+        threading.Thread(target=self._reader, args=(subscribed, closed), daemon=True).start()
+        sent = 0
+        try:
+            while not closed.wait(s.push_interval):
+                if s.silent:
+                    continue
+                for tr_key in list(subscribed):
+                    block = s.ls.quote(tr_key)
+                    if not block:
+                        continue
+                    body = {"futcode": tr_key, "price": block["price"], "change": block["change"],
+                            "drate": block["diff"], "volume": block["volume"],
+                            "chetime": s.ls.clock.now().astimezone(pytz.timezone('Asia/Seoul')).strftime("%H%M%S")}
+                    self._send({"header": {"tr_cd": s.tr_cd, "tr_key": tr_key}, "body": body})
+                    s.stats["pushed"] += 1
+                    sent += 1
+                if s.drop_after and sent >= s.drop_after:
+                    break
+        except OSError:
+            pass
+        finally:
+            closed.set()
+
+
+class _StreamServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+# ------------------------------------------------------------------
+# 🗃️ Fake Supabase (PostgREST 일부)
+# ------------------------------------------------------------------
+class FakePostgRESTState:
+    def __init__(self, latency_ms=0):
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.latency_ms = latency_ms
+        self.stats = {"select": 0, "insert": 0, "upsert": 0, "delete": 0, "rows_written": 0, "rpc": 0}
+        self.leases = {}   # name -> (holder, expires_at monotonic)
+
+    def rows(self, table):
+        return self.tables.setdefault(table, [])
+
+    def rpc(self, fn, args):
+        """readme의 acquire_collector_lease / release_collector_lease 함수와 같은 동작"""
+        name, holder = args.get("p_name"), args.get("p_holder")
+        now = time.monotonic()
+        if fn == "acquire_collector_lease":
+            current = self.leases.get(name)
+            if current and current[0] != holder and current[1] > now:
+                return False
+            self.leases[name] = (holder, now + float(args.get("p_ttl_seconds", 15)))
+            return True
+        if fn == "release_collector_lease":
+            if self.leases.get(name, (None,))[0] == holder:
+                del self.leases[name]
+            return None
+        raise KeyError(fn)
+
+
+TIMESTAMP_COLUMNS = ("recorded_at", "minute_bucket", "bucket_start")
+
+
+def _match(row, column, expr):
+    op, _, value = expr.partition(".")
+    if op == "not":
+        return not _match(row, column, value)
+    current = row.get(column)
+    if op == "in":
+        # postgrest-py는 , : ( ) 가 들어간 값을 따옴표로 감쌈
+        values = [v.strip('"') for v in _split_in(value.strip("()"))]
+        if current is None:
+            return False
+        if column in TIMESTAMP_COLUMNS:
+            return _parse_ts(current) in {_parse_ts(v) for v in values}
+        return str(current) in values
+    if current is None:
+        return False
+    if column in TIMESTAMP_COLUMNS:
+        current, value = _parse_ts(current), _parse_ts(value)
+    elif isinstance(current, (int, float)):
+        value = float(value)
+    else:
+        current = str(current)
+    return {"eq": current == value, "lt": current < value, "lte": current <= value,
+            "gt": current > value, "gte": current >= value, "neq": current != value}.get(op, False)
+
+
+def _split_in(body):
+    """in.(...) 목록을 따옴표 안의 쉼표는 무시하고 분리"""
+    values, current, quoted = [], "", False
+    for ch in body:
+        if ch == '"':
+            quoted = not quoted
+        if ch == "," and not quoted:
+            values.append(current)
+            current = ""
+        else:
+            current += ch
+    if current:
+        values.append(current)
+    return values
+
+
+class _RestHandler(_QuietHandler):
+    state = None
+    RESERVED = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        table = parts.path.rsplit("/", 1)[-1]
+        params = {k: v[-1] for k, v in parse_qs(parts.query, keep_blank_values=True).items()}
+        filters = [(k, v) for k, v in params.items() if k not in self.RESERVED]
+        return table, params, filters
+
+    def _filtered(self, table, filters):
+        return [r for r in self.state.rows(table) if all(_match(r, c, e) for c, e in filters)]
+
+    def _delay(self):
+        if self.state.latency_ms:
+            time.sleep(self.state.latency_ms / 1000)
+
+    def do_GET(self):
+        self._delay()
+        table, params, filters = self._parse()
+        with self.state.lock:
+            self.state.stats["select"] += 1
+            rows = self._filtered(table, filters)
+            for spec in reversed([o for o in params.get("order", "").split(",") if o]):
+                column, *mods = spec.split(".")
+                rows.sort(key=lambda r: (r.get(column) is None, str(r.get(column))), reverse="desc" in mods)
+            offset = int(params.get("offset") or 0)
+            limit = int(params["limit"]) if params.get("limit") else None
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            select = params.get("select", "*")
+            if select != "*":
+                columns = select.split(",")
+                rows = [{c: r.get(c) for c in columns} for r in rows]
+        self._send(200, rows)
+
+    def do_POST(self):
+        self._delay()
+        table, params, _ = self._parse()
+        payload = json.loads(self._body() or b"[]")
+        if "/rpc/" in self.path:
+            with self.state.lock:
+                self.state.stats["rpc"] += 1
+                try:
+                    return self._send(200, self.state.rpc(table, payload))
+                except KeyError:
+                    return self._send(404, {"code": "PGRST202", "message": f"함수 {table}이(가) 없습니다."})
+        rows = payload if isinstance(payload, list) else [payload]
+        upsert = "merge-duplicates" in self.headers.get("Prefer", "")
+        keys = tuple(params["on_conflict"].split(",")) if params.get("on_conflict") else UNIQUE_KEYS.get(table)
+        with self.state.lock:
+            self.state.stats["upsert" if upsert else "insert"] += 1
+            store = self.state.rows(table)
+            index = {tuple(str(r.get(k)) for k in keys): i for i, r in enumerate(store)} if keys else {}
+            for row in rows:
+                key = tuple(str(row.get(k)) for k in keys) if keys else None
+                if key is not None and key in index:
+                    if not upsert:
+                        return self._send(409, {"code": "23505", "message": "duplicate key value violates unique constraint"})
+                    store[index[key]].update(row)
+                else:
+                    row = dict(row)
+                    row.setdefault("recorded_at", datetime.now(pytz.utc).isoformat())
+                    store.append(row)
+                    if key is not None:
+                        index[key] = len(store) - 1
+            self.state.stats["rows_written"] += len(rows)
+        self._send(201, rows)
+
+    def do_DELETE(self):
+        self._delay()
+        # postgrest-py는 DELETE에도 빈 JSON 본문을 보냄 (읽지 않으면 keep-alive 다음 요청이 깨짐)
+        self._body()
+        table, _, filters = self._parse()
+        with self.state.lock:
+            self.state.stats["delete"] += 1
+            doomed = self._filtered(table, filters)
+            ids = {id(r) for r in doomed}
+            self.state.tables[table] = [r for r in self.state.rows(table) if id(r) not in ids]
+        self._send(200, doomed)
+
+    def do_PATCH(self):
+        self._send(501, {"message": "PATCH는 하네스에서 지원하지 않습니다."})
+
+
+# ------------------------------------------------------------------
+# 🔁 Revalidate sink
+# ------------------------------------------------------------------
+class RevalidateSinkState:
+    def __init__(self, latency_ms=0, fail_rate=0.0):
+        self.calls = []
+        self.latency_ms = latency_ms
+        self.fail_rate = fail_rate
+        self.rng = random.Random(1)
+
+
+class _RevalidateHandler(_QuietHandler):
+    state = None
+
+    def do_GET(self):
+        s = self.state
+        if s.latency_ms:
+            time.sleep(s.latency_ms / 1000)
+        params = {k: v[-1] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        s.calls.append({"at": time.time(), "path": params.get("path"), "tag": params.get("tag")})
+        if params.get("secret") != FAKE_REVALIDATE_SECRET:
+            return self._send(401, {"message": "Invalid secret"})
+        if s.fail_rate and s.rng.random() < s.fail_rate:
+            return self._send(500, {"message": "주입된 갱신 실패"})
+        self._send(200, {"revalidated": True, "now": int(time.time() * 1000)})
+
+
+# ------------------------------------------------------------------
+# 🧰 하네스
+# ------------------------------------------------------------------
+def _serve(handler_cls, state, port=0):
+    handler = type(handler_cls.__name__, (handler_cls,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name=handler_cls.__name__, daemon=True)
+    thread.start()
+    return server
+
+
+def _serve_stream(state, port=0):
+    handler = type("_LSStreamHandler", (_LSStreamHandler,), {"state": state})
+    server = _StreamServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, name="_LSStreamHandler", daemon=True).start()
+    return server
+
+
+# 수집기가 로컬에 쓰는 상태 파일 / 디렉터리 (환경변수 -> 작업 디렉터리 안의 이름)
+# 하네스 / 벤치가 운영 파일(토큰, 스풀, 세션 저장소, 리스)을 덮어쓰지 않도록 모두 임시 디렉터리로 돌린다.
+# 로컬 파일 경로를 받는 환경변수를 새로 추가하면 여기에도 추가할 것.
+LOCAL_STATE_ENV = {
+    "LS_TOKEN_PATH": "ls_token.json",
+    "SPOOL_PATH": "spool.sqlite3",
+    "SESSION_STORE_PATH": "session.store",
+    "LEASE_PATH": "collector.lease",
+    "ARCHIVE_DIR": "archive",
+}
+
+
+def local_state_env(workdir):
+    """LOCAL_STATE_ENV를 workdir 아래 경로로 채운 환경변수"""
+    return {key: os.path.join(workdir, name) for key, name in LOCAL_STATE_ENV.items()}
+
+
+class ReplayHarness:
+    """
+    세 가지 대체 서버를 띄우고, 수집기가 사용할 환경변수(env())를 제공한다.
+    env()에는 로컬 상태 파일 경로(workdir 아래, 기본은 임시 디렉터리)도 포함된다.
+        with ReplayHarness(speed=60, latency_ms=30) as h:
+            os.environ.update(h.env())
+            import app
+    """
+
+    def __init__(self, session_rows=None, master=None, speed=1.0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, token_ttl=86400, throttle_per_sec=0, db_latency_ms=0,
+                 revalidate_latency_ms=0, revalidate_fail_rate=0.0, stream_interval=0.2,
+                 stream_drop_after=0, ports=(0, 0, 0, 0), workdir=None):
+        if master is None:
+            with open(MASTER_PATH, encoding="utf-8") as f:
+                master = json.load(f)
+        if session_rows is None:
+            session_rows = synthesize_session(master)
+        self.ls = FakeLSState(master, session_rows, speed=speed, latency_ms=latency_ms, jitter_ms=jitter_ms,
+                              error_rate=error_rate, token_ttl=token_ttl, throttle_per_sec=throttle_per_sec)
+        self.db = FakePostgRESTState(latency_ms=db_latency_ms)
+        self.revalidate = RevalidateSinkState(latency_ms=revalidate_latency_ms, fail_rate=revalidate_fail_rate)
+        self.stream = FakeLSStreamState(self.ls, push_interval=stream_interval, drop_after=stream_drop_after)
+        self._ports = tuple(ports) + (0,) * (4 - len(ports))
+        self._servers = []
+        # workdir를 주지 않으면 임시 디렉터리를 만들고 stop()에서 지움
+        self._own_workdir = workdir is None
+        self.workdir = workdir or tempfile.mkdtemp(prefix="kospi-replay-")
+
+    def start(self):
+        self._servers = [
+            _serve(_LSHandler, self.ls, self._ports[0]),
+            _serve(_RestHandler, self.db, self._ports[1]),
+            _serve(_RevalidateHandler, self.revalidate, self._ports[2]),
+            _serve_stream(self.stream, self._ports[3]),
+        ]
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        if self._own_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def url(self, index):
+        host, port = self._servers[index].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """app.py를 하네스에 연결하는 환경변수"""
+        return {
+            "LS_BASE_URL": self.url(0),
+            "LS_APP_KEY": "replay",
+            "LS_APP_SECRET": "replay",
+            "SUPABASE_URL": self.url(1),
+            "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+            "FRONTEND_URL": self.url(2),
+            "REVALIDATE_SECRET": FAKE_REVALIDATE_SECRET,
+            "LS_WS_URL": self.url(3).replace("http://", "ws://") + "/websocket",
+            # 가짜 PostgREST는 마이그레이션 후 스키마(유니크 키)를 흉내 내므로 upsert로 기록
+            "SPOOL_UPSERT": "1",
+            **local_state_env(self.workdir),
+        }
+
+    def stats(self):
+        return {"ls": dict(self.ls.stats), "db": dict(self.db.stats),
+                "db_rows": {t: len(r) for t, r in self.db.tables.items()},
+                "revalidate_calls": len(self.revalidate.calls), "stream": dict(self.stream.stats)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LS / Supabase / Vercel 오프라인 대체 서버")
+    parser.add_argument("--session", help="재생할 세션 파일 (아카이브 .ndjson.gz 등). 없으면 랜덤워크 생성")
+    parser.add_argument("--speed", type=float, default=1.0, help="세션 재생 배속")
+    parser.add_argument("--latency", type=float, default=0, help="LS 응답 지연(ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="LS 응답 지연 흔들림(ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="LS 500 오류 비율 (0~1)")
+    parser.add_argument("--token-ttl", type=int, default=86400, help="발급 토큰 유효시간(초)")
+    parser.add_argument("--throttle", type=int, default=0, help="TR별 초당 허용 건수 (0이면 제한 없음)")
+    parser.add_argument("--db-latency", type=float, default=0, help="Supabase 응답 지연(ms)")
+    parser.add_argument("--revalidate-latency", type=float, default=0, help="갱신 응답 지연(ms)")
+    parser.add_argument("--stream-interval", type=float, default=0.2, help="실시간 체결 푸시 간격(초)")
+    parser.add_argument("--stream-drop-after", type=int, default=0, help="연결당 N건 푸시 후 강제 종료 (0이면 유지)")
+    parser.add_argument("--ports", default="18080,18081,18082,18083", help="LS,Supabase,갱신,WebSocket 서버 포트")
+    args = parser.parse_args(argv)
+
+    rows = load_session(args.session) if args.session else None
+    ports = tuple(int(p) for p in args.ports.split(","))
+    harness = ReplayHarness(rows, speed=args.speed, latency_ms=args.latency, jitter_ms=args.jitter,
+                            error_rate=args.error_rate, token_ttl=args.token_ttl,
+                            throttle_per_sec=args.throttle, db_latency_ms=args.db_latency,
+                            revalidate_latency_ms=args.revalidate_latency, stream_interval=args.stream_interval,
+                            stream_drop_after=args.stream_drop_after, ports=ports).start()
+    print("🧪 리플레이 하네스 가동. 아래 환경변수로 app.py를 실행하세요:")
+    for key, value in harness.env().items():
+        print(f"export {key}={value}")
+    try:
+        while True:
+            time.sleep(60)
+            print(f"📊 {json.dumps(harness.stats(), ensure_ascii=False)}", flush=True)
+    except KeyboardInterrupt:
+        harness.stop()
+        print("\n🛑 하네스 종료")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import os
+import io
+import glob
+import gzip
+import json
+from datetime import datetime, date
+import pytz
+from master_cache import KST, session_date_of
+
+try:
+    import zstandard
+except ImportError:  # zstd 압축은 선택 사항 (없으면 gzip 사용)
+    zstandard = None
+
+# ------------------------------------------------------------------
+# 🗄️ 보관 기간 관리 + 로컬 아카이브
+# ------------------------------------------------------------------
+# 종목별 최신 N개를 넘는 행은 버리지 않고, 세션 단위로 압축된 NDJSON 파일에 먼저 기록한 뒤
+# 작은 배치로 나눠 Supabase에서 삭제한다.
+#   archive/<table>/<세션날짜>.ndjson.gz (또는 .ndjson.zst)
+# 지운 과거 데이터는 query_archive()로 다시 조회할 수 있다.
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "gzip")   # gzip | zstd
+BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+MAX_BATCHES = int(os.getenv("RETENTION_MAX_BATCHES", "20"))  # 1회 실행당 최대 배치 수
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+def _session_of(row):
+    return session_date_of(_parse_ts(row["recorded_at"]).astimezone(KST))
+
+
+class SessionArchive:
+    """세션별 압축 NDJSON 파일 (append 전용, 프레임/멤버 단위로 이어붙임)"""
+
+    def __init__(self, table, root=ARCHIVE_DIR, compression=COMPRESSION):
+        if compression == "zstd" and zstandard is None:
+            print("⚠️ zstandard 패키지가 없어 gzip으로 아카이브합니다. (pip install zstandard)")
+            compression = "gzip"
+        self.table = table
+        self.compression = compression
+        self.dir = os.path.join(root, table)
+        os.makedirs(self.dir, exist_ok=True)
+
+    @property
+    def suffix(self):
+        return ".ndjson.zst" if self.compression == "zstd" else ".ndjson.gz"
+
+    def path_for(self, session_date):
+        return os.path.join(self.dir, f"{session_date.isoformat()}{self.suffix}")
+
+    def append(self, rows):
+        """행을 세션별 파일에 추가하고 fsync (삭제 전에 디스크 기록 보장)"""
+        by_session = {}
+        for row in rows:
+            by_session.setdefault(_session_of(row), []).append(row)
+        for session_date, session_rows in by_session.items():
+            payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in session_rows).encode("utf-8")
+            if self.compression == "zstd":
+                payload = zstandard.ZstdCompressor(level=10).compress(payload)
+            else:
+                payload = gzip.compress(payload, compresslevel=9)
+            with open(self.path_for(session_date), "ab") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+        return len(rows)
+
+    def _read_file(self, path):
+        with open(path, "rb") as f:
+            raw = f.read()
+        if path.endswith(".zst"):
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(raw), read_across_frames=True)
+            data = reader.read()
+        else:
+            data = gzip.decompress(raw)
+        for line in data.decode("utf-8").splitlines():
+            if line:
+                yield json.loads(line)
+
+    def sessions(self):
+        found = []
+        for path in glob.glob(os.path.join(self.dir, "*.ndjson.*")):
+            name = os.path.basename(path).split(".", 1)[0]
+            try:
+                found.append((date.fromisoformat(name), path))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def query(self, start=None, end=None, symbol=None):
+        """
+        [start, end) 구간의 행을 시간순으로 반환 (start/end: aware datetime 또는 ISO 문자열).
+        아카이브 중복 기록(삭제 전 재시작 등)은 (symbol, recorded_at) 기준으로 제거.
+        """
+        start = _parse_ts(start) if isinstance(start, str) else start
+        end = _parse_ts(end) if isinstance(end, str) else end
+        first = session_date_of(start.astimezone(KST)) if start else date.min
+        last = session_date_of(end.astimezone(KST)) if end else date.max
+
+        seen = set()
+        rows = []
+        for session_date, path in self.sessions():
+            if session_date < first or session_date > last:
+                continue
+            for row in self._read_file(path):
+                ts = _parse_ts(row["recorded_at"])
+                if (start and ts < start) or (end and ts >= end):
+                    continue
+                if symbol and row.get("symbol") != symbol:
+                    continue
+                key = (row.get("symbol"), row["recorded_at"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                rows.append(row)
+        rows.sort(key=lambda r: _parse_ts(r["recorded_at"]))
+        return rows
+
+
+class RetentionManager:
+    """
+    종목별 최신 keep개만 Supabase에 남기고, 그보다 오래된 행은 아카이브 후 배치 삭제.
+    - 삭제는 아카이브한 행의 키(symbol, key)로만 하므로, 조회 이후 기록된 과거 시각 행(백필 등)은
+      지워지지 않고 다음 배치에서 아카이브된다
+    - key: 정렬 / 삭제 기준 컬럼 (minute_bucket 마이그레이션 전에는 recorded_at)
+    - 한 번 실행할 때 최대 max_batches 배치만 처리하여 DB 부하를 분산한다
+    """
+
+    def __init__(self, supabase_getter, table="market_night_futures", keep=1440,
+                 batch_size=BATCH_SIZE, max_batches=MAX_BATCHES, archive=None, key="minute_bucket"):
+        self._get_supabase = supabase_getter
+        self.table = table
+        self.key = key
+        self.keep = keep
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.archive = archive or SessionArchive(table)
+
+    def _symbols(self):
+        """테이블에 행이 있는 종목 목록 (만기 지난 종목 포함, 종목 수 + 1회 조회)"""
+        symbols = []
+        while True:
+            query = self._get_supabase().table(self.table).select("symbol")
+            if symbols:
+                query = query.not_.in_("symbol", symbols)
+            rows = query.limit(1).execute().data
+            if not rows or rows[0]["symbol"] is None or rows[0]["symbol"] in symbols:
+                return symbols
+            symbols.append(rows[0]["symbol"])
+
+    def _cutoff(self, symbol):
+        """종목의 keep+1번째 최신 행의 key 시각 (이 시각 이하가 정리 대상)"""
+        res = self._get_supabase().table(self.table) \
+            .select(self.key) \
+            .eq("symbol", symbol) \
+            .order(self.key, desc=True) \
+            .range(self.keep, self.keep) \
+            .execute()
+        return res.data[0][self.key] if res.data else None
+
+    def _next_batch(self, symbol, cutoff):
+        return self._get_supabase().table(self.table) \
+            .select("*") \
+            .eq("symbol", symbol) \
+            .lte(self.key, cutoff) \
+            .order(self.key) \
+            .limit(self.batch_size) \
+            .execute().data or []
+
+    def _delete(self, symbol, rows):
+        """아카이브한 행만 키(symbol, key)로 삭제"""
+        self._get_supabase().table(self.table).delete() \
+            .eq("symbol", symbol) \
+            .in_(self.key, [row[self.key] for row in rows]) \
+            .execute()
+
+    def run(self):
+        """종목별로 아카이브 → 삭제를 배치 단위로 반복. 처리한 행 수 반환"""
+        total = batches = 0
+        for symbol in self._symbols():
+            cutoff = self._cutoff(symbol)
+            if not cutoff:
+                continue
+            print(f"🧹 데이터 정리 시작 ({symbol}: 최신 {self.keep}개 유지, 기준: {cutoff} 및 이전 아카이브 후 삭제)...")
+            while batches < self.max_batches:
+                rows = self._next_batch(symbol, cutoff)
+                if not rows:
+                    break
+                self.archive.append(rows)
+                self._delete(symbol, rows)
+                total += len(rows)
+                batches += 1
+                if len(rows) < self.batch_size:
+                    break
+        if total:
+            print(f"✅ 데이터 정리 완료 ({total}건 아카이브 → {self.archive.dir})")
+        return total
+
+
+def query_archive(start=None, end=None, symbol=None, table="market_night_futures"):
+    """아카이브 범위 조회 단축 함수 (예: query_archive("2026-03-02T09:00:00+00:00", symbol="F 2603"))"""
+    return SessionArchive(table).query(start, end, symbol=symbol)
@@ -1,5 +1,9 @@
 import os
-import requests
+import time
+import threading
+from collections import deque
+import http_client
+from metrics import span, REVALIDATIONS
 from dotenv import load_dotenv
 
 # .env 파일의 절대 경로를 찾아 로드합니다.
@@ -27,7 +31,7 @@ def revalidate_path(path):
         # 요청 보내기 전 URL 확인용 출력 (보안상 secret은 가림)
         print(f"📡 갱신 요청 중: {url}?path={path}")
         
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         if response.status_code == 200:
             print(f"✅ 성공적으로 경로를 갱신했습니다: {path}")
             return True
@@ -60,7 +64,7 @@ def revalidate_tag(tag):
         # 요청 보내기 전 URL 확인용 출력
         print(f"📡 태그 갱신 요청 중: {url}?tag={tag}")
 
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params)
         if response.status_code == 200:
             print(f"✅ 성공적으로 태그를 갱신했습니다: {tag}")
             return True
@@ -74,3 +78,151 @@ def revalidate_tag(tag):
     except Exception as e:
         print(f"❌ Revalidate API 호출 중 오류 발생: {e}")
         return False
+
+# ------------------------------------------------------------------
+# 📮 백그라운드 갱신 디스패처 (중복 제거 + 병합 + 재시도)
+# ------------------------------------------------------------------
+COALESCE_WINDOW = float(os.getenv("REVALIDATE_COALESCE_WINDOW", "2"))   # 요청을 모으는 시간(초)
+MIN_INTERVAL = float(os.getenv("REVALIDATE_MIN_INTERVAL", "30"))        # 같은 경로 최소 갱신 간격(초)
+MAX_ATTEMPTS = int(os.getenv("REVALIDATE_MAX_ATTEMPTS", "4"))
+RETRY_BACKOFF = float(os.getenv("REVALIDATE_RETRY_BACKOFF", "5"))       # 재시도 대기(초), 실패마다 2배
+
+
+def _split_env(name, default=""):
+    return [v.strip() for v in os.getenv(name, default).split(",") if v.strip()]
+
+
+class RevalidateDispatcher:
+    """
+    경로/태그 갱신 요청을 받아 백그라운드 스레드에서 처리한다.
+    - request_path / request_tag / notify는 즉시 반환 (수집 루프를 막지 않음)
+    - 같은 대상에 대한 요청은 하나로 병합되고, COALESCE_WINDOW 동안 모아서 전송
+    - 같은 대상은 MIN_INTERVAL보다 자주 전송하지 않음
+    - 실패 시 RETRY_BACKOFF * 2^n 간격으로 최대 MAX_ATTEMPTS회 재시도
+    """
+
+    def __init__(self, paths=None, tags=None, coalesce_window=COALESCE_WINDOW,
+                 min_interval=MIN_INTERVAL, max_attempts=MAX_ATTEMPTS, retry_backoff=RETRY_BACKOFF):
+        # notify() 한 번으로 갱신할 기본 대상 (페이지/태그가 늘어도 수집 루프 호출은 1회)
+        self.paths = paths if paths is not None else _split_env("REVALIDATE_PATHS", "/kospi-night-futures")
+        self.tags = tags if tags is not None else _split_env("REVALIDATE_TAGS")
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+        # (kind, target) -> {"requested_at", "due_at", "attempts"}
+        self._pending = {}
+        self._last_sent = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stop = False
+        self.latencies = deque(maxlen=500)
+        self.stats = {"requested": 0, "coalesced": 0, "sent": 0, "succeeded": 0, "failed": 0, "gave_up": 0}
+
+    def _enqueue(self, kind, target):
+        key = (kind, target)
+        now = time.monotonic()
+        with self._cond:
+            self.stats["requested"] += 1
+            if key in self._pending:
+                # 이미 대기 중이면 병합 (최초 요청 시각은 유지하여 지연시간을 정확히 측정)
+                self.stats["coalesced"] += 1
+                return
+            due = max(now + self.coalesce_window,
+                      self._last_sent.get(key, float("-inf")) + self.min_interval)
+            self._pending[key] = {"requested_at": now, "due_at": due, "attempts": 0}
+            self._cond.notify()
+
+    def request_path(self, path):
+        self._enqueue("path", path)
+
+    def request_tag(self, tag):
+        self._enqueue("tag", tag)
+
+    def notify(self):
+        """기본 대상 전체를 갱신 요청"""
+        for path in self.paths:
+            self._enqueue("path", path)
+        for tag in self.tags:
+            self._enqueue("tag", tag)
+
+    def _send(self, kind, target):
+        with span("revalidate"):
+            if kind == "path":
+                return revalidate_path(target)
+            return revalidate_tag(target)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop:
+                    now = time.monotonic()
+                    due = [k for k, v in self._pending.items() if v["due_at"] <= now]
+                    if due:
+                        break
+                    wait = min((v["due_at"] for v in self._pending.values()), default=now + 60) - now
+                    self._cond.wait(timeout=max(wait, 0.05))
+                if self._stop and not self._pending:
+                    return
+                if self._stop:
+                    due = list(self._pending)
+                jobs = [(k, self._pending.pop(k)) for k in due]
+
+            for key, job in jobs:
+                kind, target = key
+                job["attempts"] += 1
+                self.stats["sent"] += 1
+                ok = False
+                try:
+                    ok = self._send(kind, target)
+                except Exception as e:
+                    print(f"❌ 갱신 디스패처 오류 ({kind}={target}): {e}")
+
+                with self._cond:
+                    now = time.monotonic()
+                    self._last_sent[key] = now
+                    REVALIDATIONS.inc(result="ok" if ok else "failed")
+                    if ok:
+                        self.stats["succeeded"] += 1
+                        self.latencies.append(now - job["requested_at"])
+                    elif job["attempts"] < self.max_attempts and not self._stop:
+                        self.stats["failed"] += 1
+                        delay = self.retry_backoff * (2 ** (job["attempts"] - 1))
+                        print(f"🔁 갱신 재시도 예약 ({kind}={target}, {job['attempts']}/{self.max_attempts}, {delay:.0f}초 후)")
+                        pending = self._pending.get(key)
+                        if pending:
+                            # 재시도 대기 중 새 요청이 들어왔다면 최초 요청 시각만 보존
+                            pending["requested_at"] = min(pending["requested_at"], job["requested_at"])
+                        else:
+                            job["due_at"] = now + delay
+                            self._pending[key] = job
+                    else:
+                        self.stats["failed"] += 1
+                        self.stats["gave_up"] += 1
+                        REVALIDATIONS.inc(result="gave_up")
+                        print(f"❌ 갱신 포기 ({kind}={target}, {job['attempts']}회 실패)")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="revalidate-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """대기 중인 요청을 즉시 전송한 뒤 종료"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def latency_stats(self):
+        """요청 ~ 갱신 완료까지 걸린 시간 (초)"""
+        values = sorted(self.latencies)
+        if not values:
+            return {"count": 0}
+        pick = lambda q: values[min(int(q * len(values)), len(values) - 1)]
+        return {"count": len(values), "p50": round(pick(0.5), 3),
+                "p95": round(pick(0.95), 3), "max": round(values[-1], 3)}
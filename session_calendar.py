@@ -0,0 +1,185 @@
+import os
+import json
+import bisect
+import threading
+from datetime import datetime, date, time as dtime, timedelta
+from master_cache import KST
+
+# ------------------------------------------------------------------
+# 📅 KRX 야간 세션 캘린더
+# ------------------------------------------------------------------
+# 세션 구간(개장 ~ 마감)을 미리 계산해 두고 bisect로 조회한다.
+# - 기본 규칙: 평일(월~금) 18:00 개장 → 익일 06:00 마감 (06:00 분봉까지 수집)
+# - 휴장일 / 특수 일정은 로컬 파일(krx_calendar.json)에서 읽음 (수정 시각이 바뀌면 자동 재적재)
+#   {
+#     "holidays": ["2026-01-01", ...],               # 해당 날짜 저녁에 시작하는 세션 없음
+#     "special": {"2026-12-30": {"open": "19:00", "close": "05:00"},
+#                 "2026-11-19": {"closed": true}}     # 세션 단위 개장/마감 시각 변경 또는 휴장
+#   }
+# 거래량 0으로 휴장을 추정하지 않고, 다음 개장 시각까지 한 번에 대기할 수 있게 한다.
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+CALENDAR_PATH = os.getenv("KRX_CALENDAR_PATH", os.path.join(BASE_DIR, "krx_calendar.json"))
+SESSION_OPEN = os.getenv("SESSION_OPEN", "18:00")
+# 마감 시각의 분봉까지 수집 (06:00:59까지 장중으로 판단)
+SESSION_CLOSE = os.getenv("SESSION_CLOSE", "06:00")
+# 미리 계산해 두는 세션 범위 (일)
+HORIZON_DAYS = 400
+
+
+def _parse_hhmm(value):
+    hour, minute = value.split(":")
+    return dtime(int(hour), int(minute))
+
+
+class SessionCalendar:
+    """
+    야간 세션 구간 목록을 미리 계산해 두고 장중 여부 / 다음 개장 시각을 반환한다.
+    - 세션 날짜(개장일) 기준: 평일이고 holidays에 없으면 세션이 열림
+    - special: 날짜별 개장/마감 시각 변경 ("closed": true면 휴장)
+    - 마감 시각이 개장 시각보다 이르면 익일 마감으로 본다
+    """
+
+    def __init__(self, holidays=(), special=None, open_time=SESSION_OPEN, close_time=SESSION_CLOSE,
+                 path=None):
+        self.path = path
+        self.open_time = _parse_hhmm(open_time)
+        self.close_time = _parse_hhmm(close_time)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._set_rules(holidays, special or {})
+
+    @classmethod
+    def from_file(cls, path=CALENDAR_PATH, **kwargs):
+        """캘린더 파일로 생성 (파일이 없으면 주말 규칙만 적용)"""
+        cal = cls(path=path, **kwargs)
+        cal._reload_if_changed()
+        return cal
+
+    # -- 규칙 적재 -------------------------------------------------------
+    def _set_rules(self, holidays, special):
+        self.holidays = {date.fromisoformat(d) for d in holidays}
+        self.special = {date.fromisoformat(d): rule for d, rule in special.items()}
+        self._starts = []
+        self._windows = []
+        self._range = None
+
+    def _reload_if_changed(self):
+        if not self.path:
+            return
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is None:
+                print(f"⚠️ 캘린더 파일({self.path})이 없어 주말만 휴장으로 처리합니다.")
+                self._mtime = 0
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+            self._set_rules(payload.get("holidays", []), payload.get("special", {}))
+            print(f"📅 캘린더 적재: 휴장일 {len(self.holidays)}일, 특수 일정 {len(self.special)}건")
+        except (OSError, ValueError) as e:
+            # 잘못된 파일은 무시하고 기존 규칙 유지 (다음 수정 시 재시도)
+            print(f"⚠️ 캘린더 파일을 읽지 못했습니다: {e}")
+        self._mtime = mtime
+
+    # -- 세션 구간 계산 ----------------------------------------------------
+    def window_for(self, session_date):
+        """세션 날짜의 (개장, 마감) KST datetime. 휴장이면 None"""
+        rule = self.special.get(session_date)
+        if rule is None:
+            if session_date.weekday() >= 5 or session_date in self.holidays:
+                return None
+            rule = {}
+        if rule.get("closed"):
+            return None
+        open_t = _parse_hhmm(rule["open"]) if "open" in rule else self.open_time
+        close_t = _parse_hhmm(rule["close"]) if "close" in rule else self.close_time
+        opens = KST.localize(datetime.combine(session_date, open_t))
+        close_day = session_date + timedelta(days=1) if close_t <= open_t else session_date
+        # 마감 시각의 분봉까지 포함 (끝은 미포함)
+        closes = KST.localize(datetime.combine(close_day, close_t)) + timedelta(minutes=1)
+        return opens, closes
+
+    def _build(self, start):
+        windows = []
+        for offset in range(HORIZON_DAYS):
+            window = self.window_for(start + timedelta(days=offset))
+            if window:
+                windows.append(window)
+        self._windows = windows
+        self._starts = [opens for opens, _ in windows]
+        self._range = (start, start + timedelta(days=HORIZON_DAYS))
+
+    def _ensure(self, now):
+        self._reload_if_changed()
+        today = now.astimezone(KST).date()
+        # 전날 저녁 세션이 아직 진행 중일 수 있으므로 하루 앞에서 시작
+        if (self._range is None or today - timedelta(days=1) < self._range[0]
+                or today + timedelta(days=30) > self._range[1]):
+            self._build(today - timedelta(days=1))
+
+    # -- 조회 -----------------------------------------------------------
+    def current_session(self, now=None):
+        """now가 속한 세션의 (개장, 마감). 장외이면 None"""
+        now = now or datetime.now(KST)
+        with self._lock:
+            self._ensure(now)
+            i = bisect.bisect_right(self._starts, now) - 1
+            if i >= 0 and now < self._windows[i][1]:
+                return self._windows[i]
+        return None
+
+    def is_open(self, now=None):
+        return self.current_session(now) is not None
+
+    def next_open(self, now=None):
+        """now 이후(포함)의 다음 개장 시각"""
+        now = now or datetime.now(KST)
+        with self._lock:
+            self._ensure(now)
+            i = bisect.bisect_left(self._starts, now)
+            if i < len(self._starts):
+                return self._starts[i]
+        return None
+
+    def seconds_until_open(self, now=None):
+        now = now or datetime.now(KST)
+        opens = self.next_open(now)
+        if opens is None:
+            return None
+        return max((opens - now).total_seconds(), 0)
+
+    def sessions(self, start, end):
+        """start ~ end 사이에 개장하는 세션 목록 (개장, 마감)"""
+        with self._lock:
+            self._ensure(start)
+            lo = bisect.bisect_left(self._starts, start)
+            hi = bisect.bisect_left(self._starts, end)
+            return list(self._windows[lo:hi])
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_calendar():
+    """프로세스 공용 캘린더 (KRX_CALENDAR_PATH)"""
+    global _DEFAULT
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None:
+            _DEFAULT = SessionCalendar.from_file()
+        return _DEFAULT
+
+
+if __name__ == "__main__":
+    # 앞으로 2주간의 세션 일정 출력
+    cal = get_calendar()
+    now = datetime.now(KST)
+    print(f"현재 {'장중' if cal.is_open(now) else '장외'}, 다음 개장 {cal.next_open(now)}")
+    for opens, closes in cal.sessions(now - timedelta(days=1), now + timedelta(days=14)):
+        last = closes - timedelta(minutes=1)
+        print(f"  {opens.strftime('%m-%d(%a) %H:%M')} ~ {last.strftime('%m-%d %H:%M')}")
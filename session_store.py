@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import threading
+from datetime import datetime
+import pytz
+from master_cache import KST, session_date_of
+
+# ------------------------------------------------------------------
+# 🗄️ 세션 저장소 (메모리 매핑 열 저장)
+# ------------------------------------------------------------------
+# pm2 재시작 시 마스터 / 최근 시계열을 Supabase와 LS에서 다시 받지 않도록,
+# 최근 세션의 샘플을 고정 폭 열(시각 / 가격 / 전일대비 / 등락률 / 거래량 / 종목)로 로컬 파일에 매핑해 둔다.
+# - 파일 = 헤더(매직, 용량, 건수, 세션 날짜) + 수집기 상태 JSON(마스터 등) + 열 배열
+# - append는 열에 값을 쓴 뒤 헤더의 건수를 마지막에 올림 (건수 = 커밋 표시, 프로세스가 죽어도 반쯤 쓴 행은 무시)
+# - 링 버퍼: 용량을 넘으면 오래된 샘플부터 덮어씀 (세션이 바뀌어도 유지 → 직전 세션까지 1440분 윈도우 복원)
+# - fsync 하지 않음: 프로세스 재시작은 OS 페이지 캐시로 충분 (VM 재부팅 시에는 DB에서 다시 채움)
+# 토큰은 token_manager가 .ls_token.json에 따로 보관한다.
+
+SESSION_STORE_ENABLED = os.getenv("SESSION_STORE", "1") == "1"
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH",
+                               os.path.join(os.path.abspath(os.path.dirname(__file__)), "session.store"))
+SESSION_STORE_CAPACITY = int(os.getenv("SESSION_STORE_CAPACITY", "16384"))   # 샘플 수 (전 종목 합계, 약 700KB)
+
+MAGIC = b"KNFS"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHIQ8s")   # 매직, 레이아웃 버전, 예약, 용량, 누적 건수, 마지막 샘플의 세션 날짜(YYYYMMDD)
+STATE_OFFSET = 64
+STATE_LEN = struct.Struct("<I")
+HEADER_SIZE = 16384                    # 헤더 + 상태 JSON
+# (이름, memoryview 형식, 바이트)
+COLUMNS = (("ts", "q", 8), ("price", "d", 8), ("change", "d", 8), ("diff", "d", 8),
+           ("volume", "q", 8), ("symbol", "H", 2))
+ROW_BYTES = sum(width for _, _, width in COLUMNS)
+NAN = float("nan")
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+def _float(value):
+    return NAN if value is None else float(value)
+
+
+def _unfloat(value):
+    return None if value != value else value
+
+
+class SessionStore:
+    """
+    store.append(rows): 수집 행 기록 (틱 루프, 행당 수 µs)
+    store.rows(symbol, limit): 분 단위 최신 행 (최신순, DB 조회 결과와 같은 모양)
+    store.state / store.save_state(dict): 수집기 상태 (마스터 목록 등)
+    """
+
+    def __init__(self, path=SESSION_STORE_PATH, capacity=SESSION_STORE_CAPACITY):
+        self.path = path
+        self._lock = threading.Lock()
+        self._open(capacity)
+
+    # -- 파일 ----------------------------------------------------------
+    def _open(self, capacity):
+        size = HEADER_SIZE + capacity * ROW_BYTES
+        fresh = not os.path.exists(self.path) or os.path.getsize(self.path) != size
+        if not fresh:
+            with open(self.path, "rb") as f:
+                magic, layout, _, stored_capacity, _, _ = HEADER.unpack(f.read(HEADER.size))
+            fresh = magic != MAGIC or layout != LAYOUT_VERSION or stored_capacity != capacity
+        if fresh:
+            # 레이아웃 / 용량이 다르면 새 파일로 시작 (DB에서 다시 채워짐)
+            with open(self.path, "wb") as f:
+                f.truncate(size)
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), size)
+        self.capacity = capacity
+        offset = HEADER_SIZE
+        self._cols = {}
+        for name, fmt, width in COLUMNS:
+            self._cols[name] = memoryview(self._mm)[offset:offset + capacity * width].cast(fmt)
+            offset += capacity * width
+        if fresh:
+            self._write_header(0, "")
+            self._write_state({})
+        self._count, self.session = self._read_header()
+        self.state = self._read_state()
+        self._symbols = {name: i for i, name in enumerate(self.state.get("symbols", []))}
+
+    def close(self):
+        with self._lock:
+            for view in self._cols.values():
+                view.release()
+            self._cols = {}
+            self._mm.close()
+            self._file.close()
+
+    def _read_header(self):
+        _, _, _, _, count, session = HEADER.unpack_from(self._mm, 0)
+        session = session.decode("ascii").strip("\0")
+        return count, (datetime.strptime(session, "%Y%m%d").date() if session else None)
+
+    def _write_header(self, count, session):
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, 0, self.capacity, count,
+                         session.encode("ascii") if session else b"")
+
+    def _read_state(self):
+        (length,) = STATE_LEN.unpack_from(self._mm, STATE_OFFSET)
+        start = STATE_OFFSET + STATE_LEN.size
+        if not length or start + length > HEADER_SIZE:
+            return {}
+        try:
+            return json.loads(bytes(self._mm[start:start + length]))
+        except ValueError:
+            return {}
+
+    def _write_state(self, state):
+        payload = json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        start = STATE_OFFSET + STATE_LEN.size
+        if start + len(payload) > HEADER_SIZE:
+            raise ValueError(f"세션 저장소 상태가 너무 큽니다 ({len(payload)}바이트)")
+        # 길이를 먼저 0으로 → 본문 → 길이 순으로 써서 반쯤 쓴 상태를 읽지 않게 함
+        STATE_LEN.pack_into(self._mm, STATE_OFFSET, 0)
+        self._mm[start:start + len(payload)] = payload
+        STATE_LEN.pack_into(self._mm, STATE_OFFSET, len(payload))
+
+    # -- 상태 ----------------------------------------------------------
+    def save_state(self, **updates):
+        """수집기 상태 일부 갱신 (종목 목록은 내부에서 관리)"""
+        with self._lock:
+            self.state = dict(self.state, **updates)
+            self._write_state(self.state)
+
+    def _symbol_index(self, symbol):
+        index = self._symbols.get(symbol)
+        if index is None:
+            index = self._symbols[symbol] = len(self._symbols)
+            self.state = dict(self.state, symbols=list(self._symbols))
+            self._write_state(self.state)
+        return index
+
+    # -- 샘플 ----------------------------------------------------------
+    def append(self, rows):
+        with self._lock:
+            for row in rows:
+                ts = _parse_ts(row["recorded_at"])
+                self.session = session_date_of(ts.astimezone(KST))
+                i = self._count % self.capacity
+                cols = self._cols
+                cols["ts"][i] = int(ts.timestamp() * 1_000_000)
+                cols["price"][i] = float(row["price"])
+                cols["change"][i] = _float(row.get("change"))
+                cols["diff"][i] = _float(row.get("diff"))
+                cols["volume"][i] = int(row.get("volume") or 0)
+                cols["symbol"][i] = self._symbol_index(row["symbol"])
+                self._count += 1
+                # 건수를 마지막에 기록 (커밋)
+                self._write_header(self._count, self.session.strftime("%Y%m%d"))
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def rows(self, symbol=None, limit=None):
+        """
+        저장된 샘플을 분 단위 최신 값으로 (최신순).
+        DB 조회 결과와 같은 모양: {symbol, price, change, diff, volume, recorded_at}
+        """
+        with self._lock:
+            names = list(self._symbols)
+            want = self._symbols.get(symbol) if symbol is not None else None
+            if symbol is not None and want is None:
+                return []
+            count, cols = self._count, self._cols
+            result, seen = [], set()
+            for n in range(count - 1, max(count - self.capacity, 0) - 1, -1):
+                i = n % self.capacity
+                sym = cols["symbol"][i]
+                if want is not None and sym != want:
+                    continue
+                ts = cols["ts"][i]
+                minute = (sym, ts // 60_000_000)
+                if minute in seen:
+                    continue
+                seen.add(minute)
+                result.append({
+                    "symbol": names[sym],
+                    "price": cols["price"][i],
+                    "change": _unfloat(cols["change"][i]),
+                    "diff": _unfloat(cols["diff"][i]),
+                    "volume": cols["volume"][i],
+                    "recorded_at": datetime.fromtimestamp(ts / 1_000_000, pytz.utc).isoformat(),
+                })
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+
+def open_store():
+    """SESSION_STORE=1이면 저장소를 열고, 실패하면 None (수집은 저장소 없이 계속)"""
+    if not SESSION_STORE_ENABLED:
+        return None
+    try:
+        return SessionStore()
+    except Exception as e:
+        print(f"⚠️ 세션 저장소를 열지 못했습니다 ({SESSION_STORE_PATH}): {e}")
+        return None
+
+
+if __name__ == "__main__":
+    # 저장소 내용 확인: python session_store.py [종목명]
+    store = SessionStore()
+    print(f"세션: {store.session}  샘플: {len(store)}/{store.capacity}  "
+          f"종목: {store.state.get('symbols', [])}  마스터: {len(store.state.get('master', []))}종목")
+    for row in store.rows(sys.argv[1] if len(sys.argv) > 1 else None, limit=10):
+        print(f"  {datetime.fromisoformat(row['recorded_at']).astimezone(KST):%m-%d %H:%M:%S} "
+              f"{row['symbol']} {row['price']} ({row['change']}, {row['diff']}%) vol {row['volume']}")
+    store.close()
@@ -0,0 +1,256 @@
+import os
+import gzip
+import json
+import time
+import base64
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+import pytz
+from master_cache import KST, session_date_of
+
+# ------------------------------------------------------------------
+# 🖼️ 차트 스냅샷 퍼블리셔
+# ------------------------------------------------------------------
+# 최근 1440분 시계열을 메모리에 유지하다가 틱마다 페이지가 바로 쓸 수 있는
+# 압축 스냅샷 1행을 만들어 스풀로 upsert 한다. 페이지 재생성 시 1440행 조회 대신
+#   select version, base_version, body, delta from market_night_futures_snapshot where name = ...
+# 한 번이면 된다.
+# - body: base64(gzip(JSON)) 전체 스냅샷 {latest, stats, series}
+# - delta: base_version → version 변경분 {from, upsert, latest, stats}
+# - deltas: 최근 SNAPSHOT_DELTA_HISTORY개 이전 버전 각각 → version 변경분 {"<버전>": {from, upsert}}
+#   (몇 버전 뒤처진 클라이언트도 delta_for()로 변경분만 적용, 목록에 없는 버전이면 body 전체를 다시 읽음)
+# - series: SNAPSHOT_BUCKET_MINUTES 단위 OHLCV 열 배열 {t, o, h, l, c, v} (t: epoch 초, 버킷 시작)
+
+SNAPSHOT_TABLE = "market_night_futures_snapshot"
+# 스냅샷 테이블 마이그레이션 후 켬 (꺼져 있으면 수집기가 스냅샷 단계를 등록하지 않음)
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "0") == "1"
+SNAPSHOT_NAME = os.getenv("SNAPSHOT_NAME", "kospi-night-futures")
+WINDOW_MINUTES = int(os.getenv("SNAPSHOT_WINDOW", "1440"))
+BUCKET_MINUTES = int(os.getenv("SNAPSHOT_BUCKET_MINUTES", "5"))
+# 같은 분 안의 샘플은 마지막 값만 다시 게시 (POLL_INTERVAL < 60일 때 upsert 횟수 제한)
+MIN_INTERVAL = float(os.getenv("SNAPSHOT_MIN_INTERVAL", "10"))  # 초
+# 변경분을 만들어 두는 이전 버전 수 (SNAPSHOT_MIN_INTERVAL 10초면 약 1~2분 뒤처진 클라이언트까지)
+DELTA_HISTORY = int(os.getenv("SNAPSHOT_DELTA_HISTORY", "8"))
+
+
+def _parse_ts(value):
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt
+
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+class ChartSnapshot:
+    """
+    근월물 1종목의 분 단위 롤링 윈도우 + 버킷 시계열 / 세션 통계 스냅샷.
+    - add(): 샘플 반영 (같은 분이면 덮어씀, 윈도우 밖은 버림)
+    - build(): 게시할 행 (body는 압축된 전체, delta / deltas는 최근 게시 버전들 대비 변경분)
+    """
+
+    def __init__(self, name=SNAPSHOT_NAME, window_minutes=WINDOW_MINUTES, bucket_minutes=BUCKET_MINUTES,
+                 delta_history=DELTA_HISTORY):
+        self.name = name
+        self.window = window_minutes * 60
+        self.bucket = bucket_minutes * 60
+        self._lock = threading.Lock()
+        self._points = OrderedDict()   # epoch 분(초 단위) -> (price, volume)
+        self.latest = None
+        self.version = None
+        # 최근 게시 버전들의 버킷 [(version, {t: [o, h, l, c, v]}), ...] (마지막이 직전 버전)
+        self._published = deque(maxlen=max(delta_history, 1))
+
+    def reset(self):
+        with self._lock:
+            self._points.clear()
+            self.latest = None
+        # 다음 게시는 delta 없이 전체 body만
+        self.version = None
+        self._published.clear()
+
+    def seed(self, rows):
+        """시작 시 DB의 최근 행으로 윈도우 채우기 (recorded_at 오름차순이 아니어도 됨)"""
+        for row in sorted(rows, key=lambda r: _parse_ts(r["recorded_at"])):
+            self.add(row)
+
+    def add(self, row):
+        ts = int(_parse_ts(row["recorded_at"]).timestamp())
+        minute = ts - ts % 60
+        with self._lock:
+            if self._points and minute < next(reversed(self._points)):
+                return False   # 늦게 도착한 과거 샘플
+            self._points[minute] = (float(row["price"]), int(row.get("volume") or 0))
+            self._points.move_to_end(minute)
+            cutoff = minute - self.window
+            while self._points and next(iter(self._points)) <= cutoff:
+                self._points.popitem(last=False)
+            self.latest = {k: row.get(k) for k in ("symbol", "price", "change", "diff", "volume", "recorded_at",
+                                                   "analytics")}
+        return True
+
+    # -- 집계 ------------------------------------------------------------
+    def _buckets(self):
+        buckets = OrderedDict()
+        prev_volume = None
+        for minute, (price, volume) in self._points.items():
+            start = minute - minute % self.bucket
+            # 누적 거래량 차이 (세션이 바뀌어 줄어들면 현재 누적값 전체)
+            delta = 0 if prev_volume is None else (volume - prev_volume if volume >= prev_volume else volume)
+            prev_volume = volume
+            bar = buckets.get(start)
+            if bar is None:
+                buckets[start] = [price, price, price, price, delta]
+            else:
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+                bar[4] += delta
+        return buckets
+
+    def _stats(self):
+        """현재 세션(18:00 기준) 시가 / 고가 / 저가 / 종가 / 변화"""
+        if not self._points:
+            return {}
+        last_minute = next(reversed(self._points))
+        session = session_date_of(datetime.fromtimestamp(last_minute, KST))
+        prices = [price for minute, (price, _) in self._points.items()
+                  if session_date_of(datetime.fromtimestamp(minute, KST)) == session]
+        open_, last = prices[0], prices[-1]
+        return {
+            "session": session.isoformat(),
+            "open": open_, "high": max(prices), "low": min(prices), "last": last,
+            "change": round(last - open_, 2),
+            "change_pct": round((last - open_) / open_ * 100, 2) if open_ else 0.0,
+            "volume": self._points[last_minute][1],
+            "points": len(prices),
+        }
+
+    def build(self):
+        """게시할 스냅샷 행. 윈도우가 비어 있으면 None"""
+        with self._lock:
+            if not self._points:
+                return None
+            buckets = self._buckets()
+            stats = self._stats()
+            latest = dict(self.latest)
+        version = int(time.time() * 1000)
+        if self.version is not None and version <= self.version:
+            version = self.version + 1
+        series = {"t": list(buckets), "o": [], "h": [], "l": [], "c": [], "v": []}
+        for o, h, l, c, v in buckets.values():
+            for key, value in zip("ohlcv", (o, h, l, c, v)):
+                series[key].append(value)
+        full = _dumps({"name": self.name, "version": version, "bucket": self.bucket,
+                       "latest": latest, "stats": stats, "series": series}).encode("utf-8")
+        body = gzip.compress(full, compresslevel=6, mtime=0)
+
+        delta, deltas = None, None
+        if self._published:
+            first = next(iter(buckets))
+            deltas = {str(base): {"from": first,
+                                  "upsert": [[t, *bar] for t, bar in buckets.items() if published.get(t) != bar]}
+                      for base, published in self._published}
+            delta = dict(deltas[str(self.version)], latest=latest, stats=stats)
+
+        row = {
+            "name": self.name,
+            "version": version,
+            "base_version": self.version if delta is not None else None,
+            "updated_at": datetime.now(pytz.utc).isoformat(),
+            "body": base64.b64encode(body).decode("ascii"),
+            "delta": delta,
+            "deltas": deltas,
+            "size": len(body),
+            "raw_size": len(full),
+        }
+        self.version = version
+        self._published.append((version, {t: list(bar) for t, bar in buckets.items()}))
+        return row
+
+
+def decode_body(body):
+    """body(base64 gzip) -> 스냅샷 dict (검증 / 프론트엔드 참고용)"""
+    return json.loads(gzip.decompress(base64.b64decode(body)))
+
+
+def delta_for(row, version):
+    """
+    클라이언트가 가진 version에서 row의 버전으로 가는 delta (apply_delta에 그대로 사용).
+    최근 기록에 없는 버전이면 None (body 전체를 다시 읽어야 함)
+    """
+    if row.get("delta") is None:
+        return None
+    if version == row.get("base_version"):
+        return row["delta"]
+    change = (row.get("deltas") or {}).get(str(version))
+    if change is None:
+        return None
+    return dict(change, latest=row["delta"]["latest"], stats=row["delta"]["stats"])
+
+
+def apply_delta(snapshot, delta, version):
+    """이전 스냅샷 dict에 delta를 적용한 새 스냅샷 dict (프론트엔드 로직 참고용)"""
+    series = snapshot["series"]
+    bars = {t: [series[k][i] for k in "ohlcv"] for i, t in enumerate(series["t"])}
+    for t, *bar in delta["upsert"]:
+        bars[t] = bar
+    merged = {"t": [], "o": [], "h": [], "l": [], "c": [], "v": []}
+    for t in sorted(t for t in bars if t >= delta["from"]):
+        merged["t"].append(t)
+        for key, value in zip("ohlcv", bars[t]):
+            merged[key].append(value)
+    return dict(snapshot, version=version, latest=delta["latest"], stats=delta["stats"], series=merged)
+
+
+class SnapshotPublisher:
+    """
+    파이프라인 stage 핸들러: 근월물 샘플을 윈도우에 반영하고 스냅샷 행을 sink로 전달.
+    - symbol_getter: 스냅샷 대상 종목명(근월물)을 반환하는 함수
+    - seeder: 첫 샘플 때 1회 호출해 최근 행 목록을 반환하는 함수 (DB 조회, 실패해도 계속)
+    - sink: 스냅샷 행을 받아 저장하는 함수 (스풀 upsert)
+    """
+
+    def __init__(self, sink, symbol_getter=None, seeder=None, snapshot=None, min_interval=MIN_INTERVAL):
+        self.snapshot = snapshot or ChartSnapshot()
+        self._sink = sink
+        self._symbol = symbol_getter
+        self._seeder = seeder
+        self.min_interval = min_interval
+        self._last_publish = 0.0
+        self._last_minute = None
+
+    def _seed(self):
+        seeder, self._seeder = self._seeder, None
+        try:
+            rows = seeder() or []
+            self.snapshot.seed(rows)
+            print(f"🖼️ 차트 스냅샷 윈도우 초기화: {len(rows)}행")
+        except Exception as e:
+            print(f"⚠️ 차트 스냅샷 초기화 실패 (새 샘플부터 채움): {e}")
+
+    def __call__(self, row):
+        symbol = self._symbol() if self._symbol else None
+        if symbol and row.get("symbol") != symbol:
+            return
+        if self._seeder:
+            self._seed()
+        # 롤오버로 근월물이 바뀌면 윈도우를 새로 시작
+        latest = self.snapshot.latest
+        if latest and latest.get("symbol") != row.get("symbol"):
+            self.snapshot.reset()
+        if not self.snapshot.add(row):
+            return
+        # 새 분이 시작되면 바로, 같은 분 안에서는 min_interval 간격으로만 게시
+        ts = int(_parse_ts(row["recorded_at"]).timestamp())
+        minute = ts - ts % 60
+        now = time.monotonic()
+        if minute == self._last_minute and now - self._last_publish < self.min_interval:
+            return
+        published = self.snapshot.build()
+        if published:
+            self._sink(published)
+            self._last_publish, self._last_minute = now, minute
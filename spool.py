@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime
+import pytz
+from metrics import span, DB_ROWS
+
+# ------------------------------------------------------------------
+# 📼 로컬 선기록(Write-Ahead) 스풀
+# ------------------------------------------------------------------
+# 모든 샘플은 먼저 로컬 SQLite(WAL, synchronous=FULL)에 기록되고,
+# SpoolFlusher가 모아서 Supabase에 upsert 한다.
+# - DB 장애 시 샘플은 스풀에 남아 있다가 복구되면 자동으로 재전송
+# - (symbol, minute_bucket) 키로 upsert 하므로 재전송해도 중복이 생기지 않음 (SPOOL_UPSERT=1, 마이그레이션 후)
+# - 테이블별로 전송 / 백오프: 한 테이블이 계속 실패해도(마이그레이션 누락 등) 다른 테이블은 계속 비워짐
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+SPOOL_PATH = os.getenv("SPOOL_PATH", os.path.join(BASE_DIR, "spool.sqlite3"))
+BATCH_SIZE = int(os.getenv("SPOOL_BATCH_SIZE", "200"))
+FLUSH_INTERVAL = float(os.getenv("SPOOL_FLUSH_INTERVAL", "5"))   # 초
+MAX_BACKOFF = float(os.getenv("SPOOL_MAX_BACKOFF", "300"))       # 초
+# market_night_futures의 minute_bucket 컬럼 / 유니크 인덱스 마이그레이션 후 켬.
+# 꺼져 있으면 기존 스키마 그대로 insert (minute_bucket 없이 전송, 재전송 시 중복 행이 생길 수 있음)
+SPOOL_UPSERT = os.getenv("SPOOL_UPSERT", "0") == "1"
+# 테이블별 upsert 충돌 키 (스풀 중복 제거 키로도 사용)
+# 시세 테이블 외에는 마이그레이션으로 새로 만드는 테이블이라 항상 upsert (각 기능 플래그로 기록 여부 결정)
+CONFLICT_KEYS = {
+    "market_night_futures": "symbol,minute_bucket",
+    "market_night_futures_bars": "symbol,interval,bucket_start",
+    "market_night_futures_spreads": "near,far,minute_bucket",
+    "market_night_futures_snapshot": "name",
+}
+
+
+def minute_bucket(recorded_at):
+    """ISO 시각 문자열 -> 분 단위로 내림한 UTC ISO 문자열"""
+    dt = datetime.fromisoformat(recorded_at)
+    if dt.tzinfo is None:
+        dt = pytz.utc.localize(dt)
+    return dt.astimezone(pytz.utc).replace(second=0, microsecond=0).isoformat()
+
+
+class Spool:
+    def __init__(self, path=SPOOL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                dedup_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (table_name, dedup_key)
+            )
+        """)
+
+    def append(self, row, table="market_night_futures"):
+        """
+        샘플을 스풀에 기록 (commit 후 반환되므로 프로세스가 죽어도 유실되지 않음).
+        같은 충돌 키(종목/분 버킷 등)면 최신 값으로 덮어씀.
+        """
+        return self.append_many([row], table=table)[0]
+
+    def append_many(self, rows, table="market_night_futures"):
+        """여러 행을 하나의 트랜잭션으로 기록 (다종목 틱을 한 번에 저장)"""
+        prepared = []
+        for row in rows:
+            row = dict(row)
+            if table == "market_night_futures" and "minute_bucket" not in row:
+                row["minute_bucket"] = minute_bucket(row["recorded_at"])
+            dedup_key = "|".join(str(row[k]) for k in CONFLICT_KEYS[table].split(","))
+            prepared.append((row, dedup_key))
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "INSERT INTO spool (table_name, dedup_key, payload, created_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (table_name, dedup_key) DO UPDATE SET payload = excluded.payload",
+                    [(table, key, json.dumps(row, ensure_ascii=False), now) for row, key in prepared])
+        return [row for row, _ in prepared]
+
+    def peek(self, limit=BATCH_SIZE, table=None):
+        """
+        가장 오래된 미전송 행들을 테이블별로 묶어서 반환: {table: [(id, payload), ...]}
+        table을 주면 그 테이블의 행만 (다른 테이블이 밀려 있어도 영향 없음)
+        """
+        with self._lock:
+            if table is None:
+                rows = self._conn.execute(
+                    "SELECT id, table_name, payload FROM spool ORDER BY id LIMIT ?", (limit,)).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, table_name, payload FROM spool WHERE table_name = ? ORDER BY id LIMIT ?",
+                    (table, limit)).fetchall()
+        batches = {}
+        for row_id, table, payload in rows:
+            batches.setdefault(table, []).append((row_id, payload))
+        return batches
+
+    def ack(self, entries):
+        """
+        전송 완료된 행 삭제.
+        전송 중 같은 분 버킷이 새 값으로 덮어써졌다면 payload가 달라 남겨 두고 다음 배치에 보냄.
+        """
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM spool WHERE id = ? AND payload = ?", entries)
+
+    def tables(self):
+        """미전송 행이 있는 테이블 목록 (가장 오래된 행 순)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT table_name FROM spool GROUP BY table_name ORDER BY MIN(id)").fetchall()
+        return [table for (table,) in rows]
+
+    def depth(self, table=None):
+        with self._lock:
+            if table is None:
+                return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM spool WHERE table_name = ?", (table,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolFlusher:
+    """
+    스풀을 주기적으로 비워 Supabase에 일괄 upsert (upsert=False면 시세 테이블은 insert).
+    실패하면 그 테이블의 행만 남겨 두고 테이블별 지수 백오프 후 재시도 (다른 테이블은 계속 전송).
+    """
+
+    def __init__(self, spool, supabase_getter, on_flushed=None,
+                 batch_size=BATCH_SIZE, interval=FLUSH_INTERVAL, max_backoff=MAX_BACKOFF, upsert=SPOOL_UPSERT):
+        self.spool = spool
+        # supabase 클라이언트를 돌려주는 함수 (지연 생성 대비)
+        self._get_supabase = supabase_getter
+        self.on_flushed = on_flushed
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.upsert = upsert
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # 실패 중인 테이블: {table: {"backoff": 초, "retry_at": monotonic}}
+        self._failing = {}
+        self.more = False   # 직전 flush_once에서 배치를 꽉 채운 테이블이 있었는지 (남은 행 있음)
+        self.stats = {"flushed_rows": 0, "batches": 0, "failures": 0}
+
+    def failing(self):
+        """백오프 중인 테이블 목록"""
+        return list(self._failing)
+
+    def _write(self, table, rows):
+        query = self._get_supabase().table(table)
+        if table == "market_night_futures" and not self.upsert:
+            # 마이그레이션 전: minute_bucket 컬럼이 없으므로 빼고 그대로 insert
+            rows = [{k: v for k, v in row.items() if k != "minute_bucket"} for row in rows]
+            return query.insert(rows).execute()
+        return query.upsert(rows, on_conflict=CONFLICT_KEYS[table]).execute()
+
+    def flush_once(self, force=False):
+        """
+        테이블마다 한 배치씩 전송하고 전송한 행 수를 반환.
+        실패한 테이블은 백오프 시각까지 건너뜀 (force=True면 백오프 무시 - 종료 직전).
+        """
+        sent, self.more = 0, False
+        now = time.monotonic()
+        for table in self.spool.tables():
+            failing = self._failing.get(table)
+            if failing and not force and now < failing["retry_at"]:
+                continue
+            entries = self.spool.peek(self.batch_size, table=table)[table]
+            rows = [json.loads(payload) for _, payload in entries]
+            try:
+                with span("db_upsert", table=table, rows=len(rows)):
+                    self._write(table, rows)
+            except Exception as e:
+                self._fail(table, e)
+                continue
+            self.spool.ack(entries)
+            DB_ROWS.inc(len(rows), table=table)
+            if failing:
+                del self._failing[table]
+                print(f"✅ 스풀 재전송 재개 ({table})")
+            sent += len(rows)
+            self.more = self.more or len(rows) >= self.batch_size
+            self.stats["batches"] += 1
+        self.stats["flushed_rows"] += sent
+        return sent
+
+    def _fail(self, table, error):
+        failing = self._failing.get(table)
+        backoff = min((failing["backoff"] if failing else self.interval) * 2, self.max_backoff)
+        self._failing[table] = {"backoff": backoff, "retry_at": time.monotonic() + backoff}
+        self.stats["failures"] += 1
+        print(f"🔥 DB 저장 실패 ({table}, 스풀 보관 {self.spool.depth(table)}건, {backoff:.0f}초 후 재시도): {error}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                total = self.flush_once()
+                while self.more and not self._stop.is_set():
+                    total += self.flush_once()
+                if total and self.on_flushed:
+                    self.on_flushed(total)
+            except Exception as e:
+                # 스풀 파일 자체 오류 등 (테이블 전송 실패는 flush_once 안에서 처리)
+                self.stats["failures"] += 1
+                print(f"🔥 스풀 전송 루프 오류 ({self.interval:.0f}초 후 재시도): {e}")
+
+    def wake(self):
+        """배치 크기에 도달했거나 즉시 전송이 필요할 때 호출"""
+        self._wake.set()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spool-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=10):
+        """종료 전 마지막으로 한 번 비우기 시도"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        try:
+            self.flush_once(force=True)
+        except Exception as e:
+            print(f"⚠️ 종료 전 스풀 전송 실패 (다음 실행 시 재전송): {e}")
@@ -0,0 +1,38 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+# 저장소 루트의 모듈(spool.py 등)을 그대로 import
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SESSION_START = datetime(2026, 10, 15, 9, 0, tzinfo=pytz.utc)   # 18:00 KST 세션 개장
+
+
+@pytest.fixture
+def at():
+    """세션 개장 후 minute분 second초의 UTC ISO 시각"""
+    def make(minute=0, second=0):
+        return (SESSION_START + timedelta(minutes=minute, seconds=second)).isoformat()
+    return make
+
+
+@pytest.fixture
+def sample(at):
+    """
+    수집 행 팩토리. 기본값은 minute분 1초(HH:MM:01 수집)에 가격 800+minute, 누적 거래량 100+minute.
+    bucket=True면 minute_bucket(분 시작 시각)도 채움, 나머지 키워드는 행에 그대로 추가
+    """
+    def make(minute=0, second=1, symbol="F 2612", price=None, volume=None, bucket=False, **extra):
+        row = {"symbol": symbol,
+               "price": 800.0 + minute if price is None else price,
+               "change": 1.5, "diff": None,
+               "volume": 100 + minute if volume is None else volume,
+               "recorded_at": at(minute, second)}
+        if bucket:
+            row["minute_bucket"] = at(minute)
+        row.update(extra)
+        return row
+    return make
@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from analytics import AnalyticsEngine
+
+
+@pytest.fixture
+def samples(sample):
+    return [sample(m, second=0, price=800 + (m % 7) - 3, volume=100 * (m + 1)) for m in range(30)]
+
+
+def test_restore_runs_off_the_caller_and_keeps_buffered_samples(samples):
+    gate = threading.Event()
+    stored = list(reversed(samples[:20]))   # 재시작 전 저장된 행 (최신순, analytics 없음)
+
+    def seeder(symbol, limit):
+        gate.wait(5)
+        return stored[:limit]
+
+    engine = AnalyticsEngine(seeder=seeder, periods=[5])
+    # 복원 조회가 막혀 있어도 update는 바로 반환 (복원 중에는 analytics 없음)
+    assert engine.update(dict(samples[19])) is None
+    assert engine.update(dict(samples[20])) is None
+    gate.set()
+    engine.wait_restored(5)
+    result = engine.update(dict(samples[21]))
+
+    expected = AnalyticsEngine(periods=[5])
+    for row in samples[:21]:
+        expected.update(dict(row))
+    assert result == expected.update(dict(samples[21]))
+
+
+def test_failed_restore_starts_fresh(samples):
+    def seeder(symbol, limit):
+        raise RuntimeError("db down")
+
+    engine = AnalyticsEngine(seeder=seeder, periods=[5])
+    assert engine.update(dict(samples[0])) is None
+    engine.wait_restored(5)
+    result = engine.update(dict(samples[1]))
+    assert result["open"] == samples[0]["price"]
+    assert result["vwap_volume"] == samples[1]["volume"] - samples[0]["volume"]
@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+from backfill import GapDetector, Backfiller, missing_ranges
+from master_cache import KST
+
+OPENS = KST.localize(datetime(2026, 10, 15, 18, 0)).astimezone(pytz.utc)
+CLOSES = KST.localize(datetime(2026, 10, 16, 6, 0)).astimezone(pytz.utc)
+SYMBOL = "F 2612"
+
+
+class FakeCalendar:
+    def sessions(self, start, end):
+        return [(OPENS, CLOSES)]
+
+
+class FakeSelect:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, columns):
+        return self
+
+    def gte(self, column, value):
+        return FakeSelect([r for r in self.rows if r[column] >= value])
+
+    def lt(self, column, value):
+        return FakeSelect([r for r in self.rows if r[column] < value])
+
+    def order(self, column, desc=False):
+        return FakeSelect(sorted(self.rows, key=lambda r: r[column], reverse=desc))
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def offset(self, n):
+        return FakeSelect(self.rows[n:n + self._limit])
+
+    def execute(self):
+        return self
+
+    @property
+    def data(self):
+        return self.rows
+
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def table(self, name):
+        return FakeSelect(self.rows)
+
+
+def stored(minutes, symbol=SYMBOL):
+    return [{"symbol": symbol, "minute_bucket": (OPENS + timedelta(minutes=m)).isoformat()} for m in minutes]
+
+
+def detector(rows):
+    client = FakeSupabase(rows)
+    return GapDetector(lambda: client, FakeCalendar(), master_items=lambda: [{"hname": SYMBOL}],
+                       lookback_hours=24)
+
+
+def at(minute):
+    return OPENS + timedelta(minutes=minute)
+
+
+def test_missing_ranges_groups_consecutive_minutes():
+    minutes = [at(1), at(2), at(3), at(7), at(9), at(10)]
+    assert missing_ranges(minutes) == [(at(1), at(3)), (at(7), at(7)), (at(9), at(10))]
+
+
+def test_find_reports_gaps_within_session():
+    present = [m for m in range(60) if not 10 <= m < 15 and m != 30]
+    gaps = detector(stored(present)).find(now=at(63))
+    # 최근 SETTLE_MINUTES(3분)는 아직 스풀에 있을 수 있으므로 누락으로 보지 않음
+    assert [(g["start"], g["end"], len(g["minutes"])) for g in gaps] == [
+        (at(10), at(14), 5), (at(30), at(30), 1)]
+    assert all(g["symbol"] == SYMBOL and g["session_close"] == CLOSES for g in gaps)
+
+
+def test_find_skips_known_minutes_and_pages_through_stored_rows():
+    # 전 종목 수집: 두 종목 합계가 조회 페이지(1000행)를 넘음, 근월물(F 2612)만 비교
+    rows = stored([m for m in range(720) if m not in (5, 700)]) + stored(range(720), symbol="F 2703")
+    skip = {(SYMBOL, at(5))}
+    gaps = detector(rows).find(now=CLOSES + timedelta(hours=1), skip=skip)
+    assert [(g["start"], g["end"]) for g in gaps] == [(at(700), at(700))]
+
+
+def test_fill_writes_bar_closes_for_missing_minutes_only():
+    written = []
+
+    class Response:
+        headers = {}
+
+        def json(self):
+            # 분봉 time은 봉 마감 시각: 18:11 봉 = 18:10 ~ 18:11 → minute_bucket 18:11
+            bars = [{"date": "20261015", "time": f"18{m:02d}00", "close": str(800 + m), "jdiffvol": "5"}
+                    for m in range(9, 14)]
+            return {"t8415OutBlock": {}, "t8415OutBlock1": bars}
+
+    before = {"price": 799.0, "change": 1.0, "volume": 100}
+    backfiller = Backfiller(detector([]), post=lambda *args: Response(), shcode_of=lambda s: "A016C000",
+                            reference=lambda gap: (before, None), sink=written.extend)
+    gap = {"symbol": SYMBOL, "session": OPENS, "session_close": CLOSES,
+           "start": at(10), "end": at(12), "minutes": [at(10), at(12)]}
+    assert backfiller.fill(gap) == 2
+    assert [(r["minute_bucket"], r["price"], r["volume"], r["change"]) for r in written] == [
+        (at(10).isoformat(), 810.0, 105, 12.0), (at(12).isoformat(), 812.0, 115, 14.0)]
+    assert backfiller.stats["unfillable"] == 0
+
+
+def test_kick_returns_while_detection_blocks():
+    gate = threading.Event()
+    client = FakeSupabase(stored(range(60)))
+
+    def slow_client():
+        gate.wait(5)   # 느린 PostgREST
+        return client
+
+    class LiveCalendar:
+        def sessions(self, start, end):
+            now = datetime.now(pytz.utc)
+            return [(now - timedelta(hours=1), now + timedelta(hours=11))]
+
+    backfiller = Backfiller(GapDetector(slow_client, LiveCalendar(), master_items=lambda: [{"hname": SYMBOL}]),
+                            post=None, shcode_of=None, reference=None, sink=None)
+    backfiller.start()
+    try:
+        started = time.monotonic()
+        assert backfiller.kick(10)
+        assert time.monotonic() - started < 0.5
+        time.sleep(0.05)
+        assert not backfiller.kick(10)   # 이전 실행이 진행 중이면 무시
+        gate.set()
+    finally:
+        backfiller.stop()
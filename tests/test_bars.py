@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from bars import BarAggregator
+
+
+def test_bars_close_on_the_next_bucket_with_volume_deltas(sample, at):
+    agg = BarAggregator(intervals=[1, 5])
+    assert agg.add(sample(0, 5, price=800.0, volume=100)) == []
+    assert agg.add(sample(0, 20, price=802.0, volume=110)) == []
+    assert agg.add(sample(0, 40, price=799.0, volume=125)) == []
+    completed = agg.add(sample(1, 5, price=801.0, volume=130))
+    assert len(completed) == 1
+    bar = completed[0]
+    assert bar["interval"] == "1m" and bar["bucket_start"] == at(0)
+    assert (bar["open"], bar["high"], bar["low"], bar["close"]) == (800.0, 802.0, 799.0, 799.0)
+    # 첫 샘플은 기준값이라 거래량 0, 이후는 누적값 차이
+    assert bar["volume"] == 25 and bar["cum_volume"] == 125 and bar["ticks"] == 3
+    five = [b for b in agg.current() if b["interval"] == "5m"][0]
+    assert five["volume"] == 30 and five["ticks"] == 4
+
+
+def test_volume_reset_counts_the_new_cumulative_value(sample):
+    agg = BarAggregator(intervals=[1])
+    agg.add(sample(0, 5, volume=500))
+    agg.add(sample(0, 10, volume=40))   # 새 세션으로 누적 거래량이 줄어듦
+    assert agg.current()[0]["volume"] == 40
+
+
+def test_close_due_flushes_stale_bars(sample, at):
+    agg = BarAggregator(intervals=[1, 5])
+    agg.add(sample(0, 5))
+    assert agg.close_due(datetime.fromisoformat(at(0, 30))) == []
+    closed = agg.close_due(datetime.fromisoformat(at(2)))
+    assert [b["interval"] for b in closed] == ["1m"]
+    assert [b["interval"] for b in agg.current()] == ["5m"]
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+import deadline
+import http_client
+from deadline import Deadline, DeadlineExceeded
+
+
+def test_expiry_and_check():
+    d = Deadline(0.05)
+    assert not d.expired() and 0 < d.remaining() <= 0.05
+    d.check("tick")
+    time.sleep(0.06)
+    assert d.expired() and d.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded) as exc:
+        d.check("tick")
+    assert exc.value.where == "tick"
+
+
+def test_bound_keeps_the_earlier_deadline():
+    assert deadline.current() is None
+    with deadline.bound(0.5) as outer:
+        with deadline.bound(10) as inner:
+            assert inner is outer
+        with deadline.bound(0.1) as inner:
+            assert inner is not outer and deadline.current() is inner
+        assert deadline.current() is outer
+    assert deadline.current() is None
+
+
+def test_cap_and_sleep():
+    assert deadline.cap(5) == 5
+    deadline.sleep(0)   # 마감이 없으면 그냥 sleep
+    with deadline.bound(0.1):
+        assert deadline.cap(5) <= 0.1
+        assert deadline.cap(0.01) == 0.01
+        deadline.sleep(0.01)
+        start = time.monotonic()
+        with pytest.raises(DeadlineExceeded) as exc:
+            deadline.sleep(5, where="retry")
+        # 마감까지만 자고 바로 초과
+        assert time.monotonic() - start < 1
+        assert exc.value.where == "retry"
+
+
+def test_wrap_carries_the_deadline_to_another_thread():
+    assert deadline.wrap(len) is len
+    seen = []
+    with deadline.bound(1) as d:
+        fn = deadline.wrap(lambda: seen.append(deadline.current()))
+    thread = threading.Thread(target=fn)
+    thread.start()
+    thread.join()
+    assert seen == [d]
+
+
+def test_http_request_past_the_deadline_is_not_sent(monkeypatch):
+    sent = []
+    monkeypatch.setattr(http_client, "get_session", lambda: sent.append(1))
+    with deadline.bound(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            http_client.request("GET", "http://127.0.0.1:9/")
+    assert sent == []
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+import deadline
+from deadline import DeadlineExceeded
+from hedge import HEDGE_MIN_SAMPLES, Hedger
+
+
+@pytest.fixture
+def hedger():
+    h = Hedger("test", min_delay=0.01, max_delay=0.05)
+    yield h
+    h.shutdown()
+
+
+def warm_up(hedger, seconds):
+    for _ in range(HEDGE_MIN_SAMPLES):
+        hedger.latency.add(seconds)
+
+
+def test_fast_calls_are_not_hedged(hedger):
+    warm_up(hedger, 0.02)
+    assert hedger.hedge_delay() == 0.02
+    assert hedger.call(lambda: "ok") == "ok"
+    assert hedger.stats == {"calls": 1, "hedged": 0, "hedge_won": 0, "deadline": 0}
+
+
+def test_hedge_fires_after_the_p90_delay_and_wins(hedger):
+    warm_up(hedger, 0.02)
+    calls = []
+    lock = threading.Lock()
+
+    def request():
+        with lock:
+            calls.append(time.monotonic())
+            first = len(calls) == 1
+        # 첫 요청만 꼬리 지연
+        time.sleep(0.5 if first else 0.0)
+        return "slow" if first else "hedge"
+
+    start = time.monotonic()
+    assert hedger.call(request) == "hedge"
+    assert len(calls) == 2
+    assert calls[1] - start >= 0.02
+    assert hedger.stats["hedged"] == 1 and hedger.stats["hedge_won"] == 1
+
+
+def test_deadline_abandons_both_requests(hedger):
+    with deadline.bound(0.1):
+        with pytest.raises(DeadlineExceeded):
+            hedger.call(lambda: time.sleep(0.5))
+    assert hedger.stats["deadline"] == 1
+
+
+def test_errors_are_raised(hedger):
+    def broken():
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        hedger.call(broken)
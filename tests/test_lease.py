@@ -0,0 +1,33 @@
+import pytest
+
+from lease import FileLease, LeaseKeeper, fcntl
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="fcntl 없음 (파일 리스 사용 불가)")
+
+
+def test_file_lease_is_exclusive_until_released(tmp_path):
+    path = str(tmp_path / "collector.lease")
+    first, second = FileLease(path), FileLease(path)
+    assert first.acquire()
+    assert first.acquire()   # 이미 보유 중이면 그대로 True
+    assert not second.acquire()
+    first.release()
+    assert second.acquire()
+    second.release()
+
+
+def test_keeper_takes_over_when_the_holder_stops(tmp_path):
+    path = str(tmp_path / "collector.lease")
+    leader = LeaseKeeper(FileLease(path), retry=0.01)
+    standby = LeaseKeeper(FileLease(path), retry=0.01)
+    leader.start()
+    try:
+        assert leader.wait_for_leadership(2)
+        standby.start()
+        assert not standby.wait_for_leadership(0.1)
+        leader.stop()
+        assert not leader.is_leader()
+        assert standby.wait_for_leadership(2)
+    finally:
+        leader.stop()
+        standby.stop()
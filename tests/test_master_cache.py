@@ -0,0 +1,61 @@
+import os
+from datetime import date, datetime
+
+import pytest
+
+from master_cache import KST, MasterCache, contract_expiry, session_date_of
+
+MASTER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "t8432_full_result.json")
+
+
+def kst(*args):
+    return KST.localize(datetime(*args))
+
+
+@pytest.mark.parametrize("hname, expiry", [
+    ("F 2603", date(2026, 3, 12)),
+    ("F 2606", date(2026, 6, 11)),
+    ("F 2610", date(2026, 10, 8)),    # 1일이 목요일인 달
+    ("F 2612", date(2026, 12, 10)),
+    ("F SP 03-2606", None),
+    ("F ???", None),
+])
+def test_contract_expiry_is_the_second_thursday(hname, expiry):
+    assert contract_expiry(hname) == expiry
+
+
+def test_session_date_rolls_at_7am():
+    assert session_date_of(kst(2026, 3, 13, 5, 59)) == date(2026, 3, 12)
+    assert session_date_of(kst(2026, 3, 13, 18, 0)) == date(2026, 3, 13)
+
+
+def test_front_month_from_the_saved_master():
+    cache = MasterCache.from_file(MASTER_PATH, now=kst(2026, 3, 11, 18, 0))
+    assert cache.front["hname"] == "F 2603"
+    assert cache.get("A0163000") is cache.front and cache.get("F 2603") is cache.front
+    # 스프레드 종목은 제외, 만기 순 정렬
+    assert [c["hname"] for c in cache.get_futures(now=kst(2026, 3, 11, 18, 0))][:3] == ["F 2603", "F 2606", "F 2609"]
+
+
+def test_rolls_over_on_the_expiry_session():
+    cache = MasterCache.from_file(MASTER_PATH, now=kst(2026, 3, 12, 18, 0))
+    assert cache.front["hname"] == "F 2606"
+
+
+def test_empty_fetch_keeps_the_cache_within_the_session():
+    items = MasterCache.from_file(MASTER_PATH).items
+    responses = [items, []]
+    cache = MasterCache(fetcher=lambda: responses.pop(0))
+    assert cache.get_front_month(now=kst(2026, 3, 10, 18, 0))["hname"] == "F 2603"
+    # 다음 세션 (만기 전): 빈 응답이면 캐시 유지
+    assert cache.get_front_month(now=kst(2026, 3, 11, 18, 0))["hname"] == "F 2603"
+
+
+def test_empty_fetch_does_not_return_an_expired_front_month():
+    items = MasterCache.from_file(MASTER_PATH).items
+    responses = [items, [], items]
+    cache = MasterCache(fetcher=lambda: responses.pop(0))
+    assert cache.get_front_month(now=kst(2026, 3, 11, 18, 0))["hname"] == "F 2603"
+    # 만기 세션에 재조회했는데 빈 응답 -> 만기 종목 대신 None
+    assert cache.get_front_month(now=kst(2026, 3, 12, 18, 0)) is None
+    assert cache.get_front_month(now=kst(2026, 3, 12, 18, 1))["hname"] == "F 2606"
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from pipeline import BLOCK, DROP_NEWEST, DROP_OLDEST, Pipeline, Stage
+
+
+def queued(stage):
+    return [item for _, item in list(stage.queue.queue)]
+
+
+def test_drop_oldest_keeps_the_newest_items():
+    stage = Stage("db", lambda item: None, maxsize=2, policy=DROP_OLDEST)
+    assert all(stage.submit(i) for i in range(4))
+    assert queued(stage) == [2, 3]
+    assert stage.snapshot() == {"submitted": 4, "processed": 0, "dropped": 2, "failed": 0,
+                                "max_lag_s": 0.0, "depth": 2}
+
+
+def test_drop_newest_and_block_reject_new_items():
+    newest = Stage("revalidate", lambda item: None, maxsize=2, policy=DROP_NEWEST)
+    assert [newest.submit(i) for i in range(3)] == [True, True, False]
+    assert queued(newest) == [0, 1]
+
+    block = Stage("spool", lambda item: None, maxsize=1, policy=BLOCK, put_timeout=0.01)
+    assert [block.submit(i) for i in range(2)] == [True, False]
+    assert queued(block) == [0] and block.stats["dropped"] == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Stage("db", print, policy="drop_all")
+
+
+def test_stop_drains_the_queue_and_counts_failures():
+    handled = []
+
+    def handler(item):
+        if item == 3:
+            raise RuntimeError("bad row")
+        handled.append(item)
+
+    stage = Stage("db", handler, maxsize=100)
+    pipeline = Pipeline([stage])
+    # 시작 전에 쌓인 항목도 종료 시 모두 처리
+    for i in range(10):
+        pipeline.publish(i)
+    pipeline.start()
+    pipeline.stop(timeout=5)
+    assert handled == [i for i in range(10) if i != 3]
+    stats = pipeline.stats()["db"]
+    assert stats["processed"] == 9 and stats["failed"] == 1 and stats["depth"] == 0
+
+
+def test_counts_from_several_threads_are_not_lost():
+    stage = Stage("db", lambda item: None, maxsize=10, policy=DROP_NEWEST)
+    threads = [threading.Thread(target=lambda: [stage.submit(i) for i in range(2000)]) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = stage.snapshot()
+    assert stats["submitted"] == 8000
+    assert stats["dropped"] == 8000 - 10
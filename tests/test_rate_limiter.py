@@ -0,0 +1,40 @@
+import rate_limiter
+from rate_limiter import TRScheduler, TokenBucket, is_throttled, parse_limits
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+def test_parse_limits_and_throttle_detection():
+    assert parse_limits("t8432=1, t8456=2.5,bad") == {"t8432": 1.0, "t8456": 2.5}
+    assert is_throttled(FakeResponse(429))
+    assert is_throttled(FakeResponse(500, '{"rsp_cd":"IGW00201"}'))
+    assert not is_throttled(FakeResponse(500, "internal error"))
+    assert not is_throttled(FakeResponse(200, "IGW00201"))
+    assert not is_throttled(None)
+
+
+def test_bucket_penalize_blocks_and_reward_recovers():
+    bucket = TokenBucket(2.0)
+    now = bucket.updated
+    assert bucket.wait_time(now) == 0
+    bucket.penalize(now, cooldown=3.0)
+    assert bucket.rate == 1.0
+    assert bucket.wait_time(now) == 3.0
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == 2.0
+
+
+def test_call_retries_throttled_responses(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "THROTTLE_COOLDOWN", 0.01)
+    responses = [FakeResponse(429), FakeResponse(200)]
+    scheduler = TRScheduler(limits={"t8432": 1000})
+    res = scheduler.call("t8432", lambda: responses.pop(0))
+    assert res.status_code == 200
+    stats = scheduler.stats()["t8432"]
+    assert stats["calls"] == 2 and stats["throttled"] == 1
+    assert stats["rate"] < stats["target_rate"]
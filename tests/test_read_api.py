@@ -0,0 +1,122 @@
+import gzip
+import json
+import socket
+import http.client
+
+import pytest
+
+from read_api import ReadApi
+
+
+@pytest.fixture
+def bar(at):
+    return lambda minute, interval="5m", symbol="F 2612": {
+        "symbol": symbol, "interval": interval, "bucket_start": at(minute), "close": 800.0 + minute}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def api():
+    api = ReadApi(symbol_getter=lambda: "F 2612")
+    assert api.start(port=free_port())
+    yield api
+    api.stop()
+
+
+def get(api, path, headers=None):
+    conn = http.client.HTTPConnection(*api._server.server_address[:2], timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    res = conn.getresponse()
+    body = res.read()
+    conn.close()
+    if res.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return res, (json.loads(body) if body else None)
+
+
+def test_etag_returns_304_until_the_symbol_changes(api, sample):
+    api.publish_row(sample(0))
+    res, body = get(api, "/api/latest?n=5")
+    etag = res.getheader("ETag")
+    assert res.status == 200 and [r["price"] for r in body["rows"]] == [800.0]
+
+    res, _ = get(api, "/api/latest?n=5", {"If-None-Match": etag})
+    assert res.status == 304
+    # 다른 종목이 바뀌어도 같은 버전
+    api.publish_row(sample(1, symbol="F 2703"))
+    assert get(api, "/api/latest?n=5", {"If-None-Match": etag})[0].status == 304
+
+    api.publish_row(sample(1))
+    res, body = get(api, "/api/latest?n=5", {"If-None-Match": etag})
+    assert res.status == 200 and res.getheader("ETag") != etag
+    assert len(body["rows"]) == 2
+
+
+def test_large_responses_are_gzipped(api, sample):
+    for minute in range(50):
+        api.publish_row(sample(minute))
+    res, body = get(api, "/api/latest?n=50", {"Accept-Encoding": "gzip"})
+    assert res.getheader("Content-Encoding") == "gzip" and len(body["rows"]) == 50
+
+
+def test_range_and_bars_selection(api, sample, bar, at):
+    for minute in range(10):
+        api.publish_row(sample(minute))
+    api.publish_bars([bar(0), bar(5), bar(10), bar(0, interval="1m")])
+    # 같은 분 덮어쓰기 / 늦게 온 과거 행 무시
+    api.publish_row(dict(sample(9), price=900.0))
+    api.publish_row(sample(3))
+
+    _, body = get(api, f"/api/range?from={at(2)}&to={at(5)}".replace("+", "%2B"))
+    assert [r["price"] for r in body["rows"]] == [802.0, 803.0, 804.0]
+    _, body = get(api, "/api/latest?n=1")
+    assert body["rows"][0]["price"] == 900.0
+
+    _, body = get(api, "/api/bars?interval=5&n=2")
+    assert body["interval"] == "5m" and [b["close"] for b in body["bars"]] == [805.0, 810.0]
+    _, body = get(api, f"/api/bars?interval=5m&from={at(5)}".replace("+", "%2B"))
+    assert [b["close"] for b in body["bars"]] == [805.0, 810.0]
+    _, body = get(api, "/api/bars?interval=1m")
+    assert [b["close"] for b in body["bars"]] == [800.0]
+
+    res, body = get(api, "/api/range?from=yesterday")
+    assert res.status == 400 and "from" in body["error"]
+
+
+def read_event(res):
+    event = {}
+    while True:
+        line = res.fp.readline().decode().rstrip("\n")
+        if not line:
+            if event:
+                return event
+            continue
+        if line.startswith(":") or line.startswith("retry:"):
+            continue
+        key, _, value = line.partition(": ")
+        event[key] = value
+
+
+def test_stream_resumes_after_last_event_id(api, sample):
+    for minute in range(3):
+        api.publish_row(sample(minute))
+    api.publish_row(sample(0, symbol="F 2703"))
+
+    conn = http.client.HTTPConnection(*api._server.server_address[:2], timeout=5)
+    conn.request("GET", "/api/stream?symbol=F 2612".replace(" ", "%20"), headers={"Last-Event-ID": "1"})
+    res = conn.getresponse()
+    assert res.getheader("Content-Type").startswith("text/event-stream")
+    # 놓친 이벤트(2, 3)를 다시 받고, 다른 종목 이벤트는 건너뜀
+    replayed = [read_event(res) for _ in range(2)]
+    assert [e["id"] for e in replayed] == ["2", "3"]
+    assert json.loads(replayed[1]["data"])["price"] == 802.0
+
+    api.publish_row(sample(3))
+    live = read_event(res)
+    assert live["id"] == "5" and live["event"] == "tick"
+    conn.close()
@@ -0,0 +1,75 @@
+import pytest
+
+supabase = pytest.importorskip("supabase")
+
+from replay_harness import ReplayHarness, FAKE_SUPABASE_KEY
+from retention import RetentionManager, SessionArchive
+
+
+@pytest.fixture
+def row(sample):
+    """정리 대상 행 (분 시작 시각에 기록, minute_bucket 포함)"""
+    return lambda symbol, minute, price=800.0: sample(minute, second=0, symbol=symbol, price=price, bucket=True)
+
+
+@pytest.fixture
+def harness():
+    h = ReplayHarness().start()
+    yield h
+    h.stop()
+
+
+def manager(harness, tmp_path, **kwargs):
+    client = supabase.create_client(harness.url(1), FAKE_SUPABASE_KEY)
+    archive = SessionArchive("market_night_futures", root=str(tmp_path))
+    return RetentionManager(lambda: client, keep=20, archive=archive, **kwargs)
+
+
+def test_keep_applies_per_symbol(harness, tmp_path, row):
+    table = harness.db.rows("market_night_futures")
+    table.extend(row("F 2612", m) for m in range(30))
+    table.extend(row("F 2703", m) for m in range(10))
+
+    retention = manager(harness, tmp_path, batch_size=4)
+    assert retention.run() == 10
+    remaining = harness.db.rows("market_night_futures")
+    assert sum(r["symbol"] == "F 2612" for r in remaining) == 20
+    assert sum(r["symbol"] == "F 2703" for r in remaining) == 10
+    assert min(r["minute_bucket"] for r in remaining if r["symbol"] == "F 2612") == row("F 2612", 10)["minute_bucket"]
+    assert len(retention.archive.query(symbol="F 2612")) == 10
+
+
+def test_rows_written_after_the_archive_query_are_not_lost(harness, tmp_path, row):
+    table = harness.db.rows("market_night_futures")
+    table.extend(row("F 2612", m) for m in range(40) if m != 3)
+
+    retention = manager(harness, tmp_path, batch_size=5)
+    archive_append = retention.archive.append
+    backfilled = []
+
+    def append_then_backfill(rows):
+        # 첫 배치를 조회한 뒤(삭제 전) 백필이 과거 분(3분)을 기록
+        if not backfilled:
+            backfilled.append(row("F 2612", 3, price=801.0))
+            harness.db.rows("market_night_futures").append(backfilled[0])
+        return archive_append(rows)
+
+    retention.archive.append = append_then_backfill
+    retention.run()
+
+    remaining = {r["minute_bucket"] for r in harness.db.rows("market_night_futures")}
+    archived = {r["minute_bucket"] for r in retention.archive.query(symbol="F 2612")}
+    # 삭제된 행은 모두 아카이브에 있어야 함 (백필 행 포함)
+    assert row("F 2612", 3)["minute_bucket"] in remaining | archived
+    assert {row("F 2612", m)["minute_bucket"] for m in range(40)} == remaining | archived
+    assert len(remaining) == 20
+
+
+def test_recorded_at_key_before_the_minute_bucket_migration(harness, tmp_path, row):
+    table = harness.db.rows("market_night_futures")
+    table.extend({k: v for k, v in row("F 2612", m).items() if k != "minute_bucket"} for m in range(25))
+
+    retention = manager(harness, tmp_path, key="recorded_at")
+    assert retention.run() == 5
+    remaining = harness.db.rows("market_night_futures")
+    assert min(r["recorded_at"] for r in remaining) == row("F 2612", 5)["recorded_at"]
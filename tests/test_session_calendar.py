@@ -0,0 +1,84 @@
+import json
+import os
+from datetime import date, datetime
+
+from master_cache import KST
+from session_calendar import CALENDAR_PATH, SessionCalendar
+
+
+def kst(*args):
+    return KST.localize(datetime(*args))
+
+
+def write_calendar(path, holidays=(), special=None, mtime=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"holidays": list(holidays), "special": special or {}}, f)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_friday_night_session_runs_to_saturday_morning():
+    cal = SessionCalendar()
+    opens, closes = cal.window_for(date(2026, 10, 16))   # 금요일
+    assert opens == kst(2026, 10, 16, 18, 0)
+    # 06:00 분봉까지 포함 (끝은 미포함)
+    assert closes == kst(2026, 10, 17, 6, 1)
+    assert cal.is_open(kst(2026, 10, 17, 5, 59))
+    assert cal.is_open(kst(2026, 10, 17, 6, 0, 59))
+    assert not cal.is_open(kst(2026, 10, 17, 6, 1))
+    # 토요일 / 일요일 저녁은 세션 없음
+    assert cal.window_for(date(2026, 10, 17)) is None and cal.window_for(date(2026, 10, 18)) is None
+
+
+def test_next_open_skips_the_weekend_and_holidays():
+    cal = SessionCalendar(holidays=["2026-10-19"])
+    assert cal.next_open(kst(2026, 10, 17, 7, 0)) == kst(2026, 10, 20, 18, 0)
+    # 개장 시각 자체도 포함
+    assert cal.next_open(kst(2026, 10, 20, 18, 0)) == kst(2026, 10, 20, 18, 0)
+    assert cal.seconds_until_open(kst(2026, 10, 20, 17, 59)) == 60
+    assert cal.current_session(kst(2026, 10, 19, 20, 0)) is None
+
+
+def test_special_entries_change_hours_or_close_the_session():
+    cal = SessionCalendar(special={"2026-12-30": {"open": "19:00", "close": "05:00"},
+                                   "2026-11-19": {"closed": True},
+                                   "2026-10-17": {"open": "18:00", "close": "23:00"}})
+    assert cal.window_for(date(2026, 12, 30)) == (kst(2026, 12, 30, 19, 0), kst(2026, 12, 31, 5, 1))
+    assert not cal.is_open(kst(2026, 12, 30, 18, 30))
+    assert cal.window_for(date(2026, 11, 19)) is None
+    # special은 주말 규칙보다 우선 (같은 날 마감)
+    assert cal.window_for(date(2026, 10, 17)) == (kst(2026, 10, 17, 18, 0), kst(2026, 10, 17, 23, 1))
+    sessions = cal.sessions(kst(2026, 11, 18, 0, 0), kst(2026, 11, 21, 0, 0))
+    assert [opens.date() for opens, _ in sessions] == [date(2026, 11, 18), date(2026, 11, 20)]
+
+
+def test_shipped_calendar_holidays():
+    cal = SessionCalendar.from_file(CALENDAR_PATH)
+    assert cal.window_for(date(2026, 12, 31)) is None
+    assert cal.next_open(kst(2026, 12, 30, 18, 0)) == kst(2026, 12, 30, 18, 0)
+    # 12/31, 1/1 휴장 -> 1/2(토), 1/3(일) 건너뛰고 1/4 월요일
+    assert cal.next_open(kst(2026, 12, 31, 7, 0)) == kst(2027, 1, 4, 18, 0)
+
+
+def test_reloads_when_the_file_changes(tmp_path):
+    path = str(tmp_path / "krx_calendar.json")
+    write_calendar(path, mtime=1_000_000)
+    cal = SessionCalendar.from_file(path)
+    monday = kst(2026, 10, 19, 20, 0)
+    assert cal.is_open(monday)
+
+    write_calendar(path, holidays=["2026-10-19"], mtime=1_000_100)
+    assert not cal.is_open(monday)
+    assert cal.next_open(monday) == kst(2026, 10, 20, 18, 0)
+
+    # 잘못된 파일이면 기존 규칙 유지
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{broken")
+    os.utime(path, (1_000_200, 1_000_200))
+    assert not cal.is_open(monday)
+
+
+def test_missing_file_falls_back_to_weekends(tmp_path):
+    cal = SessionCalendar.from_file(str(tmp_path / "missing.json"))
+    assert cal.is_open(kst(2026, 12, 31, 20, 0))
+    assert cal.next_open(kst(2026, 10, 17, 12, 0)) == kst(2026, 10, 19, 18, 0)
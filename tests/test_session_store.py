@@ -0,0 +1,45 @@
+from session_store import SessionStore
+
+
+def test_ring_wraps_and_keeps_the_newest_samples(tmp_path, sample):
+    store = SessionStore(str(tmp_path / "session.store"), capacity=8)
+    store.append([sample(m) for m in range(20)])
+    assert len(store) == 8
+    rows = store.rows("F 2612")
+    assert [r["price"] for r in rows] == [800.0 + m for m in range(19, 11, -1)]
+    assert rows[0]["diff"] is None and rows[0]["change"] == 1.5
+    assert store.rows("F 2612", limit=3)[-1]["price"] == 817.0
+
+
+def test_reopen_restores_samples_and_state(tmp_path, sample):
+    path = str(tmp_path / "session.store")
+    store = SessionStore(path, capacity=8)
+    store.append([sample(m) for m in range(10)])
+    store.save_state(master=[{"hname": "F 2612", "shcode": "A016C000"}])
+    store.close()
+
+    reopened = SessionStore(path, capacity=8)
+    assert len(reopened) == 8
+    assert reopened.state["master"][0]["shcode"] == "A016C000"
+    assert reopened.session.isoformat() == "2026-10-15"
+    assert [r["price"] for r in reopened.rows("F 2612", limit=2)] == [809.0, 808.0]
+    # 다시 연 뒤에도 링 위치를 이어서 기록
+    reopened.append([sample(10)])
+    assert reopened.rows("F 2612", limit=1)[0]["price"] == 810.0
+
+
+def test_capacity_change_starts_a_new_file(tmp_path, sample):
+    path = str(tmp_path / "session.store")
+    store = SessionStore(path, capacity=8)
+    store.append([sample(0)])
+    store.close()
+    assert len(SessionStore(path, capacity=16)) == 0
+
+
+def test_rows_keep_the_latest_sample_per_minute_and_symbol(tmp_path, sample):
+    store = SessionStore(str(tmp_path / "session.store"), capacity=32)
+    store.append([sample(0, second=1, price=800.0), sample(0, second=30, price=801.0),
+                  sample(0, symbol="F 2703", price=805.0), sample(1, price=802.0)])
+    assert [r["price"] for r in store.rows("F 2612")] == [802.0, 801.0]
+    assert [r["symbol"] for r in store.rows()] == ["F 2612", "F 2703", "F 2612"]
+    assert store.rows("F 2706") == []
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from snapshot import ChartSnapshot, SnapshotPublisher, apply_delta, decode_body, delta_for
+
+
+def test_delta_applied_to_previous_body_matches_new_body(sample):
+    snap = ChartSnapshot(window_minutes=20, bucket_minutes=5)
+    snap.seed([sample(m) for m in range(12)])
+    first = snap.build()
+    assert first["delta"] is None and first["base_version"] is None
+
+    for m in range(12, 30):
+        snap.add(sample(m))
+    second = snap.build()
+    assert second["base_version"] == first["version"]
+    # 윈도우 밖으로 밀려난 버킷은 delta["from"] 기준으로 잘림
+    merged = apply_delta(decode_body(first["body"]), second["delta"], second["version"])
+    assert merged == decode_body(second["body"])
+
+
+def test_late_samples_are_dropped_and_volume_is_a_delta(sample, at):
+    snap = ChartSnapshot(window_minutes=60, bucket_minutes=5)
+    assert snap.add(sample(3, volume=150))
+    assert snap.add(sample(4, price=790.0, volume=170))
+    assert not snap.add(sample(2))
+    body = decode_body(snap.build()["body"])
+    assert body["series"]["t"] == [int(datetime.fromisoformat(at(0)).timestamp())]
+    assert body["series"]["o"] == [803.0] and body["series"]["l"] == [790.0]
+    assert body["series"]["v"] == [20]
+    assert body["stats"]["session"] == "2026-10-15" and body["stats"]["change"] == -13.0
+
+
+def test_publisher_resets_the_window_on_rollover(sample):
+    published = []
+    publisher = SnapshotPublisher(published.append, min_interval=3600)
+    publisher(sample(0))
+    publisher(sample(0, price=801.0))   # 같은 분 안에서는 게시 안 함
+    publisher(sample(1, symbol="F 2703"))
+    assert len(published) == 2
+    assert published[-1]["delta"] is None
+    assert decode_body(published[-1]["body"])["latest"]["symbol"] == "F 2703"
+
+
+def test_clients_a_few_versions_behind_get_a_delta(sample):
+    snap = ChartSnapshot(window_minutes=20, bucket_minutes=5, delta_history=3)
+    bodies, rows = {}, []
+    for m in range(0, 40, 3):
+        snap.add(sample(m))
+        row = snap.build()
+        bodies[row["version"]] = decode_body(row["body"])
+        rows.append(row)
+    latest = rows[-1]
+    assert len(latest["deltas"]) == 3 and str(latest["base_version"]) in latest["deltas"]
+
+    for held in rows[-4:-1]:
+        delta = delta_for(latest, held["version"])
+        merged = apply_delta(bodies[held["version"]], delta, latest["version"])
+        assert merged == decode_body(latest["body"])
+    # 기록보다 오래된 버전은 body 전체를 다시 읽어야 함
+    assert delta_for(latest, rows[-5]["version"]) is None
+    assert delta_for(rows[0], rows[0]["version"]) is None
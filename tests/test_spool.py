@@ -0,0 +1,125 @@
+from spool import Spool, SpoolFlusher
+
+
+class FakeQuery:
+    def __init__(self, client, table, rows, method):
+        self.client, self.table, self.rows, self.method = client, table, rows, method
+
+    def execute(self):
+        if self.table in self.client.broken:
+            raise RuntimeError(f'relation "{self.table}" does not exist')
+        self.client.written.setdefault(self.table, []).extend(self.rows)
+        self.client.methods.setdefault(self.table, set()).add(self.method)
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def upsert(self, rows, on_conflict=None):
+        return FakeQuery(self.client, self.name, rows, "upsert")
+
+    def insert(self, rows):
+        return FakeQuery(self.client, self.name, rows, "insert")
+
+
+class FakeSupabase:
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.written = {}
+        self.methods = {}
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def price_row(minute, price=800.0):
+    return {"symbol": "F 2612", "price": price, "volume": 10,
+            "recorded_at": f"2026-10-15T10:{minute:02d}:00+00:00"}
+
+
+def make_flusher(tmp_path, client, **kwargs):
+    spool = Spool(str(tmp_path / "spool.sqlite3"))
+    kwargs.setdefault("upsert", True)
+    return spool, SpoolFlusher(spool, lambda: client, interval=1, **kwargs)
+
+
+def test_broken_table_does_not_block_others(tmp_path):
+    client = FakeSupabase(broken={"market_night_futures_snapshot"})
+    spool, flusher = make_flusher(tmp_path, client)
+    # 실패하는 테이블의 행이 가장 오래된 행
+    spool.append({"name": "front", "payload": "x"}, table="market_night_futures_snapshot")
+    spool.append(price_row(0))
+    spool.append({"symbol": "F 2612", "interval": "1m", "bucket_start": "2026-10-15T10:00:00+00:00"},
+                 table="market_night_futures_bars")
+
+    assert flusher.flush_once() == 2
+    assert len(client.written["market_night_futures"]) == 1
+    assert len(client.written["market_night_futures_bars"]) == 1
+    assert flusher.failing() == ["market_night_futures_snapshot"]
+    assert spool.depth() == 1
+
+    # 백오프 중에는 실패 테이블을 건너뛰고 새 행은 계속 전송
+    spool.append(price_row(1))
+    assert flusher.flush_once() == 1
+    assert flusher.stats["failures"] == 1
+    assert len(client.written["market_night_futures"]) == 2
+
+
+def test_failed_table_retries_after_recovery(tmp_path):
+    client = FakeSupabase(broken={"market_night_futures_snapshot"})
+    spool, flusher = make_flusher(tmp_path, client)
+    spool.append({"name": "front", "payload": "x"}, table="market_night_futures_snapshot")
+    flusher.flush_once()
+    assert spool.depth() == 1
+
+    client.broken.clear()
+    # 백오프 시각 전이라도 force면 재시도 (종료 직전 전송)
+    assert flusher.flush_once(force=True) == 1
+    assert spool.depth() == 0
+    assert flusher.failing() == []
+
+
+def test_backoff_grows_per_table(tmp_path):
+    client = FakeSupabase(broken={"market_night_futures_bars"})
+    spool, flusher = make_flusher(tmp_path, client, max_backoff=5)
+    spool.append({"symbol": "F 2612", "interval": "1m", "bucket_start": "t"}, table="market_night_futures_bars")
+    backoffs = []
+    for _ in range(4):
+        flusher.flush_once(force=True)
+        backoffs.append(flusher._failing["market_night_futures_bars"]["backoff"])
+    assert backoffs == [2, 4, 5, 5]
+
+
+def test_full_batches_report_more(tmp_path):
+    client = FakeSupabase()
+    spool, flusher = make_flusher(tmp_path, client, batch_size=2)
+    for minute in range(3):
+        spool.append(price_row(minute))
+    assert flusher.flush_once() == 2 and flusher.more
+    assert flusher.flush_once() == 1 and not flusher.more
+    assert spool.depth() == 0
+
+
+def test_same_minute_overwrites_pending_row(tmp_path):
+    spool = Spool(str(tmp_path / "spool.sqlite3"))
+    spool.append(price_row(0, price=800.0))
+    spool.append(dict(price_row(0, price=801.0), recorded_at="2026-10-15T10:00:30+00:00"))
+    (entries,) = spool.peek().values()
+    assert spool.depth() == 1 and '"price": 801.0' in entries[0][1]
+
+
+def test_insert_without_minute_bucket_until_upsert_is_enabled(tmp_path):
+    client = FakeSupabase()
+    spool, flusher = make_flusher(tmp_path, client, upsert=False)
+    spool.append(price_row(0))
+    spool.append({"symbol": "F 2612", "interval": "1m", "bucket_start": "t"}, table="market_night_futures_bars")
+    assert flusher.flush_once() == 2
+    assert client.methods == {"market_night_futures": {"insert"}, "market_night_futures_bars": {"upsert"}}
+    assert "minute_bucket" not in client.written["market_night_futures"][0]
+
+    flusher.upsert = True
+    spool.append(price_row(1))
+    flusher.flush_once()
+    assert client.methods["market_night_futures"] == {"insert", "upsert"}
+    assert client.written["market_night_futures"][-1]["minute_bucket"] == "2026-10-15T10:01:00+00:00"
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+import http_client
+from rate_limiter import get_scheduler, PRIORITY_HIGH
+from metrics import span, TOKEN_REFRESHES
+
+try:
+    import fcntl
+except ImportError:  # Windows 등 fcntl이 없는 환경에서는 프로세스 간 잠금 생략
+    fcntl = None
+
+# ------------------------------------------------------------------
+# 🔑 LS 접근 토큰 관리자
+# ------------------------------------------------------------------
+# - 토큰과 만료시각(expires_in)을 디스크에 저장하여 app.py / check.py가 공유
+# - 만료 전에 백그라운드 스레드가 미리 재발급
+# - 인라인 재발급은 401 / "유효하지 않은 토큰" 응답(invalidate)일 때만 수행
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+TOKEN_PATH = os.getenv("LS_TOKEN_PATH", os.path.join(BASE_DIR, ".ls_token.json"))
+# 만료 몇 초 전에 미리 재발급할지
+REFRESH_MARGIN = int(os.getenv("LS_TOKEN_REFRESH_MARGIN", "1800"))
+# expires_in이 응답에 없을 때 가정하는 유효시간
+DEFAULT_EXPIRES_IN = 86400
+
+
+class TokenManager:
+    def __init__(self, base_url, app_key, app_secret, path=TOKEN_PATH, refresh_margin=REFRESH_MARGIN):
+        self.base_url = base_url
+        self.app_key = app_key
+        self.app_secret = app_secret
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.refresh_margin = refresh_margin
+        self.token = None
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    # -- 디스크 저장/잠금 ------------------------------------------------
+    @contextmanager
+    def _file_lock(self):
+        """프로세스 간 동시 발급 방지 (flock)"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_disk(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data.get("access_token"), float(data.get("expires_at", 0))
+        except (OSError, ValueError):
+            return None, 0.0
+
+    def _write_disk(self, token, expires_at):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"access_token": token, "expires_at": expires_at,
+                       "issued_at": time.time()}, f)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.path)
+
+    def _is_fresh(self, expires_at, now=None):
+        now = now or time.time()
+        return expires_at - now > self.refresh_margin
+
+    # -- 발급 -----------------------------------------------------------
+    def _issue(self):
+        url = f"{self.base_url}/oauth2/token"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        data = {
+            "grant_type": "client_credentials",
+            "appkey": self.app_key,
+            "appsecretkey": self.app_secret,
+            "scope": "oob"
+        }
+        res = get_scheduler().call(
+            "token", lambda: http_client.post(url, headers=headers, data=data), PRIORITY_HIGH)
+        if res.status_code != 200:
+            raise Exception(f"Token fetch failed: {res.text}")
+        body = res.json()
+        expires_in = int(body.get("expires_in") or DEFAULT_EXPIRES_IN)
+        return body["access_token"], time.time() + expires_in
+
+    def refresh(self, bad_token=None):
+        """
+        파일 잠금을 잡은 상태에서 재발급.
+        다른 프로세스가 이미 새 토큰을 저장했다면 그것을 재사용한다.
+        """
+        with self._lock, self._file_lock():
+            token, expires_at = self._read_disk()
+            if token and token != bad_token and self._is_fresh(expires_at):
+                self.token, self.expires_at = token, expires_at
+                return token
+
+            with span("token"):
+                token, expires_at = self._issue()
+            TOKEN_REFRESHES.inc(reason="invalid" if bad_token else "scheduled")
+            self._write_disk(token, expires_at)
+            self.token, self.expires_at = token, expires_at
+            print(f"🔑 토큰 발급 완료 (만료까지 {int(expires_at - time.time())}초)")
+            return token
+
+    def get_token(self):
+        """메모리 → 디스크 → 신규 발급 순으로 유효한 토큰을 반환"""
+        if self.token and self.expires_at > time.time():
+            return self.token
+        token, expires_at = self._read_disk()
+        if token and expires_at > time.time():
+            self.token, self.expires_at = token, expires_at
+            return token
+        return self.refresh()
+
+    def invalidate(self, bad_token=None):
+        """401 / 유효하지 않은 토큰 응답을 받았을 때만 호출 (인라인 재발급)"""
+        print("🔄 토큰 만료! 재발급 시도...")
+        return self.refresh(bad_token=bad_token or self.token)
+
+    # -- 백그라운드 선제 갱신 ---------------------------------------------
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            wait = self.expires_at - self.refresh_margin - time.time()
+            if wait > 0:
+                self._stop.wait(min(wait, 600))
+                # 다른 프로세스가 갱신했을 수 있으므로 디스크 기준으로 다시 계산
+                token, expires_at = self._read_disk()
+                if token and expires_at > self.expires_at:
+                    self.token, self.expires_at = token, expires_at
+                continue
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ 토큰 선제 갱신 실패: {e} (60초 후 재시도)")
+                self._stop.wait(60)
+
+    def start_background_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="token-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()